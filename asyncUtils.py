@@ -0,0 +1,215 @@
+import sys, asyncio, json
+from time import perf_counter_ns
+from urllib.parse import urlencode
+from gpsUtils import gpsLogger
+from imuUtils import imuLogger, queries
+from convUtils import convWelcome, formatRequest, parseReply
+from perfUtils import perf
+
+def resultPoints(result):
+    # same rows InfluxDBClient.query().get_points() yields
+    points = []
+
+    for res in result.get('results', []):
+        if 'error' in res:
+            raise IOError(f"InfluxDB error: {res['error']}")
+
+        for series in res.get('series', []):
+            columns = series['columns']
+            points.extend(dict(zip(columns, values))
+                          for values in series.get('values', []))
+
+    return points
+
+async def influxQuery(host, port, database, query, timeout = 5.0, **params):
+    params.update({'db' : database, 'q' : query})
+
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host,
+                                                                    port),
+                                            timeout)
+
+    # HTTP/1.0 keeps the reply unchunked and closed by the server at the end
+    request = (f"GET /query?{urlencode(params)} HTTP/1.0\r\n"
+               f"Host: {host}:{port}\r\n"
+               f"Accept: application/json\r\n\r\n")
+
+    try:
+        writer.write(request.encode('ascii'))
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = head.split(b'\r\n', 1)[0].split()
+
+    if len(status) < 2 or status[1] != b'200':
+        raise IOError(f"InfluxDB query failed: {head[:80]!r}")
+
+    return resultPoints(json.loads(body))
+
+class _gpsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, logger):
+        self._logger = logger
+
+    def datagram_received(self, data, addr):
+        self._logger._handleDatagram(data, addr)
+
+class asyncLogger(gpsLogger, imuLogger):
+    def __init__(self, localIP = "0.0.0.0", localPort = 6003,
+                 dbHost = 'calibano.ba.infn.it', dbPort = 8086,
+                 dbQueries = queries, database = 'spbmonitor',
+                 queryInterval = 2,
+                 convHost = '127.0.0.1', convPort = 5000,
+                 bufSize = 1024, timeout = 5.0, *args, **kwargs):
+        # the sockets are opened by open() on the running event loop
+        super(asyncLogger, self).__init__(localIP = localIP,
+                                          localPort = None,
+                                          dbHost = None,
+                                          dbQueries = dbQueries,
+                                          database = database,
+                                          queryInterval = queryInterval,
+                                          convHost = None,
+                                          bufSize = bufSize,
+                                          *args, **kwargs)
+
+        self._gpsAddr = (localIP, localPort)
+        self._dbAddr = (dbHost, dbPort)
+        self._convAddr = (convHost, convPort)
+        self._database = database
+        self._timeout = timeout
+        self._gpsTransport = None
+        self._convStream = None
+        self._lastErrors = []
+
+    @property
+    def errors(self):
+        return self._lastErrors
+
+    async def _openConverter(self):
+        reader, writer = await asyncio.wait_for(
+                                asyncio.open_connection(*self._convAddr),
+                                self._timeout)
+
+        welcomeStr = await asyncio.wait_for(
+                                reader.readexactly(len(convWelcome)),
+                                self._timeout)
+
+        if welcomeStr == convWelcome:
+            print("Imu converter ready")
+
+            self._convStream = (reader, writer)
+        else:
+            writer.close()
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+
+        if self._gpsAddr[1] is not None:
+            self._gpsTransport, _ = await loop.create_datagram_endpoint(
+                                            lambda: _gpsProtocol(self),
+                                            local_addr = self._gpsAddr)
+
+        if self._convAddr[0] is not None:
+            await self._openConverter()
+
+    async def _queryDB(self):
+        t0 = perf_counter_ns()
+        points = await influxQuery(*self._dbAddr, self._database,
+                                   self._dbQuery(), timeout = self._timeout,
+                                   epoch = 'ns')
+        t0 = perf.since('imu.query', t0)
+
+        self._updateDBResults(points)
+        perf.since('imu.decode', t0)
+
+    async def _convert(self, sample):
+        reader, writer = self._convStream
+        t0 = perf_counter_ns()
+
+        # a reset or closed connection raises from write() and drain() as
+        # well: the stream is dropped and refresh() opens a new one
+        try:
+            writer.write(formatRequest(*sample))
+            await writer.drain()
+            recD = await asyncio.wait_for(reader.readuntil(b'\n'),
+                                          self._timeout)
+        except (OSError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, asyncio.TimeoutError) as e:
+            self._convStream = None
+            writer.close()
+            raise ConnectionError("Imu converter connection lost") from e
+
+        perf.since('imu.convRTT', t0)
+        self._updateConvResults(parseReply(recD.decode('utf-8')))
+
+    async def _reopenConverter(self, sample):
+        await self._openConverter()
+
+        if self._convStream is not None and sample is not None:
+            await self._convert(sample)
+
+    async def refresh(self):
+        tasks = []
+
+        if self._dbAddr[0] is not None:
+            tasks.append(self._queryDB())
+
+        # the converter gets the accel/gyro pair of the previous cycle, so
+        # its round trip overlaps the query instead of following it. A lost
+        # converter is opened again, one attempt per cycle
+        sample = self._convRequest()
+
+        if self._convAddr[0] is not None and self._convStream is None:
+            tasks.append(self._reopenConverter(sample))
+        elif self._convStream is not None and sample is not None:
+            tasks.append(self._convert(sample))
+
+        results = await asyncio.gather(*tasks, return_exceptions = True)
+
+        self._lastErrors = [r for r in results if isinstance(r, Exception)]
+
+        return self._lastErrors
+
+    async def run(self, refreshInterval = 1.0, callback = None):
+        loop = asyncio.get_running_loop()
+
+        await self.open()
+
+        try:
+            while True:
+                t0 = loop.time()
+
+                await self.refresh()
+
+                if callback is not None:
+                    callback(self)
+
+                await asyncio.sleep(max(0.0, refreshInterval -
+                                             (loop.time() - t0)))
+        finally:
+            self.close()
+
+    def __str__(self):
+        return (f"{gpsLogger.__str__(self)} "
+                f"{imuLogger.__str__(self)}")
+
+    def close(self):
+        if self._gpsTransport is not None:
+            self._gpsTransport.close()
+            self._gpsTransport = None
+
+        if self._convStream is not None:
+            self._convStream[1].close()
+            self._convStream = None
+
+        gpsLogger.close(self)
+        imuLogger.close(self)
+
+if __name__ == "__main__":
+    try:
+        acq = asyncLogger()
+        asyncio.run(acq.run(callback = print))
+
+    except KeyboardInterrupt:
+        sys.exit("\nExiting...")
@@ -0,0 +1,1071 @@
+#!/usr/bin/python3
+
+import os, re, sys, socket, argparse
+from time import perf_counter, time_ns, sleep
+from math import nan
+
+def _report(name, count, seconds):
+    print(f"{name:<36} {count/seconds:14.0f} /s "
+          f"{1e6*seconds/count:10.3f} us/op")
+
+def _timeIt(func, count, repeats = 5):
+    best = None
+
+    for _ in range(repeats):
+        t0 = perf_counter()
+        for _ in range(count):
+            func()
+        dt = perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+
+    return best
+
+def _nmeaDatagrams():
+    from nmeaUtils import nmeaSentence
+
+    gga = nmeaSentence("GPGGA,123519.00,4807.038,N,01131.000,E,"
+                       "1,08,0.9,545.4,M,46.9,M,,")
+    avr = nmeaSentence("PTNL,AVR,123519.00,+149.4688,Yaw,+0.0134,Tilt,"
+                       ",,60.191,3,2.5,6")
+
+    return [f"gps1,{gga}\r\n", f"gps2,{avr}\r\n"]
+
+def _regexParser():
+    # the regex cascade updateGPS used before nmeaUtils, with the ddmm
+    # conversion fixed so that the results can be compared
+    from geoUtils import ddmmToDegrees
+
+    numericPattern = r"[+-]?[0-9]*\.?[0-9]+"
+    gpsRegex = re.compile(r"(gps1|gps2),\s*(.*)")
+    orientationRegex = re.compile(rf"\$PTNL,AVR,(?:{numericPattern}),"
+                                  rf"({numericPattern}),Yaw,"
+                                  rf"({numericPattern}),Tilt")
+    positionRegex = re.compile(rf"\$GPGGA,({numericPattern}),"  # timestamp
+                               rf"({numericPattern}),(N|S),"    # latitude
+                               rf"({numericPattern}),(W|E),"    # longitude
+                               rf"({numericPattern}),"          # fix quality
+                               rf"({numericPattern}),"          # satellites
+                               rf"({numericPattern}),"          # hdop
+                               rf"({numericPattern}),M")        # altitude
+    gpsTimeRegex = re.compile(r"(\d\d)(\d\d)(\d\d).00")
+
+    def regexParse(msg):
+        res = {}
+
+        for g in gpsRegex.findall(msg):
+            gpsStr = g[1].replace('\n',' ')
+
+            gpsOrientData = orientationRegex.findall(gpsStr)
+            if gpsOrientData != []:
+                data = gpsOrientData[0]
+                res['yaw'] = float(data[0] or nan)
+                res['tilt'] = float(data[1] or nan)
+
+            gpsPositionData = positionRegex.findall(gpsStr)
+            if gpsPositionData != []:
+                data = gpsPositionData[0]
+                gpsTime = gpsTimeRegex.findall(data[0])[0]
+                res['time'] = f"{gpsTime[0]}:{gpsTime[1]}:{gpsTime[2]}"
+
+                latSig = -1 if data[2] == 'S' else 1
+                res['latitude'] = latSig*ddmmToDegrees(float(data[1] or nan))
+
+                longSig = -1 if data[4] == 'W' else 1
+                res['longitude'] = longSig*ddmmToDegrees(float(data[3] or nan))
+
+                res['altitude'] = float(data[8] or nan)
+
+        return res
+
+    return regexParse
+
+def benchNMEA(args):
+    from nmeaUtils import nmeaParser
+
+    msgs = _nmeaDatagrams()
+    parser = nmeaParser()
+    regexParse = _regexParser()
+    count = args.count
+
+    for msg in msgs:
+        parser.parse(msg)
+        ref = regexParse(msg)
+
+        for k, v in ref.items():
+            assert parser.record[k] == v, (k, parser.record[k], v)
+
+    noCsParser = nmeaParser(requireChecksum = False)
+    noCsMsgs = [m.split('*')[0] for m in msgs]
+
+    tRegex = _timeIt(lambda: [regexParse(m) for m in msgs], count)
+    tParser = _timeIt(lambda: [parser.parse(m) for m in msgs], count)
+    tNoCs = _timeIt(lambda: [noCsParser.parse(m) for m in noCsMsgs], count)
+
+    _report("regex cascade", count*len(msgs), tRegex)
+    _report("nmeaParser (checksum verified)", count*len(msgs), tParser)
+    _report("nmeaParser (no checksum)", count*len(msgs), tNoCs)
+
+def _syntheticPoints(count, instances, t0 = 1760000000000000000,
+                     period = 10000000, asStrings = True):
+    from imuUtils import nsToTimeStr
+
+    points = []
+    n = len(instances)
+
+    for k in range(count):
+        t = t0 + (k // n)*period + (k % n)*1000
+        if asStrings:
+            secs, ns = divmod(t, 1000000000)
+            day = "2025-10-09"
+            t = f"{day}T{nsToTimeStr(t)}.{ns:09d}Z"
+
+        points.append({'time'     : t,
+                       'metric'   : 'quaternions',
+                       'instance' : instances[k % n],
+                       'value'    : 0.5})
+
+    return points
+
+def _legacyCmpltSeq(sequence, instances, keyword = 'instance'):
+    # the assembler used before _getCmpltSeqs, first complete sequence only
+    from time import strptime
+
+    def getTime(timeStr, fmt = "%Y-%m-%dT%H:%M:%S.%f"):
+        cT = timeStr.replace('Z','').split('.')
+        return strptime(cT[0]+'.'+cT[1][:6], fmt)
+
+    retVal = {k : None for k in instances}
+    i = 0
+    j = 0
+    t0 = None
+    seq = sequence.copy()
+
+    while(i < len(sequence)):
+        s = seq.pop(0)
+        t1 = getTime(s['time'])
+
+        if s[keyword] != instances[j]:
+            i = i + 1
+            continue
+
+        if t0 is None:
+            t0 = getTime(s['time'])
+
+        i = i + 1
+        j = (j + 1)%len(instances)
+        retVal.update({s[keyword] : s['value']})
+
+        if ((s[keyword] == instances[-1]) and
+            (t1.tm_sec - t0.tm_sec <= 1.0)):
+            retVal.update({'time' : f"{t1.tm_hour:02d}:{t1.tm_min:02d}:"
+                                    f"{t1.tm_sec:02d}"})
+            return retVal
+
+    return None
+
+def benchCmpltSeq(args):
+    from imuUtils import imuLogger
+
+    imu = imuLogger(dbHost = None, convHost = None)
+    instances = ['q1','q2','q3','q4']
+    count = 10000
+    repeats = max(1, args.count // 2000)
+
+    strPoints = _syntheticPoints(count, instances)
+    nsPoints = _syntheticPoints(count, instances, asStrings = False)
+
+    # a window starting with a leftover q4 of the previous one, and one
+    # where the last instance never arrives (the legacy worst case)
+    legacyWindow = strPoints[3:]
+    legacyWorst = [p for p in strPoints if p['instance'] != 'q4']
+
+    assert (len(imu._getCmpltSeqs(strPoints, instances)) ==
+            len(imu._getCmpltSeqs(nsPoints, instances)) == count // 4)
+
+    tLegacy = _timeIt(lambda: _legacyCmpltSeq(legacyWindow, instances),
+                      repeats)
+    tWorst = _timeIt(lambda: _legacyCmpltSeq(legacyWorst, instances), 1, 1)
+    tStr = _timeIt(lambda: imu._getCmpltSeqs(strPoints, instances), repeats)
+    tNs = _timeIt(lambda: imu._getCmpltSeqs(nsPoints, instances), repeats)
+
+    _report("legacy, first sequence of 10k pts", repeats, tLegacy)
+    _report("legacy, no complete sequence", 1, tWorst)
+    _report("single pass, all of 10k pts (RFC3339)", repeats, tStr)
+    _report("single pass, all of 10k pts (epoch ns)", repeats, tNs)
+
+def benchDecode(args):
+    from imuUtils import imuLogger, queries
+
+    imu = imuLogger(dbHost = None, convHost = None)
+    # raw counts, as the per point path returns them
+    tQ = queries['accel']
+    instances = tQ['instances']
+    repeats = max(1, args.count // 2000)
+
+    points = _syntheticPoints(30000, instances, asStrings = False)
+    for i, p in enumerate(points):
+        p['value'] = (i*7919) & 0xffff
+
+    perPoint = lambda: imu._getCmpltSeqs(points, instances,
+                                         toSigned = tQ['toSigned'])
+    batch = imu._decodeBatch(points, tQ)
+
+    assert [tuple(r) for r in batch.tolist()] == perPoint()
+
+    _report("per point _toSigned, 10k samples", repeats,
+            _timeIt(perPoint, repeats))
+    _report("vectorized _decodeBatch, 10k samples", repeats,
+            _timeIt(lambda: imu._decodeBatch(points, tQ), repeats))
+
+def benchFusion(args):
+    import numpy as np
+    from fusionUtils import madgwickFilter
+    from convUtils import imuConverter
+    from fakeServices import fakeConverter
+
+    n = max(1000, args.count)
+    rng = np.random.default_rng(0)
+    times = np.arange(n, dtype = np.int64)*10000000
+    gyro = rng.integers(-300, 300, (n, 3))
+    accel = np.column_stack((rng.integers(-500, 500, (n, 2)),
+                             np.full(n, 16384)))
+    samples = list(zip(map(tuple, gyro.tolist()), map(tuple, accel.tolist())))
+
+    conv = fakeConverter().start()
+    client = imuConverter(*conv.address)
+    client.connect()
+
+    try:
+        single = min(n, 2000)
+        tSingle = _timeIt(lambda: [client.convert(*s)
+                                   for s in samples[:single]], 1, 3)
+        tBatch = _timeIt(lambda: client.convertBatch(samples), 1, 3)
+    finally:
+        client.close()
+        conv.stop()
+
+    tFusion = _timeIt(lambda: madgwickFilter().updateBatch(times, gyro,
+                                                           accel), 1, 3)
+
+    _report("converter socket, one RTT per sample", single, tSingle)
+    _report("converter socket, pipelined batch", n, tBatch)
+    _report("in-process madgwick", n, tFusion)
+
+def benchRing(args):
+    from ringUtils import ringBuffer
+    from graphUtils import gpsHistoryDtype
+
+    capacity = 100000
+    # time, altitude, tilt, yaw, then zeros for the other fields
+    row = ((1760000000.0, 545.4, 0.0134, 149.4688) +
+           (0.0,)*(len(gpsHistoryDtype.names) - 4))
+
+    ring = ringBuffer(gpsHistoryDtype, capacity)
+    ring.extend([row]*capacity)
+    lists = [[v]*capacity for v in row]
+
+    def listAppend():
+        for l, v in zip(lists, row):
+            l.pop(0)
+            l.append(v)
+
+    _report("list append + pop(0), 100k points", args.count,
+            _timeIt(listAppend, args.count))
+    _report("ringBuffer append, 100k points", args.count,
+            _timeIt(lambda: ring.append(row), args.count))
+    _report("ringBuffer window view, 100k points", args.count,
+            _timeIt(lambda: ring.window(1760000000.0)['altitude'],
+                    args.count))
+
+def benchReceivers(args):
+    from gpsUtils import gpsLogger
+    from receiverUtils import receiverStore
+
+    gps = gpsLogger(localPort = None)
+    # gps1 position, gps2 and gps3 orientation
+    msg = ''.join(_nmeaDatagrams()).encode('ascii')
+    gps._handleDatagram(msg, ('bench', 0))
+    msg = msg.replace(b'gps2,', b'gps3,')
+    gps._handleDatagram(msg, ('bench', 0))
+
+    store = gps.receivers
+    fix = store.fix('GPS1')
+    fused = receiverStore()
+
+    for receiver in ('GPS1', 'GPS2', 'GPS3'):
+        fused.update(fix._replace(receiver = receiver))
+
+    _report("datagram -> per receiver state", args.count,
+            _timeIt(lambda: gps._handleDatagram(msg, ('bench', 0)),
+                    args.count))
+    _report("best fix, 3 receivers", args.count,
+            _timeIt(store.best, args.count))
+    _report("best fix, 3 receivers fused", args.count,
+            _timeIt(lambda: fused.best(fuse = True), args.count))
+
+def benchGeo(args):
+    import numpy as np
+    from math import radians, sin, cos, asin, sqrt, atan2, degrees
+    from geoUtils import (earthRadius, ddmmToDegrees, speedOverGround,
+                          geodeticToENU)
+
+    count = 100000
+    times = np.arange(count)*0.1
+    lat = 48.1173 + np.cumsum(np.full(count, 1e-6))
+    lon = 11.5167 + np.cumsum(np.full(count, 2e-6))
+    alt = np.full(count, 545.4)
+
+    def pointwise():
+        # per point conversion, as the track was processed before
+        out = []
+
+        for i in range(1, count):
+            p1, l1 = radians(lat[i-1]), radians(lon[i-1])
+            p2, l2 = radians(lat[i]), radians(lon[i])
+            a = (sin(0.5*(p2 - p1))**2 +
+                 cos(p1)*cos(p2)*sin(0.5*(l2 - l1))**2)
+            d = 2.0*earthRadius*asin(sqrt(a))
+            c = degrees(atan2(sin(l2 - l1)*cos(p2),
+                              cos(p1)*sin(p2) -
+                              sin(p1)*cos(p2)*cos(l2 - l1))) % 360.0
+            out.append((d/(times[i] - times[i-1]), c))
+
+        return out
+
+    n = max(1, args.count//1000)
+    ddmm = 100.0*np.floor(lat) + (lat - np.floor(lat))*60.0
+
+    _report("ddmm -> degrees, 100k points", n*count,
+            _timeIt(lambda: ddmmToDegrees(ddmm), n))
+    _report("speed/course point by point", count,
+            _timeIt(pointwise, 1, 1))
+    _report("speed/course, 100k points", n*count,
+            _timeIt(lambda: speedOverGround(times, lat, lon), n))
+    _report("geodetic -> ENU, 100k points", n*count,
+            _timeIt(lambda: geodeticToENU(lat, lon, alt, lat[0], lon[0],
+                                          alt[0]), n))
+
+def benchSync(args):
+    import numpy as np
+    from gpsUtils import gpsFix
+    from syncUtils import (syncBuffer, syncIMUDtype, slerp,
+                           interpolateQuaternions)
+
+    # one minute of a 10 Hz GPS pair and of a 100 Hz IMU
+    t0 = 1728000000*1000000000
+    imu = np.zeros(6000, syncIMUDtype)
+    imu['time'] = t0 + np.arange(len(imu))*10000000
+    a = np.radians(np.arange(len(imu))*0.1)
+    imu['q1'] = np.cos(0.5*a)
+    imu['q4'] = np.sin(0.5*a)
+    gpsTimes = t0 + np.arange(600)*100000000 + 3000000
+
+    def samplewise():
+        # one scalar SLERP per GPS time, as a loop over the fixes would do
+        out = []
+        t = imu['time']
+        q = np.stack([imu[f"q{i+1}"] for i in range(4)], axis = 1)
+
+        for target in gpsTimes:
+            i = np.searchsorted(t, target, 'right') - 1
+            u = (target - t[i])/(t[i+1] - t[i])
+            out.append(slerp(q[i:i+1], q[i+1:i+2], np.array([u]))[0])
+
+        return out
+
+    n = max(1, args.count//1000)
+
+    _report("SLERP sample by sample", len(gpsTimes),
+            _timeIt(samplewise, 1, 1))
+    _report("SLERP, 600 GPS times", n*len(gpsTimes),
+            _timeIt(lambda: interpolateQuaternions(imu, gpsTimes), n))
+
+    sync = syncBuffer()
+    sync.addIMU(imu)
+
+    for k, t in enumerate(gpsTimes):
+        sod = ((t - t0) % 86400000000000)*1e-9
+        sync.addFix(gpsFix('gps1', '', sod, 45.0 + 1e-6*k, 8.0, 100.0,
+                           np.nan, np.nan, 4, 10, 0.9), t)
+        sync.addFix(gpsFix('gps2', '', sod, np.nan, np.nan, np.nan,
+                           0.1*k % 360.0, 0.5, -1, -1, np.nan), t)
+
+    _report("aligned on GPS, 600 joint samples", n*len(gpsTimes),
+            _timeIt(lambda: sync.aligned(on = 'gps'), n))
+    _report("aligned on IMU, 6000 joint samples", n*len(imu),
+            _timeIt(lambda: sync.aligned(on = 'imu'), n))
+
+    fix = gpsFix('gps1', '', 0.0, 45.0, 8.0, 100.0, np.nan, np.nan, 4, 10,
+                 0.9)
+    sync = syncBuffer(args.count)
+    step = iter(range(10**9))
+
+    _report("addFix", args.count,
+            _timeIt(lambda: sync.addFix(fix._replace(sod = 1e-3*next(step)),
+                                        t0), args.count, 1))
+
+def _shmReader(name, count, results):
+    # child process: polls the best fix and measures publish -> read
+    from shmUtils import stateSubscriber
+
+    sub = stateSubscriber(name)
+    latencies = []
+    last = None
+
+    while len(latencies) < count:
+        latest = sub.latest('best')
+
+        if latest is None or latest[0] == last:
+            continue
+
+        last = latest[0]
+        latencies.append(1e-9*(time_ns() - int(latest[1]['time'])))
+
+    results.put(latencies)
+    sub.close()
+
+def benchShm(args):
+    import numpy as np
+    import multiprocessing as mp
+    from gpsUtils import gpsFix
+    from imuUtils import imuLogger, convDtype
+    from shmUtils import statePublisher, sharedLogger
+
+    name = f"gpsBench{os.getpid()}"
+    imu = imuLogger(dbHost = None, convHost = None)
+    pub = statePublisher(imu, name)
+    sub = sharedLogger(name)
+    fix = gpsFix('gps1', '12:35:19', 45319.0, 48.1173, 11.5167, 545.4,
+                 np.nan, np.nan, 1, 8, 0.9)
+    conv = np.zeros(100, convDtype)
+
+    _report("publish fix (gps and best rings)", args.count,
+            _timeIt(lambda: pub.writeFix(fix, fix), args.count))
+    _report("publish IMU state", args.count,
+            _timeIt(lambda: pub.publishIMU(imu), args.count))
+    _report("publish 100 conv rows", 100*args.count,
+            _timeIt(lambda: pub.writeConv(conv), args.count))
+
+    def readBack():
+        pub.writeFix(fix, fix)
+        sub.updateGPS()
+
+    _report("publish + subscriber updateGPS", args.count,
+            _timeIt(readBack, args.count))
+
+    def readConv():
+        pub.writeConv(conv)
+        sub.updateIMU()
+
+    _report("100 conv rows through updateIMU", 100*args.count,
+            _timeIt(readConv, args.count))
+
+    # another process following the fixes published at --rate
+    results = mp.Queue()
+    count = int(args.rate*args.seconds)
+    reader = mp.Process(target = _shmReader, args = (name, count, results))
+    reader.start()
+    sleep(0.5)
+
+    for _ in range(count):
+        pub.writeFix(fix, fix)
+        sleep(1.0/args.rate)
+
+    latencies = results.get(timeout = 10)
+    reader.join()
+
+    _reportLatency("publish -> other process", latencies)
+
+    sub.close()
+    pub.close()
+
+def benchSink(args):
+    import numpy as np
+    from time import sleep
+    from fakeServices import fakeInflux
+    from sinkUtils import influxSink
+    from gpsUtils import gpsLogger
+    from imuUtils import convDtype
+
+    influx = fakeInflux().start()
+    sink = influxSink(*influx.address[:2], 'bench',
+                      maxPending = 10*args.count)
+    gps = gpsLogger(localPort = None)
+    gps._handleDatagram(''.join(_nmeaDatagrams()).encode('ascii'),
+                        ('bench', 0))
+    fix = gps.fix
+    conv = np.zeros(1000, convDtype)
+    conv['time'] = np.arange(1000)
+
+    _report("sink writeFix (queue only)", args.count,
+            _timeIt(lambda: sink.writeFix(fix), args.count, 1))
+
+    while sink.counters['pending']:
+        sleep(0.01)
+
+    written = sink.counters['written']
+    t0 = perf_counter()
+
+    for _ in range(max(1, args.count//1000)):
+        sink.writeConv(conv)
+
+    while sink.counters['pending']:
+        sleep(0.001)
+
+    _report("sink IMU rows written to /write",
+            sink.counters['written'] - written, perf_counter() - t0)
+
+    sink.close()
+    influx.stop()
+
+def benchPerf(args):
+    from time import perf_counter_ns
+    from perfUtils import perf, perfMonitor
+    from gpsUtils import gpsLogger
+
+    monitor = perfMonitor()
+    gps = gpsLogger(localPort = None)
+    msg = ''.join(_nmeaDatagrams()).encode('ascii')
+
+    _report("perfMonitor.record", args.count,
+            _timeIt(lambda: monitor.record('bench', 12345), args.count))
+    _report("perfMonitor.since", args.count,
+            _timeIt(lambda: monitor.since('bench', perf_counter_ns()),
+                    args.count))
+
+    for enabled in (False, True):
+        perf.enabled = enabled
+        _report(f"datagram, instrumentation {'on' if enabled else 'off'}",
+                args.count,
+                _timeIt(lambda: gps._handleDatagram(msg, ('bench', 0)),
+                        args.count))
+
+    print(perf.summary())
+
+def benchRecord(args):
+    import tempfile
+    import numpy as np
+    from gpsUtils import gpsLogger
+    from imuUtils import batchDtype
+    from recordUtils import sessionRecorder
+
+    datagrams = _nmeaDatagrams()
+    msg = datagrams[0] + datagrams[1]
+    batch = np.zeros(1000, batchDtype(('X', 'Y', 'Z')))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = gpsLogger(localPort = None)
+        recorder = sessionRecorder(f"{tmp}/bench", maxQueue = 1 << 30)
+        recorded = gpsLogger(localPort = None, recorder = recorder)
+
+        _report("_parseGPSMessage", args.count,
+                _timeIt(lambda: plain._parseGPSMessage(msg), args.count))
+        _report("_parseGPSMessage, recording", args.count,
+                _timeIt(lambda: recorded._parseGPSMessage(msg), args.count))
+        batches = min(args.count, 1000)
+        _report("record 1000 IMU samples", batches,
+                _timeIt(lambda: recorder.record('accel', batch), batches))
+
+        t0 = perf_counter()
+        recorder.close()
+        tClose = perf_counter() - t0
+
+        counters = recorder.counters
+
+    print(f"{'writer backlog flushed':<36} {counters['records']:14d} rec "
+          f"{counters['bytes']/tClose/1e6:10.1f} MB/s")
+
+def _syntheticSession(prefix, seconds, gpsRate = 10, imuRate = 100,
+                      t0 = 1760000000000000000):
+    # a recorded session of a slow flight: GPS fixes and IMU batches
+    import numpy as np
+    from gpsUtils import fixDtype
+    from imuUtils import queries, batchDtype
+    from recordUtils import sessionRecorder
+
+    rng = np.random.default_rng(0)
+    recorder = sessionRecorder(prefix)
+
+    n = seconds*gpsRate
+    fixes = np.zeros(n, fixDtype)
+    fixes['time'] = t0 + np.arange(n)*(10**9//gpsRate)
+    fixes['receiver'] = b'GPS1'
+    fixes['sod'] = 43200.0 + np.arange(n)/gpsRate
+    fixes['latitude'] = 41.07 + np.cumsum(rng.normal(0, 1e-5, n))
+    fixes['longitude'] = 16.52 + np.cumsum(rng.normal(0, 1e-5, n))
+    fixes['altitude'] = 100.0 + np.cumsum(rng.normal(0, 0.1, n))
+    fixes['yaw'] = np.cumsum(rng.normal(0, 0.1, n)) % 360.0
+    fixes['tilt'] = rng.normal(0, 1.0, n)
+    fixes['quality'] = 1
+    fixes['satellites'] = 12
+    fixes['hdop'] = 0.9
+    recorder.record('gps', fixes)
+
+    n = seconds*imuRate
+    times = t0 + np.arange(n)*(10**9//imuRate)
+
+    for tN, tQ in queries.items():
+        batch = np.zeros(n, batchDtype(tQ['instances']))
+        batch['time'] = times
+
+        for k in tQ['instances']:
+            batch[k] = rng.normal(0, 100.0, n)
+
+        if tN == 'accel':
+            batch['Z'] += 16384.0
+        elif tN == 'quat':
+            batch['q1'] = 1.0
+
+        recorder.record(tN, batch)
+
+    recorder.close()
+
+def benchReplay(args):
+    import tempfile
+    import matplotlib
+    matplotlib.use('Agg')
+    from time import monotonic
+    from gpsUtils import gpsLogger
+    from imuUtils import imuLogger
+    from graphUtils import gpsPlotter
+    from replayUtils import sessionReplay
+
+    seconds = 600
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _syntheticSession(f"{tmp}/session", seconds)
+
+        for name, plot, resynthesize in (("fixes -> state", False, False),
+                                         ("NMEA -> parse -> state", False,
+                                          True),
+                                         ("NMEA -> parse -> state -> plot",
+                                          True, True)):
+            replay = sessionReplay(f"{tmp}/session", None, 1.0,
+                                   resynthesize)
+
+            if plot:
+                gps = imu = gpsPlotter(localPort = None, dbHost = None,
+                                       fusion = 'madgwick', blit = True,
+                                       figSize = (16, 12), plotInterval = 0,
+                                       plotPoints = 100000, lazy = False)
+                update = gps.update
+            else:
+                gps = gpsLogger(localPort = None)
+                imu = imuLogger(dbHost = None, fusion = 'madgwick')
+                update = None
+
+            t0 = monotonic()
+            replay.run(gps, imu, update)
+            elapsed = monotonic() - t0
+
+            print(f"{name:<36} {replay.duration/elapsed:14.1f} x  "
+                  f"{replay.counters['gps']/elapsed:10.0f} fixes/s")
+
+            gps.close()
+
+def benchImport(args):
+    import os, tempfile
+    from datetime import date
+    from concurrent.futures import ProcessPoolExecutor
+    from importUtils import importFile
+
+    lines = 200000
+    datagrams = _nmeaDatagrams()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/campaign.nmea"
+
+        with open(path, 'w') as f:
+            f.write(''.join(datagrams)*(lines//2))
+
+        t0 = perf_counter()
+        importFile(path, None, baseDate = date(2025, 10, 9))
+        _report("import NMEA log, one process", lines, perf_counter() - t0)
+
+        jobs = os.cpu_count() or 1
+
+        with ProcessPoolExecutor(jobs) as executor:
+            t0 = perf_counter()
+            importFile(path, executor, baseDate = date(2025, 10, 9),
+                       chunkSize = 1 << 20)
+            _report(f"import NMEA log, {jobs} processes", lines,
+                    perf_counter() - t0)
+
+def benchPlot(args):
+    import matplotlib
+    matplotlib.use('Agg')
+    from nmeaUtils import nmeaSentence
+    from graphUtils import gpsPlotter
+
+    frames = min(args.count, 60)
+
+    for blit in (False, True):
+        plotter = gpsPlotter(localPort = None, dbHost = None,
+                             fusion = 'madgwick', blit = blit,
+                             figSize = (16, 12), lazy = False)
+
+        for i in range(frames):
+            t = f"12{i // 60:02d}{i % 60:02d}.00"
+            gga = nmeaSentence(f"GPGGA,{t},{4107 + 0.1*i:.4f},N,"
+                               f"{1652 + 0.1*i:.4f},E,1,08,0.9,"
+                               f"{100.0 + i:.1f},M,46.9,M,,")
+            avr = nmeaSentence(f"PTNL,AVR,{t},{float(i):.4f},Yaw,"
+                               f"{0.5*i:.4f},Tilt,,,60.191,3,2.5,6")
+
+            plotter._handleDatagram(f"gps1,{gga}\ngps2,{avr}".encode(),
+                                    None)
+            plotter.update()
+
+        mode = "blitted" if blit else "full redraw"
+        print(f"{'gpsPlotter, ' + mode:<36} {plotter.fps:14.1f} fps "
+              f"{1e3*plotter.renderTime:10.3f} ms/frame")
+
+        plotter.close()
+
+def benchLOD(args):
+    import matplotlib
+    matplotlib.use('Agg')
+    import numpy as np
+    from graphUtils import gpsPlotter
+
+    points = 100000
+    frames = min(args.count, 50)
+    rng = np.random.default_rng(0)
+    times = 1760000000.0 + np.arange(points, dtype = np.float64)
+
+    for lod in (False, True):
+        plotter = gpsPlotter(localPort = None, dbHost = None,
+                             fusion = 'madgwick', blit = True,
+                             figSize = (16, 12), plotPoints = points,
+                             plotInterval = 1, lod = lod, lazy = False)
+
+        gps = np.zeros(points, plotter._gpsHistory.dtype)
+        imu = np.zeros(points, plotter._imuHistory.dtype)
+        gps['time'] = imu['time'] = times
+
+        for rows in (gps, imu):
+            for f in rows.dtype.names[1:]:
+                rows[f] = np.cumsum(rng.normal(size = points))
+
+        plotter._gpsHistory.extend(gps)
+        plotter._imuHistory.extend(imu)
+
+        # a sliding history: one new point per frame, the oldest drops out
+        for i in range(frames):
+            for ring, rows in ((plotter._gpsHistory, gps),
+                               (plotter._imuHistory, imu)):
+                row = rows[-1].copy()
+                row['time'] += i + 1
+                ring.append(row)
+
+            plotter.update()
+
+        mode = "min/max LOD" if lod else "all points"
+        print(f"{'100k points, ' + mode:<36} {plotter.fps:14.1f} fps "
+              f"{1e3*plotter.renderTime:10.3f} ms/frame")
+
+        plotter.close()
+
+def _rss():
+    # resident set size in MB (Linux), the peak one elsewhere
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+
+        return pages*os.sysconf('SC_PAGE_SIZE')/2**20
+    except (OSError, ValueError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+def _quantiles(values, qs = (0.5, 0.95, 0.99)):
+    values = sorted(values)
+
+    if not values:
+        return [nan]*len(qs)
+
+    return [values[min(len(values) - 1, int(q*len(values)))] for q in qs]
+
+def _reportLatency(name, latencies):
+    p50, p95, p99 = _quantiles(latencies)
+
+    print(f"{name:<36} p50 {1e3*p50:8.3f} ms  p95 {1e3*p95:8.3f} ms  "
+          f"p99 {1e3*p99:8.3f} ms")
+
+def _reportStages(prefixes):
+    from perfUtils import perf
+
+    lines = perf.summary().split('\n')
+    print('\n'.join([lines[0]] + [l for l in lines[1:]
+                                  if l.startswith(prefixes)]))
+
+def _fixLatencies(gps, blaster):
+    # the GGA altitude of the blaster is the datagram sequence number
+    latencies = []
+
+    def onFix(fix):
+        latencies.append(perf_counter() - blaster.sentAt(int(fix.altitude)))
+
+    gps.receivers.subscribe(onFix, 'GPS1')
+
+    return latencies
+
+def _waitIdle(counter, quiet = 0.3, timeout = 10.0):
+    # until counter() stops changing for `quiet` seconds
+    t0 = perf_counter()
+    last = counter()
+
+    while perf_counter() - t0 < timeout:
+        sleep(quiet)
+        value = counter()
+
+        if value == last:
+            return
+
+        last = value
+
+def scenarioGPSLogger(args):
+    from fakeServices import nmeaBlaster
+    from gpsUtils import gpsLogger
+    from perfUtils import perf
+
+    perf.reset()
+    rss0 = _rss()
+    gps = gpsLogger('127.0.0.1', 0, batched = True, rcvBufSize = 1 << 20)
+    port = gps._netlogger.getsockname()[1]
+    count = int(args.rate*args.seconds)
+    blaster = nmeaBlaster('127.0.0.1', port, args.rate, args.gps2_share,
+                          count)
+    latencies = _fixLatencies(gps, blaster)
+
+    gps.start(0.05)
+    t0 = perf_counter()
+    blaster.start()
+    blaster.join()
+    _waitIdle(lambda: gps.counters['parsed'])
+    elapsed = perf_counter() - t0
+
+    counters = gps.counters
+    print(f"{'datagrams sent/received/parsed':<36} {blaster.sent} / "
+          f"{counters['received']} / {counters['parsed']} "
+          f"({counters['dropped']} dropped by the kernel)")
+    _report("gpsLogger end to end", counters['parsed'], elapsed)
+    _reportLatency("send -> fix latency", latencies)
+    print(f"{'RSS growth':<36} {_rss() - rss0:14.1f} MB")
+    _reportStages('gps.')
+
+    blaster.stop()
+    gps.close()
+
+def scenarioIMULogger(args):
+    from fakeServices import fakeInflux, fakeConverter
+    from imuUtils import imuLogger
+    from perfUtils import perf
+
+    influx = fakeInflux(hkbRate = args.hkb_rate).start()
+    conv = fakeConverter().start()
+
+    for mode in ('converter', 'madgwick'):
+        perf.reset()
+        rss0 = _rss()
+        imu = imuLogger(dbHost = influx.address[0],
+                        dbPort = influx.address[1],
+                        convHost = conv.address[0], convPort = conv.address[1],
+                        convBackfill = True, queryInterval = 1,
+                        fusion = 'madgwick' if mode == 'madgwick' else None,
+                        lazy = False)
+        imu.updateIMU()
+
+        samples = 0
+        freshness = []
+        t0 = perf_counter()
+
+        while perf_counter() - t0 < args.seconds:
+            sleep(args.query_interval)
+            imu.updateIMU()
+
+            batch = imu.convBatch
+
+            if len(batch):
+                samples += len(batch)
+                freshness.append((time_ns() - int(batch['time'][-1]))*1e-9)
+
+        elapsed = perf_counter() - t0
+
+        _report(f"imuLogger + {mode}, samples", samples, elapsed)
+        _reportLatency("sample -> orientation age", freshness)
+        print(f"{'RSS growth':<36} {_rss() - rss0:14.1f} MB")
+        _reportStages('imu.')
+
+        imu.close()
+
+    conv.stop()
+    influx.stop()
+
+def scenarioGPSPlotter(args):
+    import matplotlib
+    matplotlib.use('Agg')
+    from fakeServices import fakeInflux, fakeConverter, nmeaBlaster
+    from graphUtils import gpsPlotter
+    from perfUtils import perf
+
+    influx = fakeInflux(hkbRate = args.hkb_rate).start()
+    conv = fakeConverter().start()
+
+    perf.reset()
+    rss0 = _rss()
+    plotter = gpsPlotter('127.0.0.1', 0, batched = True,
+                         rcvBufSize = 1 << 20, threaded = True,
+                         frameRate = None, blit = True, figSize = (16, 12),
+                         plotPoints = 36000, plotInterval = 0,
+                         dbHost = influx.address[0],
+                         dbPort = influx.address[1],
+                         convHost = conv.address[0],
+                         convPort = conv.address[1], convBackfill = True,
+                         lazy = False)
+    port = plotter._netlogger.getsockname()[1]
+    blaster = nmeaBlaster('127.0.0.1', port, min(args.rate, 100.0),
+                          args.gps2_share)
+    latencies = _fixLatencies(plotter, blaster)
+
+    blaster.start()
+    t0 = perf_counter()
+    frames = 0
+
+    while perf_counter() - t0 < args.seconds:
+        plotter.update()
+        frames += 1
+
+    elapsed = perf_counter() - t0
+
+    _report("gpsPlotter frames", frames, elapsed)
+    _reportLatency("send -> fix latency", latencies)
+    print(f"{'RSS growth':<36} {_rss() - rss0:14.1f} MB")
+    _reportStages(('loop.', 'plot.', 'imu.', 'gps.'))
+
+    blaster.stop()
+    plotter.close()
+    conv.stop()
+    influx.stop()
+
+def _freePort(kind = socket.SOCK_DGRAM):
+    # nothing listens there once the socket is closed
+    with socket.socket(socket.AF_INET, kind) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _startupRun(lazy, rate, results):
+    # in a fresh interpreter: nothing imported, the converter and InfluxDB
+    # unreachable, the datagrams already coming
+    import matplotlib
+    matplotlib.use('Agg')
+    from fakeServices import nmeaBlaster
+
+    port = _freePort()
+    blaster = nmeaBlaster('127.0.0.1', port, rate).start()
+
+    t0 = perf_counter()
+    from graphUtils import gpsPlotter
+    t1 = perf_counter()
+
+    plotter = gpsPlotter('127.0.0.1', port, batched = True, threaded = True,
+                         frameRate = None, blit = True, figSize = (16, 12),
+                         lazy = lazy, dbHost = '127.0.0.1',
+                         dbPort = _freePort(socket.SOCK_STREAM),
+                         convHost = '127.0.0.1',
+                         convPort = _freePort(socket.SOCK_STREAM))
+    t2 = perf_counter()
+
+    # what the gpsLogger loop does: update, print
+    while True:
+        plotter.update()
+        str(plotter)
+
+        if plotter.fix.time != '':
+            break
+
+    t3 = perf_counter()
+    sources = plotter.sources
+
+    while perf_counter() - t3 < 30.0 and plotter._mPos is None:
+        plotter.update()
+
+    results.put((t1 - t0, t2 - t1, t3 - t1, perf_counter() - t1, sources))
+
+    blaster.stop()
+    plotter.close()
+
+def scenarioStartup(args):
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+
+    for lazy in (False, True):
+        results = context.Queue()
+        child = context.Process(target = _startupRun,
+                                args = (lazy, min(args.rate, 100.0), results))
+        child.start()
+        importTime, construct, firstFix, mapReady, sources = results.get()
+        child.join()
+
+        mode = 'lazy' if lazy else 'eager'
+        print(f"{mode + ' graphUtils import':<36} {importTime*1e3:11.1f} ms")
+        print(f"{mode + ' construction':<36} {construct*1e3:11.1f} ms")
+        print(f"{mode + ' first fix printed':<36} {firstFix*1e3:11.1f} ms")
+        print(f"{mode + ' map drawn':<36} {mapReady*1e3:11.1f} ms")
+
+        for name, status in sources.items():
+            print(f"  {name}: {status}")
+
+benchmarks = {'nmea'      : benchNMEA,
+              'cmpltseq'  : benchCmpltSeq,
+              'decode'    : benchDecode,
+              'fusion'    : benchFusion,
+              'geo'       : benchGeo,
+              'sync'      : benchSync,
+              'receivers' : benchReceivers,
+              'sink'      : benchSink,
+              'shm'       : benchShm,
+              'perf'      : benchPerf,
+              'record'    : benchRecord,
+              'replay'    : benchReplay,
+              'import'    : benchImport,
+              'ring'      : benchRing,
+              'lod'       : benchLOD,
+              'plot'      : benchPlot,
+              'gpslogger' : scenarioGPSLogger,
+              'imulogger' : scenarioIMULogger,
+              'gpsplotter': scenarioGPSPlotter,
+              'startup'   : scenarioStartup}
+
+if __name__ == '__main__':
+    argParser = argparse.ArgumentParser(description = "gpsLogger benchmarks")
+    argParser.add_argument('names', nargs = '*', metavar = 'name',
+                           help = ("benchmarks to run (default all): "
+                                   f"{', '.join(benchmarks)}"))
+    argParser.add_argument('-n', '--count', type = int, default = 20000,
+                           help = "iterations per measurement")
+    argParser.add_argument('--seconds', type = float, default = 3.0,
+                           help = "duration of the end to end scenarios")
+    argParser.add_argument('--rate', type = float, default = 2000.0,
+                           help = "GPS datagrams per second of the "
+                                  "scenarios")
+    argParser.add_argument('--gps2-share', type = float, default = 0.5,
+                           help = "share of the datagrams from gps2")
+    argParser.add_argument('--hkb-rate', type = float, default = 100.0,
+                           help = "IMU sample rate of the InfluxDB "
+                                  "stand-in")
+    argParser.add_argument('--query-interval', type = float, default = 0.5,
+                           help = "seconds between the IMU queries")
+
+    args = argParser.parse_args()
+
+    for name in args.names:
+        if name not in benchmarks:
+            argParser.error(f"unknown benchmark {name}")
+
+    for name in args.names or list(benchmarks):
+        print(f"--- {name}")
+        benchmarks[name](args)
+
+    sys.exit(0)
@@ -0,0 +1,164 @@
+import socket, re
+from math import nan
+
+convWelcome = b'Imu conv'
+
+numericPattern = "([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)*)"
+convPattern = (f"Q{numericPattern},{numericPattern},"
+               f"{numericPattern},{numericPattern}"
+               f"E{numericPattern},{numericPattern},"
+               f"{numericPattern}")
+convRegex = re.compile(convPattern)
+
+class convHandshakeError(ConnectionError):
+    pass
+
+def formatRequest(gyro, accel):
+    return (f"{gyro[0]},{gyro[1]},{gyro[2]},"
+            f"{accel[0]},{accel[1]},{accel[2]}\n").encode('utf-8')
+
+def parseReply(reply):
+    # (q1, q2, q3, q4), (roll, pitch, yaw) or None for a malformed reply
+    m = convRegex.search(reply)
+
+    if m is None:
+        return None
+
+    values = [float(v or nan) for v in m.groups()]
+
+    return tuple(values[:4]), tuple(values[4:7])
+
+class imuConverter(object):
+    def __init__(self, host = '127.0.0.1', port = 5000, bufSize = 1024,
+                 timeout = 5.0, delimiter = b'\n', maxInFlight = 64,
+                 retries = 1, *args, **kwargs):
+        super(imuConverter, self).__init__(*args, **kwargs)
+
+        self._addr = (host, port)
+        self._bufSize = bufSize
+        self._timeout = timeout
+        self._delimiter = delimiter
+        self._maxInFlight = maxInFlight
+        self._retries = retries
+        self._sock = None
+        self._rxBuf = b''
+        self._counters = {'requests'   : 0,
+                          'replies'    : 0,
+                          'malformed'  : 0,
+                          'reconnects' : 0}
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    @property
+    def counters(self):
+        return dict(self._counters)
+
+    def _recvGreeting(self):
+        data = b''
+
+        # stop as soon as the bytes cannot be the greeting anymore
+        while len(data) < len(convWelcome) and convWelcome.startswith(data):
+            chunk = self._sock.recv(len(convWelcome) - len(data))
+
+            if not chunk:
+                break
+
+            data += chunk
+
+        return data
+
+    def connect(self):
+        self.close()
+
+        sock = socket.create_connection(self._addr, self._timeout)
+        self._sock = sock
+        self._rxBuf = b''
+
+        try:
+            # the greeting is not delimited: read no more than its length
+            # so that a reply sent right after it is not swallowed
+            welcomeStr = self._recvGreeting()
+        except (OSError, ConnectionError):
+            self.close()
+            raise
+
+        if welcomeStr != convWelcome:
+            self.close()
+            raise convHandshakeError(f"unexpected converter greeting "
+                                     f"{welcomeStr!r}")
+
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _readReply(self):
+        while True:
+            reply, sep, rest = self._rxBuf.partition(self._delimiter)
+
+            if sep:
+                self._rxBuf = rest
+                return reply.decode('utf-8', errors='replace')
+
+            chunk = self._sock.recv(self._bufSize)
+
+            if not chunk:
+                raise ConnectionError("Imu converter closed the connection")
+
+            self._rxBuf += chunk
+
+    def _exchange(self, requests, replies):
+        # bounded pipelining: at most maxInFlight requests are outstanding,
+        # so neither side can block on a full socket buffer
+        for i in range(0, len(requests), self._maxInFlight):
+            chunk = requests[i:i+self._maxInFlight]
+
+            self._sock.sendall(b''.join(chunk))
+            self._counters['requests'] += len(chunk)
+
+            for _ in chunk:
+                reply = parseReply(self._readReply())
+                self._counters['replies'] += 1
+
+                if reply is None:
+                    self._counters['malformed'] += 1
+
+                replies.append(reply)
+
+    def convertBatch(self, samples):
+        requests = [formatRequest(gyro, accel) for gyro, accel in samples]
+        replies = []
+        attempts = 0
+
+        while len(replies) < len(requests):
+            answered = len(replies)
+
+            try:
+                if self._sock is None:
+                    self.connect()
+
+                self._exchange(requests[answered:], replies)
+            except (OSError, ConnectionError):
+                # requests still unanswered on a broken connection are sent
+                # again on a new one; give up after `retries` reconnections
+                # in a row that do not get any reply through
+                self.close()
+
+                attempts = 0 if len(replies) > answered else attempts + 1
+
+                if attempts > self._retries:
+                    raise
+
+                self._counters['reconnects'] += 1
+
+        return replies
+
+    def convert(self, gyro, accel):
+        return self.convertBatch([(gyro, accel)])[0]
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+                self._rxBuf = b''
@@ -0,0 +1,135 @@
+import sys, signal, threading
+from time import monotonic
+from gpsUtils import gpsLogger, fixDtype
+from imuUtils import imuLogger, queries
+from metricsUtils import metricsServer
+from perfUtils import perf
+
+class headlessLogger(gpsLogger, imuLogger):
+    # acquisition only: the GPS receiver thread, the database queries and
+    # the metrics endpoint, no matplotlib nor Basemap
+    def __init__(self, localIP = "0.0.0.0", localPort = 6003,
+                 batched = True, rcvBufSize = 1 << 20,
+                 metricsHost = '127.0.0.1', metricsPort = 9108,
+                 summaryInterval = None, publish = None, **kwargs):
+        loggerArgs = {'dbHost'        : 'calibano.ba.infn.it',
+                      'dbPort'        : 8086,
+                      'dbQueries'     : queries,
+                      'database'      : 'spbmonitor',
+                      'queryInterval' : 2,
+                      'convHost'      : '127.0.0.1',
+                      'convPort'      : 5000,
+                      'logFileName'   : None,
+                      'bufSize'       : 1024,
+                      'lazy'          : True}
+        loggerArgs.update(kwargs)
+
+        super(headlessLogger, self).__init__(localIP = localIP,
+                                             localPort = localPort,
+                                             batched = batched,
+                                             rcvBufSize = rcvBufSize,
+                                             **loggerArgs)
+
+        # with a logFileName the GPS fixes go to the same session
+        if self._gpsRecorder is None and self._imuRecorder is not None:
+            self._gpsRecorder = self._imuRecorder
+            self._gpsRecorder.addStream('gps', fixDtype)
+
+        # every fix and converted batch also goes to the shared memory
+        # segment named publish, for the consumers in other processes
+        self._publisher = None
+
+        if publish is not None:
+            from shmUtils import statePublisher
+            from sinkUtils import sinkGroup
+
+            self._publisher = statePublisher(self, publish)
+            self._gpsSink = sinkGroup(self._gpsSink, self._publisher)
+            self._imuSink = sinkGroup(self._imuSink, self._publisher)
+
+        self._stopEvent = threading.Event()
+        self._summaryInterval = summaryInterval
+        self._metricsServer = None
+
+        if metricsPort is not None:
+            self._metricsServer = metricsServer(self, metricsHost,
+                                                metricsPort)
+
+    @property
+    def metricsServer(self):
+        return self._metricsServer
+
+    @property
+    def publisher(self):
+        return self._publisher
+
+    def update(self):
+        self.updateGPS()
+        self.updateIMU()
+
+        if self._publisher is not None:
+            self._publisher.publishIMU(self)
+
+    def run(self):
+        # the fix is kept up to date by the receiver thread, the loop only
+        # paces the database queries
+        self.start()
+
+        if self._metricsServer is not None:
+            self._metricsServer.start()
+
+        nextSummary = monotonic()
+
+        while not self._stopEvent.is_set():
+            t0 = monotonic()
+
+            self.update()
+
+            if self._summaryInterval and t0 >= nextSummary:
+                pending = ''.join(f"{name}: {status}\n"
+                                  for name, status in self.sources.items()
+                                  if status != 'ready')
+
+                print(f"{gpsLogger.__str__(self)}\n{pending}"
+                      f"{perf.summary()}\n", file = sys.stderr)
+                nextSummary += self._summaryInterval
+
+            self._stopEvent.wait(max(0.0, self._queryInterval -
+                                          (monotonic() - t0)))
+
+    def shutdown(self):
+        # safe from signal handlers and other threads
+        self._stopEvent.set()
+
+    def close(self):
+        self.shutdown()
+
+        if self._metricsServer is not None:
+            self._metricsServer.close()
+
+        gpsLogger.close(self)
+        imuLogger.close(self)
+
+        # the receiver thread is stopped, nothing is published any more
+        if self._publisher is not None:
+            self._publisher.close()
+
+def runHeadless(**kwargs):
+    logger = headlessLogger(**kwargs)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: logger.shutdown())
+
+    if logger.metricsServer is not None:
+        host, port = logger.metricsServer.address[:2]
+        print(f"Metrics on http://{host}:{port}/metrics", file = sys.stderr)
+
+    if logger.publisher is not None:
+        print(f"State published as {logger.publisher.name}",
+              file = sys.stderr)
+
+    try:
+        logger.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.close()
@@ -0,0 +1,469 @@
+#!/usr/bin/python3
+
+import re, sys, json, socket, threading, argparse
+from math import atan2, hypot, sin, cos, degrees
+from time import time, time_ns, sleep, perf_counter
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from convUtils import convWelcome
+from nmeaUtils import nmeaSentence, coordField, sodField
+
+def convReply(gyro, accel):
+    # attitude from gravity only: enough for a stand-in, yaw stays 0
+    ax, ay, az = accel
+    roll = atan2(ay, az)
+    pitch = atan2(-ax, hypot(ay, az))
+
+    cr, sr = cos(roll/2), sin(roll/2)
+    cp, sp = cos(pitch/2), sin(pitch/2)
+    quat = (cr*cp, sr*cp, cr*sp, -sr*sp)
+
+    return (f"Q{quat[0]:.6f},{quat[1]:.6f},{quat[2]:.6f},{quat[3]:.6f}"
+            f"E{degrees(roll):.4f},{degrees(pitch):.4f},0.0000\n")
+
+class fakeConverter(object):
+    def __init__(self, host = '127.0.0.1', port = 0, welcome = convWelcome,
+                 splitReplies = False, dropAfter = None, *args, **kwargs):
+        super(fakeConverter, self).__init__(*args, **kwargs)
+
+        self._srv = socket.create_server((host, port))
+        self._welcome = welcome
+        self._splitReplies = splitReplies
+        self._dropAfter = dropAfter
+        self._thread = None
+        self._running = False
+        self._replies = 0
+
+    @property
+    def address(self):
+        return self._srv.getsockname()
+
+    @property
+    def replies(self):
+        return self._replies
+
+    def _reply(self, line):
+        try:
+            values = [float(v) for v in line.split(b',')]
+            return convReply(values[0:3], values[3:6]).encode('ascii')
+        except (ValueError, IndexError):
+            return b"ERR\n"
+
+    def _serve(self, conn):
+        served = 0
+        buf = b''
+
+        with conn:
+            conn.sendall(self._welcome)
+
+            while self._running:
+                try:
+                    chunk = conn.recv(65536)
+                except OSError:
+                    return
+
+                if not chunk:
+                    return
+
+                buf += chunk
+                out = []
+
+                while b'\n' in buf:
+                    line, buf = buf.split(b'\n', 1)
+                    out.append(self._reply(line))
+
+                for reply in out:
+                    if self._splitReplies:
+                        # two segments per reply to exercise client framing
+                        half = len(reply) // 2
+                        conn.sendall(reply[:half])
+                        conn.sendall(reply[half:])
+                    else:
+                        conn.sendall(reply)
+
+                    served += 1
+                    self._replies += 1
+
+                    if self._dropAfter is not None and \
+                       served >= self._dropAfter:
+                        return
+
+    def _acceptLoop(self):
+        while self._running:
+            try:
+                conn, _ = self._srv.accept()
+            except OSError:
+                return
+
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target = self._serve, args = (conn,),
+                             daemon = True).start()
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target = self._acceptLoop,
+                                        name = 'fakeConverter',
+                                        daemon = True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._running = False
+        self._srv.close()
+
+class nmeaBlaster(object):
+    # gps1 GGA and gps2 AVR datagrams at `rate` per second, a gps2Share of
+    # them from gps2, `count` in total (None: until stopped). The GGA
+    # altitude is the sequence number of the datagram and sentAt() its send
+    # time, so a receiver can measure the latency of every position
+    def __init__(self, host = '127.0.0.1', port = 6003, rate = 10.0,
+                 gps2Share = 0.5, count = None, *args, **kwargs):
+        super(nmeaBlaster, self).__init__(*args, **kwargs)
+
+        self._addr = (host, port)
+        self._rate = rate
+        self._gps2Share = gps2Share
+        self._count = count
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sentAt = []
+        self._thread = None
+        self._running = False
+
+    @property
+    def sent(self):
+        return len(self._sentAt)
+
+    @property
+    def finished(self):
+        return self._count is not None and self.sent >= self._count
+
+    def sentAt(self, seq):
+        return self._sentAt[seq]
+
+    def datagram(self, seq, sod):
+        share = self._gps2Share
+        t = sodField(sod)
+
+        if int((seq + 1)*share) > int(seq*share):
+            avr = nmeaSentence(f"PTNL,AVR,{t},{seq % 360:+.4f},Yaw,"
+                               f"{0.01*(seq % 100):+.4f},Tilt,"
+                               f",,60.191,3,2.5,6")
+
+            return f"gps2,{avr}\r\n"
+
+        lat, ns = coordField(41.1 + 1e-7*seq, 'N', 'S')
+        lon, ew = coordField(16.87 + 1e-7*seq, 'E', 'W')
+        gga = nmeaSentence(f"GPGGA,{t},{lat},{ns},{lon},{ew},4,12,0.8,"
+                           f"{seq:.3f},M,46.9,M,,")
+
+        return f"gps1,{gga}\r\n"
+
+    def _sendLoop(self):
+        start = perf_counter()
+        sod0 = time() % 86400
+        seq = 0
+
+        while self._running and (self._count is None or seq < self._count):
+            due = int((perf_counter() - start)*self._rate) + 1
+
+            if self._count is not None:
+                due = min(due, self._count)
+
+            if seq >= due:
+                sleep(min(0.001, 1.0/self._rate))
+                continue
+
+            while seq < due:
+                data = self.datagram(seq, (sod0 + seq/self._rate) % 86400)
+                self._sentAt.append(perf_counter())
+
+                try:
+                    self._sock.sendto(data.encode('ascii'), self._addr)
+                except OSError:
+                    pass
+
+                seq += 1
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target = self._sendLoop,
+                                        name = 'nmeaBlaster',
+                                        daemon = True)
+        self._thread.start()
+
+        return self
+
+    def join(self, timeout = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self):
+        self._running = False
+        self.join()
+        self._sock.close()
+
+# synthetic HKB series: metric -> (instances, value of an instance at t s)
+hkbMetrics = {'quaternions'  : (('q1', 'q2', 'q3', 'q4'),
+                                lambda i, t: (cos(0.05*t), 0.0, 0.0,
+                                              sin(0.05*t))[i]),
+              'acceleration' : (('X', 'Y', 'Z'),
+                                lambda i, t: (int(300*sin(t)) & 0xffff,
+                                              int(-200*cos(t)) & 0xffff,
+                                              16384)[i]),
+              'position'     : (('X', 'Y', 'Z'),
+                                lambda i, t: (int(50*sin(3*t)) & 0xffff,
+                                              int(-80*sin(2*t)) & 0xffff,
+                                              int(100*cos(t)) & 0xffff)[i])}
+
+_conditionRegex = re.compile(r"\"metric\" = '(\w+)' AND "
+                             r"time > (?:(\d+)|now\(\)\s*-\s*(\d+)s)")
+
+def _rfc3339(ns):
+    secs, frac = divmod(ns, 1000000000)
+    t = secs % 86400
+    days = secs // 86400
+    # days to civil date, proleptic Gregorian (Howard Hinnant)
+    z = days + 719468
+    era = z // 146097
+    doe = z - era*146097
+    yoe = (doe - doe//1460 + doe//36524 - doe//146096) // 365
+    doy = doe - (365*yoe + yoe//4 - yoe//100)
+    mp = (5*doy + 2) // 153
+    d = doy - (153*mp + 2)//5 + 1
+    m = mp + 3 if mp < 10 else mp - 9
+    y = yoe + era*400 + (m <= 2)
+
+    return (f"{y:04d}-{m:02d}-{d:02d}T{t // 3600:02d}:{(t // 60) % 60:02d}:"
+            f"{t % 60:02d}.{frac:09d}Z")
+
+class _influxHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, status, body = b'', contentType = None):
+        self.send_response(status)
+
+        if contentType is not None:
+            self.send_header('Content-Type', contentType)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        influx = self.server.influx
+        url = urlparse(self.path)
+
+        if not influx.running:
+            self.close_connection = True
+            return
+
+        if url.path == '/ping':
+            self.send_response(204)
+            self.send_header('X-Influxdb-Version', 'fake')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if url.path != '/query':
+            self._reply(404)
+            return
+
+        params = {k : v[0] for k, v in parse_qs(url.query).items()}
+        status = influx._nextStatus(200)
+
+        if status >= 300:
+            self._reply(status, b'{"error":"stand-in failure"}',
+                        'application/json')
+            return
+
+        body = influx.queryResult(params.get('q', ''), params.get('epoch'))
+
+        self._reply(200, json.dumps(body).encode('utf-8'),
+                    'application/json')
+
+    def do_POST(self):
+        influx = self.server.influx
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if not influx.running:
+            # stopped: connections kept alive by clients are dropped too
+            self.close_connection = True
+            return
+
+        if url.path != '/write':
+            self._reply(404)
+            return
+
+        status = influx._nextStatus()
+
+        if status < 300:
+            influx._store(parse_qs(url.query).get('db', [''])[0],
+                          body.decode('utf-8').splitlines())
+
+        self._reply(status, b'' if status < 300 else
+                            b'{"error":"stand-in failure"}')
+
+    def log_message(self, format, *args):
+        pass
+
+class fakeInflux(object):
+    # InfluxDB 1.x stand-in. /write keeps the lines in memory, /query
+    # answers the HKB queries of imuLogger with synthetic points sampled at
+    # hkbRate Hz up to the current time, at most maxQuerySeconds of them,
+    # /ping always answers. fail() makes the next requests answer with an
+    # error status
+    def __init__(self, host = '127.0.0.1', port = 0, hkbRate = 100.0,
+                 maxQuerySeconds = 10.0, *args, **kwargs):
+        super(fakeInflux, self).__init__(*args, **kwargs)
+
+        self._period = int(1e9/hkbRate)
+        self._maxQuery = int(maxQuerySeconds*1e9)
+        self._points = 0
+
+        self._srv = ThreadingHTTPServer((host, port), _influxHandler)
+        self._srv.daemon_threads = True
+        self._srv.influx = self
+        self._lock = threading.Lock()
+        self._lines = {}
+        self._requests = 0
+        self._failures = []
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._srv.server_address
+
+    @property
+    def requests(self):
+        return self._requests
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    @property
+    def points(self):
+        return self._points
+
+    def queryResult(self, query, epoch = None):
+        # the points of every queried metric newer than its own time
+        # condition, in time order as InfluxDB returns them
+        now = time_ns()
+        since = {}
+
+        for metric, ns, seconds in _conditionRegex.findall(query):
+            if metric in hkbMetrics:
+                since[metric] = max(int(ns) if ns else
+                                    now - int(seconds)*1000000000,
+                                    now - self._maxQuery)
+
+        values = []
+        first = min(since.values(), default = now)
+
+        for k in range(first // self._period, now // self._period + 1):
+            t0 = k*self._period
+            tS = t0*1e-9
+
+            for m, metric in enumerate(hkbMetrics):
+                if metric not in since:
+                    continue
+
+                instances, value = hkbMetrics[metric]
+
+                for i, instance in enumerate(instances):
+                    t = t0 + m*1000 + i*100
+
+                    if since[metric] < t <= now:
+                        values.append([t if epoch == 'ns' else _rfc3339(t),
+                                       metric, instance, value(i, tS)])
+
+        with self._lock:
+            self._points += len(values)
+
+        if not values:
+            return {'results' : [{'statement_id' : 0}]}
+
+        return {'results' : [{'statement_id' : 0,
+                              'series'       : [{'name'    : 'HKB',
+                                                 'columns' : ['time',
+                                                              'metric',
+                                                              'instance',
+                                                              'value'],
+                                                 'values'  : values}]}]}
+
+    def lines(self, database = None):
+        with self._lock:
+            if database is not None:
+                return list(self._lines.get(database, []))
+
+            return [l for v in self._lines.values() for l in v]
+
+    def fail(self, count = 1, status = 500):
+        with self._lock:
+            self._failures.extend([status]*count)
+
+    def _nextStatus(self, ok = 204):
+        with self._lock:
+            self._requests += 1
+
+            return self._failures.pop(0) if self._failures else ok
+
+    def _store(self, database, lines):
+        with self._lock:
+            self._lines.setdefault(database, []).extend(l for l in lines if l)
+
+    def start(self):
+        self._thread = threading.Thread(target = self._srv.serve_forever,
+                                        name = 'fakeInflux',
+                                        daemon = True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._srv.shutdown()
+            self._thread = None
+
+        self._srv.server_close()
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description = "local stand-ins for "
+                                                      "the gpsLogger sources")
+    argParser.add_argument('--host', default = '127.0.0.1')
+    argParser.add_argument('--conv-port', type = int, default = 5000)
+    argParser.add_argument('--influx-port', type = int, default = None,
+                           help = "also serve an InfluxDB stand-in with "
+                                  "synthetic HKB points")
+    argParser.add_argument('--hkb-rate', type = float, default = 100.0,
+                           help = "IMU sample rate of the HKB points")
+    argParser.add_argument('--gps-port', type = int, default = None,
+                           help = "also send NMEA datagrams to this port")
+    argParser.add_argument('--gps-rate', type = float, default = 10.0,
+                           help = "datagrams per second")
+    argParser.add_argument('--gps2-share', type = float, default = 0.5,
+                           help = "share of the datagrams from gps2")
+
+    args = argParser.parse_args()
+
+    try:
+        conv = fakeConverter(args.host, args.conv_port).start()
+        print(f"Imu converter stand-in on {conv.address}")
+
+        if args.influx_port is not None:
+            influx = fakeInflux(args.host, args.influx_port,
+                                args.hkb_rate).start()
+            print(f"InfluxDB stand-in on {influx.address}")
+
+        if args.gps_port is not None:
+            nmeaBlaster(args.host, args.gps_port, args.gps_rate,
+                        args.gps2_share).start()
+            print(f"Sending NMEA to {args.host}:{args.gps_port}")
+
+        threading.Event().wait()
+
+    except KeyboardInterrupt:
+        conv.stop()
+        sys.exit("\nExiting...")
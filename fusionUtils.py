@@ -0,0 +1,130 @@
+import numpy as np
+from math import sqrt
+
+# default scales for 16-bit raw samples: +-250 deg/s gyro, the accelerometer
+# scale does not matter since only the direction of gravity is used
+gyroScaleDefault = 250.0/32768.0
+accelScaleDefault = 1.0
+
+def quatToEuler(quats):
+    # (n, 4) w, x, y, z quaternions to (n, 3) roll, pitch, yaw in degrees
+    q = np.atleast_2d(np.asarray(quats, dtype = np.float64))
+    w, x, y, z = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+
+    roll = np.arctan2(2.0*(w*x + y*z), 1.0 - 2.0*(x*x + y*y))
+    pitch = np.arcsin(np.clip(2.0*(w*y - z*x), -1.0, 1.0))
+    yaw = np.arctan2(2.0*(w*z + x*y), 1.0 - 2.0*(y*y + z*z))
+
+    return np.degrees(np.stack((roll, pitch, yaw), axis = 1))
+
+def accelAttitude(accel):
+    # (n, 3) accelerations to the (n, 4) quaternions with the same roll and
+    # pitch and null yaw
+    a = np.atleast_2d(np.asarray(accel, dtype = np.float64))
+    ax, ay, az = a[:, 0], a[:, 1], a[:, 2]
+
+    roll = np.arctan2(ay, az)/2.0
+    pitch = np.arctan2(-ax, np.hypot(ay, az))/2.0
+
+    cr, sr = np.cos(roll), np.sin(roll)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+
+    return np.stack((cr*cp, sr*cp, cr*sp, -sr*sp), axis = 1)
+
+class madgwickFilter(object):
+    def __init__(self, beta = 0.1, gyroScale = gyroScaleDefault,
+                 accelScale = accelScaleDefault, maxStep = 0.1,
+                 *args, **kwargs):
+        super(madgwickFilter, self).__init__(*args, **kwargs)
+
+        self._beta = beta
+        self._gyroScale = np.radians(gyroScale)
+        self._accelScale = accelScale
+        self._maxStep = maxStep
+        self._q = None
+        self._lastTime = None
+
+    @property
+    def quaternion(self):
+        return self._q
+
+    def reset(self):
+        self._q = None
+        self._lastTime = None
+
+    def updateBatch(self, times, gyro, accel):
+        # times in ns, gyro and accel (n, 3) raw samples; returns the (n, 4)
+        # quaternion after every sample. Unit conversion and time steps are
+        # vectorized, the filter recursion itself is sequential and runs on
+        # plain floats, which is faster than numpy on single samples
+        times = np.asarray(times, dtype = np.int64)
+
+        if len(times) == 0:
+            return np.empty((0, 4))
+
+        g = np.asarray(gyro, dtype = np.float64)*self._gyroScale
+        a = np.asarray(accel, dtype = np.float64)*self._accelScale
+
+        norms = np.sqrt((a*a).sum(axis = 1))
+        valid = norms > 0.0
+        a[valid] /= norms[valid, None]
+
+        prev = self._lastTime if self._lastTime is not None else times[0]
+        dts = np.diff(times, prepend = prev)*1e-9
+        dts = np.clip(dts, 0.0, self._maxStep)
+
+        if self._q is None:
+            self._q = tuple(accelAttitude(a[:1])[0].tolist())
+
+        q0, q1, q2, q3 = self._q
+        beta = self._beta
+        rows = []
+
+        for (gx, gy, gz, ax, ay, az, dt, ok) in zip(
+                g[:, 0].tolist(), g[:, 1].tolist(), g[:, 2].tolist(),
+                a[:, 0].tolist(), a[:, 1].tolist(), a[:, 2].tolist(),
+                dts.tolist(), valid.tolist()):
+            qDot0 = 0.5*(-q1*gx - q2*gy - q3*gz)
+            qDot1 = 0.5*(q0*gx + q2*gz - q3*gy)
+            qDot2 = 0.5*(q0*gy - q1*gz + q3*gx)
+            qDot3 = 0.5*(q0*gz + q1*gy - q2*gx)
+
+            if ok:
+                # gradient descent step towards the measured gravity
+                _2q0, _2q1, _2q2, _2q3 = 2.0*q0, 2.0*q1, 2.0*q2, 2.0*q3
+                _4q0, _4q1, _4q2 = 4.0*q0, 4.0*q1, 4.0*q2
+                _8q1, _8q2 = 8.0*q1, 8.0*q2
+                q0q0, q1q1, q2q2, q3q3 = q0*q0, q1*q1, q2*q2, q3*q3
+
+                s0 = _4q0*q2q2 + _2q2*ax + _4q0*q1q1 - _2q1*ay
+                s1 = (_4q1*q3q3 - _2q3*ax + 4.0*q0q0*q1 - _2q0*ay - _4q1 +
+                      _8q1*q1q1 + _8q1*q2q2 + _4q1*az)
+                s2 = (4.0*q0q0*q2 + _2q0*ax + _4q2*q3q3 - _2q3*ay - _4q2 +
+                      _8q2*q1q1 + _8q2*q2q2 + _4q2*az)
+                s3 = 4.0*q1q1*q3 - _2q1*ax + 4.0*q2q2*q3 - _2q2*ay
+
+                sNorm = sqrt(s0*s0 + s1*s1 + s2*s2 + s3*s3)
+
+                if sNorm > 0.0:
+                    k = beta/sNorm
+                    qDot0 -= k*s0
+                    qDot1 -= k*s1
+                    qDot2 -= k*s2
+                    qDot3 -= k*s3
+
+            q0 += qDot0*dt
+            q1 += qDot1*dt
+            q2 += qDot2*dt
+            q3 += qDot3*dt
+
+            qNorm = 1.0/sqrt(q0*q0 + q1*q1 + q2*q2 + q3*q3)
+            q0, q1, q2, q3 = q0*qNorm, q1*qNorm, q2*qNorm, q3*qNorm
+
+            rows.append((q0, q1, q2, q3))
+
+        self._q = (q0, q1, q2, q3)
+        self._lastTime = int(times[-1])
+
+        return np.array(rows)
+
+fusionBackends = {'madgwick' : madgwickFilter}
@@ -0,0 +1,140 @@
+import numpy as np
+
+# WGS84 ellipsoid
+wgs84A = 6378137.0
+wgs84F = 1.0/298.257223563
+wgs84E2 = wgs84F*(2.0 - wgs84F)
+wgs84B = wgs84A*(1.0 - wgs84F)
+# mean radius, for the great circle distances
+earthRadius = 6371008.8
+
+knotToMs = 1852.0/3600.0
+
+# All the functions take scalars or arrays of any shape (broadcast together)
+# and return arrays; angles are in degrees, distances in metres, times in
+# seconds.
+
+def ddmmToDegrees(value):
+    # NMEA [d]ddmm.mmmm (unsigned) to decimal degrees; a plain float (the
+    # parser, one field at a time) skips the array conversion
+    if not isinstance(value, float):
+        value = np.asarray(value, np.float64)
+
+    degrees = value//100.0
+
+    return degrees + (value - 100.0*degrees)/60.0
+
+def degreesToDdmm(value):
+    # inverse of ddmmToDegrees, on the absolute value: the sign is the
+    # hemisphere field of the sentence
+    value = np.abs(np.asarray(value, np.float64))
+    degrees = np.floor(value)
+
+    return 100.0*degrees + (value - degrees)*60.0
+
+def distance(lat1, lon1, lat2, lon2):
+    # haversine great circle distance
+    phi1, lam1, phi2, lam2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin(0.5*(phi2 - phi1))**2 +
+         np.cos(phi1)*np.cos(phi2)*np.sin(0.5*(lam2 - lam1))**2)
+
+    return 2.0*earthRadius*np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def bearing(lat1, lon1, lat2, lon2):
+    # initial bearing from point 1 to point 2, clockwise from north in
+    # [0, 360)
+    phi1, lam1, phi2, lam2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dLam = lam2 - lam1
+    y = np.sin(dLam)*np.cos(phi2)
+    x = np.cos(phi1)*np.sin(phi2) - np.sin(phi1)*np.cos(phi2)*np.cos(dLam)
+
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+def speedOverGround(times, lat, lon):
+    # speed (m/s) and course (degrees) between consecutive points of a
+    # track, assigned to the second point: the first one is nan. Repeated
+    # times give nan as well
+    times = np.asarray(times, np.float64)
+    lat = np.asarray(lat, np.float64)
+    lon = np.asarray(lon, np.float64)
+    speed = np.full(times.shape, np.nan)
+    course = np.full(times.shape, np.nan)
+
+    if len(times) < 2:
+        return speed, course
+
+    dt = np.diff(times)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        speed[1:] = np.where(dt > 0.0,
+                             distance(lat[:-1], lon[:-1], lat[1:], lon[1:])/dt,
+                             np.nan)
+
+    course[1:] = bearing(lat[:-1], lon[:-1], lat[1:], lon[1:])
+
+    return speed, course
+
+def geodeticToECEF(lat, lon, alt):
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    sinPhi = np.sin(phi)
+    cosPhi = np.cos(phi)
+    n = wgs84A/np.sqrt(1.0 - wgs84E2*sinPhi*sinPhi)
+
+    return ((n + alt)*cosPhi*np.cos(lam),
+            (n + alt)*cosPhi*np.sin(lam),
+            (n*(1.0 - wgs84E2) + alt)*sinPhi)
+
+def ecefToGeodetic(x, y, z):
+    # Bowring's method: one iteration is below a millimetre on the ground
+    x, y, z = (np.asarray(v, np.float64) for v in (x, y, z))
+    ep2 = (wgs84A*wgs84A - wgs84B*wgs84B)/(wgs84B*wgs84B)
+    p = np.hypot(x, y)
+    theta = np.arctan2(z*wgs84A, p*wgs84B)
+    phi = np.arctan2(z + ep2*wgs84B*np.sin(theta)**3,
+                     p - wgs84E2*wgs84A*np.cos(theta)**3)
+    sinPhi = np.sin(phi)
+    n = wgs84A/np.sqrt(1.0 - wgs84E2*sinPhi*sinPhi)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        alt = np.where(np.abs(np.cos(phi)) > 1e-10,
+                       p/np.cos(phi) - n,
+                       np.abs(z) - wgs84B)
+
+    return np.degrees(phi), np.degrees(np.arctan2(y, x)), alt
+
+def _enuRotation(lat0, lon0):
+    phi = np.radians(lat0)
+    lam = np.radians(lon0)
+    sPhi, cPhi, sLam, cLam = np.sin(phi), np.cos(phi), np.sin(lam), np.cos(lam)
+
+    return np.array([[-sLam,       cLam,       0.0],
+                     [-sPhi*cLam, -sPhi*sLam, cPhi],
+                     [ cPhi*cLam,  cPhi*sLam, sPhi]])
+
+def ecefToENU(x, y, z, lat0, lon0, alt0):
+    # east, north, up of ECEF points around a scalar reference position
+    x0, y0, z0 = geodeticToECEF(lat0, lon0, alt0)
+    r = _enuRotation(lat0, lon0)
+    d = np.stack(np.broadcast_arrays(np.asarray(x) - x0,
+                                     np.asarray(y) - y0,
+                                     np.asarray(z) - z0))
+    e, n, u = np.tensordot(r, d, 1)
+
+    return e, n, u
+
+def enuToECEF(e, n, u, lat0, lon0, alt0):
+    x0, y0, z0 = geodeticToECEF(lat0, lon0, alt0)
+    r = _enuRotation(lat0, lon0)
+    d = np.stack(np.broadcast_arrays(np.asarray(e, np.float64),
+                                     np.asarray(n, np.float64),
+                                     np.asarray(u, np.float64)))
+    x, y, z = np.tensordot(r.T, d, 1)
+
+    return x + x0, y + y0, z + z0
+
+def geodeticToENU(lat, lon, alt, lat0, lon0, alt0):
+    return ecefToENU(*geodeticToECEF(lat, lon, alt), lat0, lon0, alt0)
+
+def enuToGeodetic(e, n, u, lat0, lon0, alt0):
+    return ecefToGeodetic(*enuToECEF(e, n, u, lat0, lon0, alt0))
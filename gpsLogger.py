@@ -1,17 +1,97 @@
 #!/usr/bin/python3
 
-import sys
-from graphUtils import gpsPlotter
+import os, sys, argparse
+from time import monotonic
 
 if __name__ == '__main__':
+    argParser = argparse.ArgumentParser(description = "GPS and IMU logger")
+    argParser.add_argument('--headless', action = 'store_true',
+                           help = "acquisition and metrics endpoint only, "
+                                  "without plots")
+    argParser.add_argument('--metrics-host', default = '127.0.0.1',
+                           help = "address of the metrics endpoint")
+    argParser.add_argument('--metrics-port', type = int, default = 9108,
+                           help = "port of the metrics endpoint, 0 to "
+                                  "disable it")
+    argParser.add_argument('--log', default = None, metavar = 'PREFIX',
+                           help = "record the session under PREFIX")
+    argParser.add_argument('--influx', default = None, metavar = 'HOST:PORT',
+                           help = "write the fixes and the converted "
+                                  "orientation to this InfluxDB")
+    argParser.add_argument('--influx-db', default = 'spbmonitor',
+                           help = "database of the written points")
+    argParser.add_argument('--publish', default = None, metavar = 'NAME',
+                           help = "publish the state in the shared memory "
+                                  "segment NAME (with --headless)")
+    argParser.add_argument('--subscribe', default = None, metavar = 'NAME',
+                           help = "plot the state published in NAME instead "
+                                  "of acquiring it")
+    argParser.add_argument('--summary', type = float, default = 0,
+                           metavar = 'SECONDS',
+                           help = "print the state and the stage latencies "
+                                  "every SECONDS instead of every loop")
+
+    args = argParser.parse_args()
+    sink = None
+
+    # the plotting path has no publisher
+    if args.publish is not None and not args.headless:
+        argParser.error("--publish needs --headless")
+
+    if args.influx is not None:
+        from sinkUtils import influxSink
+
+        host, _, port = args.influx.partition(':')
+        sink = influxSink(host, int(port or 8086), args.influx_db)
+
+    # matplotlib and Basemap are imported only for the plots
+    if args.headless:
+        from daemonUtils import runHeadless
+
+        runHeadless(metricsHost = args.metrics_host,
+                    metricsPort = args.metrics_port or None,
+                    logFileName = args.log, gpsSink = sink, imuSink = sink,
+                    summaryInterval = args.summary or None,
+                    publish = args.publish)
+
+        if sink is not None:
+            sink.close()
+
+        sys.exit(0)
+
+    from graphUtils import gpsPlotter
+    from shmUtils import sharedPlotter
+
+    plotArgs = {'threaded'     : True,
+                'frameRate'    : 10,
+                'blit'         : True,
+                'mapCacheDir'  : os.path.expanduser("~/.cache/gpsLogger"),
+                'logFileName'  : args.log}
+
     try:
-        gps = gpsPlotter()
+        if args.subscribe is not None:
+            gps = sharedPlotter(args.subscribe, **plotArgs)
+        else:
+            gps = gpsPlotter(batched = True, rcvBufSize = 1 << 20,
+                             gpsSink = sink, imuSink = sink, **plotArgs)
+
+        nextSummary = monotonic()
 
         while True:
             gps.update()
 
-            print(gps)
-  
+            if not args.summary:
+                print(gps)
+            elif monotonic() >= nextSummary:
+                from perfUtils import perf
+
+                print(f"{gps}\n{perf.summary()}\n")
+                nextSummary += args.summary
+
     except KeyboardInterrupt:
         gps.close()
+
+        if sink is not None:
+            sink.close()
+
         sys.exit("\nExiting...")
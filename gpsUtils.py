@@ -1,137 +1,419 @@
-import re
+import sys, struct
+import numpy as np
 from numpy import nan
-import socket
+import socket, select, threading
+from time import time_ns, monotonic, perf_counter_ns
+from collections import namedtuple, deque
+from nmeaUtils import nmeaParser, receiverIDs
+from receiverUtils import receiverStore
+from perfUtils import perf
+from sourceUtils import notAvailable
 
-numericPattern = "[+-]?[0-9]*\.?[0-9]+"
+# Linux only: the kernel attaches the cumulative count of datagrams dropped
+# on a full receive queue to every datagram read with recvmsg
+SO_RXQ_OVFL = getattr(socket, 'SO_RXQ_OVFL',
+                      40 if sys.platform.startswith('linux') else None)
 
-gpsPattern = "(gps1|gps2),\s*(.*)"
-gpsRegex = re.compile(gpsPattern)
+# Windows: recvfrom into a too small buffer fails and discards the datagram
+WSAEMSGSIZE = 10040
 
-gpsDataPattern = "(\d*),"
-gpsDataRegex = re.compile(gpsDataPattern)
+# immutable snapshot of the last parsed fix: the receiver thread replaces it
+# as a whole, so readers never see fields coming from different datagrams
+gpsFix = namedtuple('gpsFix', ['receiver', 'time', 'sod',
+                               'latitude', 'longitude', 'altitude',
+                               'yaw', 'tilt',
+                               'quality', 'satellites', 'hdop'])
 
-orientationPattern = (f"\$PTNL,AVR,(?:{numericPattern}),"
-                      f"({numericPattern}),Yaw,({numericPattern}),Tilt")
-orientationRegex = re.compile(orientationPattern)
+emptyFix = gpsFix(None, "", nan, nan, nan, nan, nan, nan, -1, -1, nan)
 
-positionPattern = (f"\$GPGGA,({numericPattern})," # timestamp
-                   f"({numericPattern}),(N|S),"   # latitude
-                   f"({numericPattern}),(W|E),"   # longitude
-                   f"({numericPattern}),"         # fix quality
-                   f"({numericPattern}),"         # number of satellites
-                   f"({numericPattern}),"         # hdop
-                   f"({numericPattern}),M")       # altitude
-positionRegex = re.compile(positionPattern)
+# fixed-width record of a fix, stamped with the reception time in ns
+fixDtype = np.dtype([('time', '<i8'),
+                     ('receiver', 'S4'),
+                     ('sod', '<f8'),
+                     ('latitude', '<f8'),
+                     ('longitude', '<f8'),
+                     ('altitude', '<f8'),
+                     ('yaw', '<f8'),
+                     ('tilt', '<f8'),
+                     ('quality', '<i2'),
+                     ('satellites', '<i2'),
+                     ('hdop', '<f8')])
 
-gpsTimePattern = "(\d\d)(\d\d)(\d\d).00"
-gpsTimeRegex = re.compile(gpsTimePattern)
+_dayNs = 86400*1000000000
+
+def sodToEpochNs(sod, received = None):
+    # NMEA times carry the seconds of the day only: date them with the UTC
+    # day that puts them closest to their reception time in ns (now by
+    # default), so a fix from just before midnight stays there. Scalars on
+    # the receiver thread, arrays for recordings and replays
+    received = time_ns() if received is None else received
+
+    if isinstance(sod, np.ndarray) or isinstance(received, np.ndarray):
+        sodNs = np.round(np.asarray(sod, np.float64)*1e9).astype(np.int64)
+        received = np.asarray(received, np.int64)
+        t = received - received % _dayNs + sodNs
+        t = np.where(t - received > _dayNs//2, t - _dayNs, t)
+
+        return np.where(received - t > _dayNs//2, t + _dayNs, t)
+
+    t = received - received % _dayNs + round(sod*1e9)
+
+    if t - received > _dayNs//2:
+        t -= _dayNs
+    elif received - t > _dayNs//2:
+        t += _dayNs
+
+    return t
 
 class gpsLogger(object):
     def __init__(self, localIP = "0.0.0.0", localPort = 6003, 
-                 bufSize = 1024, *args, **kwargs):
+                 bufSize = 1024, batched = False, rcvBufSize = None,
+                 maxBatch = 256, requireChecksum = True, historySize = 1024,
+                 recorder = None, receivers = receiverIDs, staleAfter = 3.0,
+                 fuseReceivers = False, gpsSink = None, *args, **kwargs):
         super(gpsLogger, self).__init__(*args, **kwargs)
 
-        self._netlogger = socket.socket(family=socket.AF_INET,
-                                        type=socket.SOCK_DGRAM)
+        self._netlogger = None
+
+        if localPort is not None:
+            self._netlogger = socket.socket(family=socket.AF_INET,
+                                            type=socket.SOCK_DGRAM)
         
+        self._batched = batched
+        self._maxBatch = maxBatch
+        self._ovflEnabled = False
+
         if self._netlogger is not None:
+            if rcvBufSize is not None:
+                self._netlogger.setsockopt(socket.SOL_SOCKET,
+                                           socket.SO_RCVBUF, rcvBufSize)
+
+            if batched:
+                self._netlogger.setblocking(False)
+
+                if (sys.platform.startswith('linux') and
+                    SO_RXQ_OVFL is not None and
+                    hasattr(self._netlogger, 'recvmsg')):
+                    try:
+                        self._netlogger.setsockopt(socket.SOL_SOCKET,
+                                                   SO_RXQ_OVFL, 1)
+                        self._ovflEnabled = True
+                    except OSError:
+                        pass
+
             self._netlogger.bind((localIP, localPort))
         
         self._bufSize = bufSize
+        self._nmeaParser = nmeaParser(receivers,
+                                      requireChecksum = requireChecksum)
+        self._receivers = receiverStore(staleAfter)
+        self._fuseReceivers = fuseReceivers
+        self._rxCounters = {'received' : 0,
+                            'parsed'   : 0,
+                            'rejected' : 0,
+                            'dropped'  : 0,
+                            'errors'   : 0}
+        self._lastError = None
         self._lastMsgAddrPair = None
         self._lastMsg = None
         self._lastAddr = None
-        self._lastTime = ""
-        self._lastLong = nan
-        self._lastLat = nan
-        self._lastYaw = nan
-        self._lastTilt = nan
-        self._lastAlt = nan
-        self._lastGPS = None
+        self._fix = emptyFix
+        self._fixHistory = deque(maxlen = historySize)
+        self._rxThread = None
+        self._rxRunning = False
+        self._gpsRecorder = recorder
+        self._gpsSink = gpsSink
+
+        if recorder is not None:
+            recorder.addStream('gps', fixDtype)
+
+    @property
+    def fix(self):
+        # best solution among the live receivers
+        return self._fix
+
+    @property
+    def sources(self):
+        gps = 'ready' if self._fix.time != '' else notAvailable
+
+        return dict(getattr(super(gpsLogger, self), 'sources', {}),
+                    gps = gps)
+
+    @property
+    def receivers(self):
+        return self._receivers
 
     @property
     def time(self):
-        return self._lastTime
+        return self._fix.time
 
     @property
     def longitude(self):
-        return self._lastLong
+        return self._fix.longitude
 
     @property
     def latitude(self):
-        return self._lastLat
+        return self._fix.latitude
 
     @property
     def yaw(self):
-        return self._lastYaw
+        return self._fix.yaw
 
     @property
     def tilt(self):
-        return self._lastTilt
+        return self._fix.tilt
 
     @property
     def altitude(self):
-        return self._lastAlt
+        return self._fix.altitude
+
+    @property
+    def counters(self):
+        return dict(self._rxCounters)
+
+    @property
+    def lastError(self):
+        # the last exception raised while handling a datagram
+        return self._lastError
+
+    @property
+    def parserCounters(self):
+        return self._nmeaParser.counters
+
+    def _receive(self, ancSize = 0):
+        # one datagram: data, ancillary data, address and whether it was
+        # longer than bufSize. Without recvmsg MSG_TRUNC is not reported:
+        # reading one byte more tells a truncated datagram
+        if hasattr(self._netlogger, 'recvmsg'):
+            data, ancData, flags, addr = self._netlogger.recvmsg(
+                                            self._bufSize, ancSize)
+
+            return data, ancData, addr, bool(flags & socket.MSG_TRUNC)
+
+        try:
+            data, addr = self._netlogger.recvfrom(self._bufSize + 1)
+        except OSError as e:
+            if getattr(e, 'winerror', None) != WSAEMSGSIZE:
+                raise
+
+            return b'', [], None, True
+
+        return data, [], addr, len(data) > self._bufSize
 
     def _collectGPSData(self):
         if self._netlogger is not None:
-            self._lastMsgAddrPair = self._netlogger.recvfrom(self._bufSize)
+            data, _, addr, truncated = self._receive()
+            self._rxCounters['received'] += 1
+
+            if truncated:
+                self._rxCounters['rejected'] += 1
+                return []
+
+            self._lastMsgAddrPair = (data, addr)
 
         if self._lastMsgAddrPair is not None:
-            self._lastMsg = self._lastMsgAddrPair[0].decode('utf-8')
+            self._lastMsg = self._lastMsgAddrPair[0].decode('utf-8',
+                                                            errors='replace')
             self._lastAddr = self._lastMsgAddrPair[1]
 
+            return [self._lastMsg]
+
+        return []
+
+    def _drainGPSData(self):
+        # recvmmsg is not exposed by the socket module: empty the receive
+        # queue with non blocking reads instead, up to maxBatch per call
+        msgs = []
+        ancSize = socket.CMSG_SPACE(4) if self._ovflEnabled else 0
+
+        while len(msgs) < self._maxBatch:
+            try:
+                data, ancData, addr, truncated = self._receive(ancSize)
+            except (BlockingIOError, InterruptedError):
+                break
+
+            self._rxCounters['received'] += 1
+
+            for level, kind, cData in ancData:
+                if level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL:
+                    self._rxCounters['dropped'] = struct.unpack('I',
+                                                                cData[:4])[0]
+
+            if truncated:
+                self._rxCounters['rejected'] += 1
+                continue
+
+            self._lastMsgAddrPair = (data, addr)
+            self._lastMsg = data.decode('utf-8', errors='replace')
+            self._lastAddr = addr
+
+            msgs.append(self._lastMsg)
+
+        return msgs
+
+    def drainFixes(self):
+        fixes = []
+
+        # popleft is atomic, the receiver thread may keep appending meanwhile
+        try:
+            while True:
+                fixes.append(self._fixHistory.popleft())
+        except IndexError:
+            pass
+
+        return fixes
+
+    def _receiveLoop(self, pollInterval):
+        while self._rxRunning:
+            try:
+                ready, _, _ = select.select([self._netlogger], [], [],
+                                            pollInterval)
+            except (OSError, ValueError):
+                break
+
+            if not ready:
+                continue
+
+            # nothing raised by a read may stop the thread: the fix would
+            # freeze without a word
+            try:
+                self._readGPS()
+            except Exception as e:
+                self._countError(e)
+
+    def start(self, pollInterval = 0.5):
+        if self._rxThread is not None or self._netlogger is None:
+            return
+
+        self._rxRunning = True
+        self._rxThread = threading.Thread(target = self._receiveLoop,
+                                          args = (pollInterval,),
+                                          name = 'gpsReceiver',
+                                          daemon = True)
+        self._rxThread.start()
+
+    def stop(self):
+        if self._rxThread is None:
+            return
+
+        self._rxRunning = False
+        self._rxThread.join()
+        self._rxThread = None
+
     def updateGPS(self):
-        gpsTimeStr = ""
-        longitude = nan
-        latitude = nan
-        yaw = nan
-        tilt = nan
-
-        self._collectGPSData()
-
-        gpsData = gpsRegex.findall(self._lastMsg)
-
-        for g in gpsData:
-            gpsStr = g[1].replace('\n',' ')
-            
-            self._lastGPS = g[0].upper()
-
-            gpsOrientData = orientationRegex.findall(gpsStr)
-            if gpsOrientData != []:
-                data = gpsOrientData[0]
-                yaw = float(data[0] or nan)
-                tilt = float(data[1] or nan)
-                self._lastYaw  = yaw
-                self._lastTilt = tilt
-
-            gpsPositionData = positionRegex.findall(gpsStr)
-            if gpsPositionData != []:
-                data = gpsPositionData[0]
-                gpsTime = gpsTimeRegex.findall(data[0])[0]
-                gpsTimeStr = f"{gpsTime[0]}:{gpsTime[1]}:{gpsTime[2]}"
-
-                latSig = -1 if data[2] == 'S' else 1
-                latitude = latSig*float(data[1] or nan)/100.0
-                
-                longSig = -1 if data[4] == 'W' else 1
-                longitude = longSig*float(data[3] or nan)/100.0
-
-                altitude = float(data[8] or nan)
-
-                self._lastTime = gpsTimeStr
-                self._lastLong = longitude
-                self._lastLat  = latitude
-                self._lastAlt  = altitude
+        # with the receiver thread running the fix is kept up to date in the
+        # background: readers just pick the latest snapshot
+        if self._rxThread is None and self._netlogger is not None:
+            self._readGPS()
+
+    def _readGPS(self):
+        t0 = perf_counter_ns()
+
+        if self._batched and self._netlogger is not None:
+            msgs = self._drainGPSData()
+        else:
+            msgs = self._collectGPSData()
+
+        t0 = perf.since('gps.recv', t0)
+
+        for msg in msgs:
+            # a failing subscriber or sink costs the datagram, not the batch
+            try:
+                parsed = self._parseGPSMessage(msg)
+            except Exception as e:
+                self._countError(e)
+                continue
+
+            if parsed:
+                self._rxCounters['parsed'] += 1
+            else:
+                self._rxCounters['rejected'] += 1
+
+            t0 = perf.since('gps.parse', t0)
+
+    def _countError(self, error):
+        self._rxCounters['errors'] += 1
+        self._lastError = f"{type(error).__name__}: {error}"
+
+    def _handleDatagram(self, data, addr):
+        # entry point for transports that deliver datagrams themselves
+        self._rxCounters['received'] += 1
+
+        self._lastMsgAddrPair = (data, addr)
+        self._lastMsg = data.decode('utf-8', errors='replace')
+        self._lastAddr = addr
+        t0 = perf_counter_ns()
+
+        # called from the event loop by the datagram protocol: an exception
+        # would only be logged by asyncio, it is counted as in _readGPS()
+        try:
+            parsed = self._parseGPSMessage(self._lastMsg)
+        except Exception as e:
+            self._countError(e)
+            return
+
+        if parsed:
+            self._rxCounters['parsed'] += 1
+        else:
+            self._rxCounters['rejected'] += 1
+
+        perf.since('gps.parse', t0)
+
+    def _parseGPSMessage(self, msg):
+        if self._nmeaParser.parse(msg) == 0:
+            return False
+
+        now = monotonic()
+
+        for receiver in self._nmeaParser.updated:
+            rec = self._nmeaParser.records[receiver]
+
+            self._handleFix(gpsFix(receiver.upper(), rec['time'],
+                                   rec['sod'],
+                                   rec['latitude'], rec['longitude'],
+                                   rec['altitude'],
+                                   rec['yaw'], rec['tilt'],
+                                   rec['quality'], rec['satellites'],
+                                   rec['hdop']), now)
+
+        return True
+
+    def _handleFix(self, fix, now = None):
+        # entry point for sources delivering fixes already parsed: the
+        # history and the recorder get every receiver fix, fix the best one.
+        # Both are updated before the subscribers are called, so that they
+        # see the state the fix belongs to
+        now = monotonic() if now is None else now
+
+        self._receivers.update(fix, now, notify = False)
+        self._fixHistory.append(fix)
+
+        self._fix = self._receivers.best(now, self._fuseReceivers) or fix
+        self._receivers.notify(fix)
+
+        if self._gpsRecorder is not None:
+            self._gpsRecorder.record('gps', (time_ns(), fix.receiver,
+                                             fix.sod, fix.latitude,
+                                             fix.longitude, fix.altitude,
+                                             fix.yaw, fix.tilt, fix.quality,
+                                             fix.satellites, fix.hdop))
+
+        if self._gpsSink is not None:
+            self._gpsSink.writeFix(fix, self._fix)
 
     def __str__(self):
-        return (f"({self._lastGPS}) "
-                f"T = {self._lastTime} "
-                f"LONG = {self._lastLong:.5f} "
-                f"LAT = {self._lastLat:.5f} "
-                f"YAW = {self._lastYaw:.3f} "
-                f"TILT = {self._lastTilt:.3f} "
-                f"ALTITUDE = {self._lastAlt:.3f}")
+        fix = self._fix
+
+        return (f"({fix.receiver}) "
+                f"T = {fix.time} "
+                f"LONG = {fix.longitude:.5f} "
+                f"LAT = {fix.latitude:.5f} "
+                f"YAW = {fix.yaw:.3f} "
+                f"TILT = {fix.tilt:.3f} "
+                f"ALTITUDE = {fix.altitude:.3f}")
 
     def close(self):
-        self._netlogger.close()
+        self.stop()
+
+        if self._netlogger is not None:
+            self._netlogger.close()
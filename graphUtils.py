@@ -1,40 +1,201 @@
+import os, zipfile
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as grd
 import numpy as np
-from matplotlib.ticker import FormatStrFormatter
-from mpl_toolkits.basemap import Basemap
+from matplotlib.ticker import FormatStrFormatter, FuncFormatter
+from matplotlib.collections import LineCollection
 from datetime import datetime
-from time import strptime
-from gpsUtils import gpsLogger
+from time import monotonic, perf_counter_ns
+from collections import deque
+from gpsUtils import gpsLogger, sodToEpochNs, fixDtype
 from imuUtils import imuLogger, queries
+from ringUtils import ringBuffer
+from lodUtils import minMaxLOD, bucketWidth
+from perfUtils import perf
+from sourceUtils import lazySource
+
+mapArgs = {'projection' : 'merc',
+           'llcrnrlat'  : -80,
+           'urcrnrlat'  : 80,
+           'llcrnrlon'  : -180,
+           'urcrnrlon'  : 180,
+           'lat_ts'     : 20}
+
+# Basemap instances and reprojected relief rasters, keyed by projection and
+# extent: both are expensive to build and never change for a given map
+_basemaps = {}
+_reliefs = {}
+
+def _mapKey(args, *extra):
+    return "_".join([f"{k}{args[k]}" for k in sorted(args)] +
+                    [str(e) for e in extra])
+
+def _loadCache(path, loader):
+    try:
+        with open(path, 'rb') as f:
+            return loader(f)
+    except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile):
+        return None
+
+def _saveCache(path, saver):
+    # write and rename, a reader never sees a partial file
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+
+        with open(f"{path}.tmp", 'wb') as f:
+            saver(f)
+
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass
+
+def _loadSegments(f):
+    with np.load(f, allow_pickle = False) as npz:
+        return np.split(npz['points'], npz['ends'][:-1])
+
+def _saveSegments(f, segments):
+    np.savez(f, points = np.concatenate(segments),
+             ends = np.cumsum([len(s) for s in segments]))
+
+def cachedBasemap(cacheDir = None, **args):
+    # the Basemap is built without boundary data (milliseconds) and comes
+    # with its projected coastline segments: projecting those is the
+    # expensive part, they are cached as plain arrays
+    key = _mapKey(args)
+    cached = _basemaps.get(key)
+
+    if cached is not None:
+        return cached
+
+    # the import alone takes a good part of a second
+    from mpl_toolkits.basemap import Basemap
+
+    path = (os.path.join(cacheDir, f"coastlines-{key}.npz")
+            if cacheDir is not None else None)
+    coastlines = _loadCache(path, _loadSegments) if path is not None else None
+
+    if coastlines is None:
+        coastlines = [np.asarray(s, np.float64)
+                      for s in Basemap(**args).coastsegs]
+
+        if path is not None:
+            _saveCache(path, lambda f: _saveSegments(f, coastlines))
+
+    cached = _basemaps[key] = (Basemap(**dict(args, resolution = None)),
+                               coastlines)
+
+    return cached
+
+def _removeContours(contours):
+    # ContourSet.remove only exists since matplotlib 3.8
+    if hasattr(contours, 'remove'):
+        contours.remove()
+    else:
+        for collection in contours.collections:
+            collection.remove()
+
+def drawRelief(bmap, ax, args, scale = 0.2, cacheDir = None):
+    # shadedrelief reprojects the whole image (seconds), imshow of the
+    # already projected raster takes milliseconds
+    key = _mapKey(args, f"scale{scale}")
+    raster = _reliefs.get(key)
+    path = (os.path.join(cacheDir, f"relief-{key}.npy")
+            if cacheDir is not None else None)
+
+    if raster is None and path is not None:
+        raster = _loadCache(path, lambda f: np.load(f, allow_pickle = False))
+
+    if raster is None:
+        im = bmap.shadedrelief(ax = ax, scale = scale)
+        raster = (np.ma.filled(im.get_array(), 0.0)*255.0).round()
+        raster = raster.astype(np.uint8)
+
+        if path is not None:
+            _saveCache(path, lambda f: np.save(f, raster))
+    else:
+        bmap.imshow(raster, ax = ax)
+
+    _reliefs[key] = raster
+
+# plotted history, times are epoch seconds
+gpsHistoryDtype = np.dtype([('time', np.float64),
+                            ('altitude', np.float64),
+                            ('tilt', np.float64),
+                            ('yaw', np.float64),
+                            ('longitude', np.float64),
+                            ('latitude', np.float64),
+                            ('x', np.float64),
+                            ('y', np.float64)])
+
+imuHistoryDtype = np.dtype([('time', np.float64),
+                            ('roll', np.float64),
+                            ('pitch', np.float64),
+                            ('yaw', np.float64),
+                            ('q1', np.float64),
+                            ('q2', np.float64),
+                            ('q3', np.float64),
+                            ('q4', np.float64)])
+
+def _sodToStr(t, pos = None):
+    t = int(t) % 86400
+
+    return f"{t // 3600:02d}:{(t // 60) % 60:02d}:{t % 60:02d}"
 
 class gpsPlotter(gpsLogger, imuLogger):
-    def __init__(self, localIP = "0.0.0.0", localPort = 6003):
+    def __init__(self, localIP = "0.0.0.0", localPort = 6003,
+                 batched = False, rcvBufSize = None,
+                 threaded = False, frameRate = None, blit = False,
+                 figSize = (50, 50), mapCacheDir = None,
+                 nightshadeInterval = 60.0, plotPoints = 36000,
+                 plotInterval = 1, lod = True, lazy = True, mapWait = 10.0,
+                 **kwargs):
+        loggerArgs = {'dbHost'        : 'calibano.ba.infn.it',
+                      'dbPort'        : 8086,
+                      'dbQueries'     : queries,
+                      'database'      : 'spbmonitor',
+                      'queryInterval' : 2,
+                      'convHost'      : '127.0.0.1',
+                      'convPort'      : 5000,
+                      'logFileName'   : None,
+                      'bufSize'       : 1024,
+                      'lazy'          : lazy}
+        loggerArgs.update(kwargs)
+
         super(gpsPlotter, self).__init__(localIP = localIP,
                                          localPort = localPort,
-                                         dbHost = 'calibano.ba.infn.it',
-                                         dbPort = 8086,
-                                         dbQueries = queries,
-                                         database='spbmonitor',
-                                         queryInterval = 2, 
-                                         convHost = '127.0.0.1', 
-                                         convPort = 5000,
-                                         logFileName = None,
-                                         bufSize = 1024)
-
-        self._tArr = []
-        self._altArr = []
-        self._gpsTiltArr = []
-        self._gpsYawArr = []
-        self._rollArr = []
-        self._pitchArr = []
-        self._yawArr = []
-        self._imuTArr = []
-        self._quaternionsArr = []
-        self._tm = 0
-        self._imuTM = 0
-
-        self._fig = plt.figure(figsize=(50, 50))
+                                         batched = batched,
+                                         rcvBufSize = rcvBufSize,
+                                         **loggerArgs)
+
+        # with a logFileName the GPS fixes go to the same session
+        if self._gpsRecorder is None and self._imuRecorder is not None:
+            self._gpsRecorder = self._imuRecorder
+            self._gpsRecorder.addStream('gps', fixDtype)
+
+        # fixes are received while the figure is being built
+        if threaded:
+            self.start()
+
+        # one row every plotInterval seconds, the oldest are overwritten
+        # once plotPoints rows are stored: ten hours by default, the LOD
+        # keeps the drawn points to the axes width
+        self._gpsHistory = ringBuffer(gpsHistoryDtype, plotPoints)
+        self._imuHistory = ringBuffer(imuHistoryDtype, plotPoints)
+        self._plotInterval = plotInterval
+        self._lastGPSFix = None
+        self._lod = lod
+        self._lods = {}
+        self._frameInterval = 1.0/frameRate if frameRate else 0.0
+        self._frameStart = monotonic()
+        self._lastFrame = None
+        self._frameStats = deque(maxlen = 100)
+        self._blit = blit
+        self._mapCacheDir = mapCacheDir
+        self._nightshadeInterval = nightshadeInterval
+        self._nightshade = None
+        self._nightshadeTime = None
+
+        self._fig = plt.figure(figsize=figSize)
         self._grid = grd.GridSpec(2, 2)
 
         self._axND = plt.Subplot(self._fig, self._grid[0])
@@ -87,147 +248,340 @@ class gpsPlotter(gpsLogger, imuLogger):
         self._axOrientYaw.yaxis.set_major_formatter(FormatStrFormatter('%.2f'))
         self._fig.add_subplot(self._axOrientYaw)
 
-        self._mPos = Basemap(projection='merc',
-                             llcrnrlat=-80, urcrnrlat=80,
-                             llcrnrlon=-180, urcrnrlon=180,
-                             lat_ts=20, ax = self._axPos)
+        self._axAlt.xaxis.set_major_formatter(FuncFormatter(_sodToStr))
+        self._axOrientRoll.xaxis.set_major_formatter(FuncFormatter(_sodToStr))
+
+        self._curPosLine = self._axND.plot([], [], 'r.', animated = blit)[0]
+        self._initLines()
+
+        # both axes show the same map: one Basemap serves the two of them.
+        # Lazy, it is built in the background (seconds without a cache) and
+        # drawn by the first update after it is ready
+        self._mPos = None
+        self._mND = None
+        self._coastlines = None
+        self._mapSource = lazySource('map', lambda: cachedBasemap(
+                                                        mapCacheDir,
+                                                        **mapArgs))
+
+        # the first full draw of the figure takes about half a second: it
+        # waits for the map, mapWait seconds at most
+        self._mapDeadline = monotonic() + mapWait if lazy else 0.0
+
+        if lazy:
+            self._mapSource.start()
+        else:
+            self._mapSource.open()
+            self._installMap()
 
-        self._mPos.shadedrelief(scale=0.2)
-        self._mPos.drawcoastlines(color='white', linewidth=0.2)
-        self._mPos.drawparallels(np.arange(-90,90,30),labels=[1,0,0,0])
+        plt.ion()
+
+    @property
+    def fps(self):
+        # loop rate and pure drawing cost over the last frames
+        if not self._frameStats:
+            return np.nan
+
+        return len(self._frameStats)/sum(f[0] for f in self._frameStats)
+
+    @property
+    def renderTime(self):
+        if not self._frameStats:
+            return np.nan
+
+        return sum(f[1] for f in self._frameStats)/len(self._frameStats)
+
+    def _initLines(self):
+        # one artist per series, its data replaced every frame. With blit
+        # they are animated artists redrawn over the cached axes backgrounds
+        def line(ax, style):
+            return ax.plot([], [], style, animated = self._blit)[0]
+
+        self._trackLine = line(self._axPos, 'r.:')
+
+        self._seriesLines = [(self._axAlt, line(self._axAlt, 'r.:')),
+                             (self._axTilt, line(self._axTilt, 'r.:')),
+                             (self._axYaw, line(self._axYaw, 'r.:')),
+                             (self._axOrientRoll,
+                              line(self._axOrientRoll, 'r.:')),
+                             (self._axOrientPitch,
+                              line(self._axOrientPitch, 'r.:')),
+                             (self._axOrientYaw,
+                              line(self._axOrientYaw, 'r.:'))]
+
+        self._blitArtists = ([(self._axND, self._curPosLine),
+                              (self._axPos, self._trackLine)] +
+                             self._seriesLines)
+        self._backgrounds = None
+
+    def _fitLimits(self, ax, artist):
+        x, y = artist.get_data()
+        x = np.asarray(x, dtype = float)
+        y = np.asarray(y, dtype = float)
+        ok = np.isfinite(x) & np.isfinite(y)
+
+        if not ok.any():
+            return False
+
+        x, y = x[ok], y[ok]
+        xMin, xMax, yMin, yMax = x.min(), x.max(), y.min(), y.max()
+        x0, x1 = ax.get_xlim()
+        y0, y1 = ax.get_ylim()
+        changed = False
+
+        # limits only move when data leaves them or fills less than a third
+        # of them: every change costs a full redraw of the backgrounds
+        xSpan = max(xMax - xMin, 10.0)
+        if xMin < x0 or xMax > x1 or (x1 - x0) > 3*xSpan:
+            ax.set_xlim(xMin - 0.05*xSpan, xMax + 0.5*xSpan)
+            changed = True
+
+        ySpan = max(yMax - yMin, 1e-3)
+        if yMin < y0 or yMax > y1 or (y1 - y0) > 3*ySpan + 2e-3:
+            ax.set_ylim(yMin - 0.2*ySpan, yMax + 0.2*ySpan)
+            changed = True
+
+        return changed
+
+    def _decimated(self, name, rows, fields, ax):
+        # min/max decimation down to about two points per pixel column of
+        # the axes. The time axes are always fitted to the whole history, so
+        # its span is the visible range
+        if not self._lod or len(rows) < 2:
+            return rows
+
+        lod = self._lods.get(name)
+
+        if lod is None:
+            lod = self._lods[name] = minMaxLOD(fields)
+
+        width = bucketWidth(rows['time'][-1] - rows['time'][0],
+                            ax.bbox.width)
+
+        return lod.update(rows, width)
+
+    def _setLineData(self):
+        # the decimated histories into the artists: True when the terminator
+        # or the axes limits moved, which takes a full redraw
+        gps = self._gpsHistory.view()
+        imu = self._imuHistory.view()
+
+        if len(gps):
+            track = self._decimated(('gps', 'track'), gps, ('x', 'y'),
+                                    self._axPos)
+
+            self._curPosLine.set_data(gps['x'][-1:], gps['y'][-1:])
+            self._trackLine.set_data(track['x'], track['y'])
+
+        series = [('gps', gps, 'altitude'),
+                  ('gps', gps, 'tilt'),
+                  ('gps', gps, 'yaw'),
+                  ('imu', imu, 'roll'),
+                  ('imu', imu, 'pitch'),
+                  ('imu', imu, 'yaw')]
+
+        stale = self._updateNightshade()
+
+        for (ax, artist), (name, rows, field) in zip(self._seriesLines,
+                                                     series):
+            rows = self._decimated((name, field), rows, (field,), ax)
+
+            artist.set_data(rows['time'], rows[field])
+            stale = self._fitLimits(ax, artist) or stale
+
+        return stale
+
+    def _updateBlit(self):
+        stale = self._setLineData() or self._backgrounds is None
+        canvas = self._fig.canvas
+
+        if stale:
+            t0 = perf_counter_ns()
+            canvas.draw()
+            perf.since('plot.fullDraw', t0)
+            self._backgrounds = [(ax, canvas.copy_from_bbox(ax.bbox))
+                                 for ax, _ in self._blitArtists]
+        else:
+            for ax, bg in self._backgrounds:
+                canvas.restore_region(bg)
+
+        for ax, artist in self._blitArtists:
+            ax.draw_artist(artist)
+
+        for ax, _ in self._blitArtists:
+            canvas.blit(ax.bbox)
+
+        canvas.flush_events()
+
+    def _drawStaticMap(self, ax):
+        drawRelief(self._mPos, ax, mapArgs, 0.2, self._mapCacheDir)
+        ax.add_collection(LineCollection(self._coastlines, colors='white',
+                                         linewidths=0.2))
+        self._mPos.drawparallels(np.arange(-90,90,30),labels=[1,0,0,0],
+                                 ax=ax)
         self._mPos.drawmeridians(np.arange(self._mPos.lonmin,
                                            self._mPos.lonmax+30,60),
-                                 labels=[0,0,0,1])
+                                 labels=[0,0,0,1], ax=ax)
 
-        self._mND = Basemap(projection='merc',
-                            llcrnrlat=-80, urcrnrlat=80,
-                            llcrnrlon=-180, urcrnrlon=180,
-                            lat_ts=20, ax = self._axND)
+    def _installMap(self):
+        # on the main thread, once the Basemap is ready: static maps,
+        # terminator and the track so far, projected now
+        if self._mPos is not None or not self._mapSource.ready:
+            return False
 
-        plt.ion()
+        self._mPos, self._coastlines = self._mapSource.value
+        self._mND = self._mPos
 
-    def _updateMap(self):
-        lon = super().longitude
-        lat = super().latitude
+        self._drawStaticMap(self._axPos)
+        self._drawStaticMap(self._axND)
+        self._updateNightshade()
 
-        x, y = self._mPos(lon, lat)
-        date = datetime.utcnow()
+        rows = self._gpsHistory.view().copy()
+        rows['x'], rows['y'] = self._mPos(rows['longitude'], rows['latitude'])
+        self._gpsHistory.clear()
+        self._gpsHistory.extend(rows)
+        self._lods.pop(('gps', 'track'), None)
 
-        self._mND.shadedrelief(scale=0.2)
-        self._mND.drawcoastlines(color='white', linewidth=0.2)
-        self._mND.drawparallels(np.arange(-90,90,30),labels=[1,0,0,0])
-        self._mND.drawmeridians(np.arange(self._mND.lonmin,
-                                    self._mND.lonmax+30,60),
-                                labels=[0,0,0,1])
-        self._mND.nightshade(date, ax=self._axND)
+        self._backgrounds = None
 
-        self._axND.set_title("Current position")
-        self._axND.plot(x,y,'r.')
-        
-        self._axPos.plot(x,y,'r.:')
-
-    def _refreshAxis(self, axisToRefresh):
-        title = axisToRefresh.get_title()
-        ylabel = axisToRefresh.yaxis.get_label().get_text()
-        fmt = axisToRefresh.yaxis.get_major_formatter()
-        
-        axisToRefresh.cla()
-        axisToRefresh.ticklabel_format(axis = 'y', style='plain', useOffset=False)
-        axisToRefresh.yaxis.set_major_formatter(fmt)
-        axisToRefresh.set_title(title)
-        axisToRefresh.set_ylabel(ylabel)
-
-    def _updateGPSMeas(self, timeInterval = 5, maxPoints = 5):
-        currTmStr = super().time
-        alt = super().altitude
-        yaw = super().yaw
-        tilt = super().tilt
-        
-        if currTmStr == '':
-            return
+        return True
 
-        cTmStruct = strptime(currTmStr, "%H:%M:%S")
+    def _updateNightshade(self):
+        # the terminator moves by a quarter of a degree per minute: there is
+        # no point in recomputing it every frame
+        now = monotonic()
 
-        currTm = (cTmStruct.tm_sec + (cTmStruct.tm_min * 60)  + (cTmStruct.tm_hour * 3600))
+        if self._mND is None:
+            return False
 
-        if currTm == 0:
-            self._tm = 0
+        if (self._nightshadeTime is not None and
+            now - self._nightshadeTime < self._nightshadeInterval):
+            return False
 
-        if (currTm - self._tm) < timeInterval:
+        if self._nightshade is not None:
+            _removeContours(self._nightshade)
+
+        self._nightshade = self._mND.nightshade(datetime.utcnow(),
+                                                ax=self._axND)
+        self._nightshadeTime = now
+
+        return True
+
+    def _updateGPSMeas(self):
+        fix = super().fix
+
+        if fix.time == '' or fix.sod != fix.sod or fix is self._lastGPSFix:
             return
 
-        self._tm = currTm
-
-        if len(self._tArr) >= maxPoints:
-            self._tArr.pop(0)
-            self._altArr.pop(0)
-            self._gpsYawArr.pop(0)
-            self._gpsTiltArr.pop(0)
-            self._refreshAxis(self._axAlt)
-            self._refreshAxis(self._axYaw)
-            self._refreshAxis(self._axTilt)
-
-        self._tArr.append(currTmStr)
-        self._altArr.append(alt)
-        self._gpsYawArr.append(yaw)
-        self._gpsTiltArr.append(tilt)
-    
-        self._axAlt.plot(self._tArr, self._altArr,'r.:')
-        self._axYaw.plot(self._tArr, self._gpsYawArr,'r.:')
-        self._axTilt.plot(self._tArr, self._gpsTiltArr,'r.:')
-
-    def _updateIMUMeas(self, timeInterval = 5, maxPoints = 5):
-        quats = super().quaternions
-        eulers = super().eulers
-        time = quats['time']
+        self._lastGPSFix = fix
+
+        currTm = sodToEpochNs(fix.sod)*1e-9
+        last = self._gpsHistory.last
 
-        if time == '':
+        # times must not go back, the history views are searched by time
+        if last is not None and currTm < last['time']:
+            self._gpsHistory.clear()
+        elif last is not None and currTm - last['time'] < self._plotInterval:
             return
 
-        cTmStruct = strptime(time, "%H:%M:%S")
+        # no position on the map until the map is there
+        x, y = ((np.nan, np.nan) if self._mPos is None else
+                self._mPos(fix.longitude, fix.latitude))
 
-        currTm = (cTmStruct.tm_sec + (cTmStruct.tm_min * 60)  + (cTmStruct.tm_hour * 3600))
+        self._gpsHistory.append((currTm, fix.altitude, fix.tilt, fix.yaw,
+                                 fix.longitude, fix.latitude, x, y))
 
-        if currTm == 0:
-            self._imuTM = 0
+    def _updateIMUMeas(self):
+        quats = super().quaternions
+        eulers = super().eulers
+        timestamp = quats.get('timestamp')
 
-        if (currTm - self._imuTM) < timeInterval:
+        if timestamp is None:
             return
 
-        self._imuTM = currTm
-
-        if len(self._imuTArr) >= maxPoints:
-            self._imuTArr.pop(0)
-            self._rollArr.pop(0)
-            self._pitchArr.pop(0)
-            self._yawArr.pop(0)
-            self._quaternionsArr.pop(0)
-            self._refreshAxis(self._axOrientRoll)
-            self._refreshAxis(self._axOrientPitch)
-            self._refreshAxis(self._axOrientYaw)
-
-        self._imuTArr.append(time)
-        self._rollArr.append(eulers['roll'])
-        self._pitchArr.append(eulers['pitch'])
-        self._yawArr.append(eulers['yaw'])
-        self._quaternionsArr.append(quats)
-        
-        self._axOrientRoll.plot(self._imuTArr, self._rollArr,'r.:')
-        self._axOrientPitch.plot(self._imuTArr, self._pitchArr,'r.:')
-        self._axOrientYaw.plot(self._imuTArr, self._yawArr,'r.:')
+        currTm = timestamp*1e-9
+        last = self._imuHistory.last
+
+        if last is not None and currTm < last['time']:
+            self._imuHistory.clear()
+        elif last is not None and currTm - last['time'] < self._plotInterval:
+            return
+
+        self._imuHistory.append((currTm,
+                                 eulers['roll'], eulers['pitch'],
+                                 eulers['yaw'],
+                                 quats['q1'], quats['q2'],
+                                 quats['q3'], quats['q4']))
 
     def update(self):
+        t0 = perf_counter_ns()
+
         self.updateGPS()
+        t0 = perf.since('loop.updateGPS', t0)
+
         self.updateIMU()
-        
-        self._updateMap()
+        t0 = perf.since('loop.updateIMU', t0)
+
+        renderStart = monotonic()
+
+        if self._mPos is None and self._installMap():
+            t0 = perf.since('plot.installMap', t0)
+
         self._updateGPSMeas()
+        t0 = perf.since('plot.gpsMeas', t0)
+
         self._updateIMUMeas()
+        t0 = perf.since('plot.imuMeas', t0)
 
-        plt.draw()
-        plt.pause(0.001)
+        waiting = self._mPos is None and renderStart < self._mapDeadline
 
-        self._axND.cla()
+        if waiting:
+            pass
+        elif self._blit:
+            self._updateBlit()
+            t0 = perf.since('plot.blit', t0)
+        else:
+            self._setLineData()
+            t0 = perf.since('plot.lines', t0)
+
+            plt.draw()
+            t0 = perf.since('plot.draw', t0)
+
+        renderEnd = monotonic()
+
+        # pace the loop: the receiver thread keeps the fix up to date, the
+        # plot only needs to pick it up frameRate times per second
+        elapsed = renderEnd - self._frameStart
+        pause = max(0.001, self._frameInterval - elapsed)
+
+        if self._blit or waiting:
+            # plt.pause would redraw the whole (stale) figure
+            self._fig.canvas.start_event_loop(pause)
+        else:
+            plt.pause(pause)
+
+        perf.since('plot.pause', t0)
+        self._frameStart = monotonic()
+
+        if self._lastFrame is not None:
+            self._frameStats.append((self._frameStart - self._lastFrame,
+                                     renderEnd - renderStart))
+        self._lastFrame = self._frameStart
+
+    @property
+    def sources(self):
+        return dict(super(gpsPlotter, self).sources,
+                    map = self._mapSource.status)
 
     def __str__(self):
-        return super(gpsPlotter, self).__str__()
+        pending = ''.join(f"\n{name}: {status}"
+                          for name, status in self.sources.items()
+                          if status != 'ready')
+
+        return (f"{super(gpsPlotter, self).__str__()} "
+                f"FPS = {self.fps:.1f}{pending}")
+
+    def close(self):
+        self._mapSource.close()
+        gpsLogger.close(self)
+        imuLogger.close(self)
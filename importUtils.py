@@ -0,0 +1,361 @@
+#!/usr/bin/python3
+
+import os, sys, struct, argparse
+import numpy as np
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from nmeaUtils import nmeaParser, receiverIDs
+from gpsUtils import fixDtype
+
+pcapMagics = {b'\xd4\xc3\xb2\xa1' : ('<', 1000),
+              b'\xa1\xb2\xc3\xd4' : ('>', 1000),
+              b'\x4d\x3c\xb2\xa1' : ('<', 1),
+              b'\xa1\xb2\x3c\x4d' : ('>', 1)}
+pcapngMagic = b'\x0a\x0d\x0d\x0a'
+
+# link layer types: header length before the IP packet
+linkHeaders = {0   : 4,     # BSD loopback
+               1   : 14,    # Ethernet
+               101 : 0,     # raw IP
+               113 : 16,    # Linux cooked capture
+               228 : 0}     # raw IPv4
+
+def _row(rec, t):
+    return (t, rec['receiver'].upper(), rec['sod'],
+            rec['latitude'], rec['longitude'], rec['altitude'],
+            rec['yaw'], rec['tilt'],
+            rec['quality'], rec['satellites'], rec['hdop'])
+
+def _parseTextChunk(path, warm, start, end, receiver):
+    # "<receiver>,$..." datagram logs or bare NMEA lines; one row for every
+    # line that updates the fix, the time is filled in by the caller. The
+    # lines from warm to start only bring the parser state (the last
+    # position, yaw and tilt of every receiver) up to the chunk start.
+    # Returns the rows and the first (row, ddmmyy date) of an RMC or ZDA
+    parser = nmeaParser()
+    rows = []
+    dated = None
+
+    with open(path, 'rb') as f:
+        f.seek(warm)
+        data = f.read(end - warm)
+
+    for k, part in enumerate((data[:start - warm], data[start - warm:])):
+        for line in part.decode('ascii', 'replace').split('\n'):
+            if line[:1] == '$':
+                line = f"{receiver},{line}"
+
+            if not parser.parse(line) or k == 0:
+                continue
+
+            if dated is None and ('RMC' in parser.sentences or
+                                  'ZDA' in parser.sentences):
+                dated = (len(rows), parser.record['date'])
+
+            rows.extend(_row(parser.records[r], 0) for r in parser.updated)
+
+    return np.array(rows, fixDtype), dated
+
+def _udpPayload(packet, linkType, port):
+    ip = linkHeaders[linkType]
+
+    if linkType == 1:
+        etherType = packet[12:14]
+
+        if etherType == b'\x81\x00':    # 802.1Q tag
+            etherType = packet[16:18]
+            ip += 4
+
+        if etherType != b'\x08\x00':
+            return None
+    elif linkType == 113 and packet[14:16] != b'\x08\x00':
+        return None
+
+    if len(packet) < ip + 28 or packet[ip] >> 4 != 4 or packet[ip+9] != 17:
+        return None
+
+    # fragments other than the first one carry no UDP header
+    if struct.unpack_from('>H', packet, ip+6)[0] & 0x1fff:
+        return None
+
+    udp = ip + (packet[ip] & 0x0f)*4
+
+    if len(packet) < udp + 8:
+        return None
+
+    dstPort, length = struct.unpack_from('>HH', packet, udp+2)
+
+    if port is not None and dstPort != port:
+        return None
+
+    return packet[udp+8:udp+length]
+
+def _parsePcapChunk(path, start, end, port, linkType, endian, tsScale):
+    parser = nmeaParser()
+    recHeader = struct.Struct(f"{endian}IIII")
+    rows = []
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    pos = 0
+
+    while pos + 16 <= len(data):
+        sec, frac, inclLen, _ = recHeader.unpack_from(data, pos)
+        packet = data[pos+16:pos+16+inclLen]
+        pos += 16 + inclLen
+
+        payload = _udpPayload(packet, linkType, port)
+
+        if payload is None:
+            continue
+
+        if parser.parse(payload.decode('utf-8', 'replace')):
+            t = sec*1000000000 + frac*tsScale
+            rows.extend(_row(parser.records[r], t) for r in parser.updated)
+
+    return np.array(rows, fixDtype)
+
+def _callChunk(args):
+    return args[0](*args[1:])
+
+def _textChunks(path, chunkSize, overlap):
+    # byte ranges ending on a line boundary, with the line boundary about
+    # overlap bytes before their start the parser warms up from
+    size = os.path.getsize(path)
+    bounds = [0]
+
+    with open(path, 'rb') as f:
+        while bounds[-1] + chunkSize < size:
+            f.seek(bounds[-1] + chunkSize)
+            f.readline()
+            bounds.append(min(f.tell(), size))
+
+        if bounds[-1] < size:
+            bounds.append(size)
+
+        chunks = []
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            warm = max(0, start - overlap)
+
+            if warm > 0:
+                f.seek(warm - 1)
+                f.readline()
+                warm = min(f.tell(), start)
+
+            chunks.append((warm, start, end))
+
+    return chunks
+
+def _pcapChunks(path, chunkSize, endian):
+    # byte ranges ending on a record boundary: only the record headers are
+    # read here, the packets are parsed by the workers
+    recHeader = struct.Struct(f"{endian}IIII")
+    size = os.path.getsize(path)
+    bounds = [24]
+
+    with open(path, 'rb') as f:
+        pos = 24
+
+        while pos + 16 <= size:
+            f.seek(pos)
+            inclLen = recHeader.unpack(f.read(16))[2]
+            pos = min(pos + 16 + inclLen, size)
+
+            if pos - bounds[-1] >= chunkSize:
+                bounds.append(pos)
+
+    if bounds[-1] < pos:
+        bounds.append(pos)
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _textTimes(rows, baseDate = None, dated = None):
+    # NMEA times are seconds of the day: a drop of more than 12 hours is a
+    # new day. Rows before the first timed sentence get the first time. The
+    # days count from baseDate, or from the date of the dated (row, ddmmyy)
+    sod = rows['sod']
+    valid = ~np.isnan(sod)
+
+    if not valid.any():
+        return np.zeros(len(rows), np.int64)
+
+    s = sod[valid]
+    days = np.concatenate(([0], np.cumsum(np.diff(s) < -43200.0)))
+    times = np.empty(len(rows), np.float64)
+    times[valid] = days*86400.0 + s
+
+    idx = np.where(valid, np.arange(len(rows)), 0)
+    np.maximum.accumulate(idx, out = idx)
+    times = times[idx]
+    times[:np.argmax(valid)] = times[np.argmax(valid)]
+
+    if baseDate is not None:
+        base = datetime(baseDate.year, baseDate.month, baseDate.day,
+                        tzinfo = timezone.utc).timestamp()
+    else:
+        row, date = dated
+        day = datetime.strptime(date, "%d%m%y").replace(tzinfo = timezone.utc)
+        base = day.timestamp() - 86400.0*(times[row] // 86400.0)
+
+    return ((base + times)*1e9).astype(np.int64)
+
+def fileKind(path):
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+
+    if magic in pcapMagics:
+        return 'pcap'
+
+    if magic == pcapngMagic:
+        raise ValueError(f"{path}: pcapng is not supported, convert it "
+                         f"with 'editcap -F pcap'")
+
+    return 'text'
+
+def importFile(path, executor = None, port = 6003, receiver = receiverIDs[0],
+               baseDate = None, chunkSize = 8 << 20, overlap = 64 << 10):
+    kind = fileKind(path)
+
+    if kind == 'pcap':
+        with open(path, 'rb') as f:
+            header = f.read(24)
+
+        endian, tsScale = pcapMagics[header[:4]]
+        linkType = struct.unpack(f"{endian}I", header[20:24])[0] & 0x0fffffff
+
+        if linkType not in linkHeaders:
+            raise ValueError(f"{path}: unsupported link type {linkType}")
+
+        chunks = _pcapChunks(path, chunkSize, endian)
+        args = [(_parsePcapChunk, path, s, e, port, linkType, endian,
+                 tsScale) for s, e in chunks]
+    else:
+        chunks = _textChunks(path, chunkSize, overlap)
+        args = [(_parseTextChunk, path, w, s, e, receiver)
+                for w, s, e in chunks]
+
+    if executor is None or len(args) == 1:
+        parts = [_callChunk(a) for a in args]
+    else:
+        parts = list(executor.map(_callChunk, args))
+
+    if kind == 'text':
+        # the first RMC or ZDA dates the log, the file time would misdate
+        # the rows written before a midnight
+        dated = None
+        offset = 0
+
+        for part, partDated in parts:
+            if dated is None and partDated is not None:
+                dated = (offset + partDated[0], partDated[1])
+
+            offset += len(part)
+
+        parts = [part for part, _ in parts]
+
+    rows = (np.concatenate(parts) if parts else np.zeros(0, fixDtype))
+
+    if kind == 'text' and len(rows):
+        if baseDate is None and dated is None:
+            raise ValueError(f"{path}: no RMC or ZDA sentence to date the "
+                             f"log, give its UTC date")
+
+        rows['time'] = _textTimes(rows, baseDate, dated)
+
+    if len(rows) and np.any(np.diff(rows['time']) < 0):
+        rows = rows[np.argsort(rows['time'], kind = 'stable')]
+
+    return rows
+
+def timeIndex(times):
+    # first row of every second: a time range maps to a row range without
+    # reading the columns
+    seconds, first = np.unique(times//1000000000, return_index = True)
+
+    return seconds, first
+
+def saveImport(path, rows):
+    # a directory with one .npy per column and the per second index: a
+    # member of an .npz can only be read whole, a .npy can be mapped
+    seconds, first = timeIndex(rows['time'])
+    os.makedirs(path, exist_ok = True)
+
+    np.save(os.path.join(path, 'indexSeconds.npy'), seconds)
+    np.save(os.path.join(path, 'indexRows.npy'), first)
+
+    for k in fixDtype.names:
+        np.save(os.path.join(path, f"{k}.npy"), rows[k])
+
+def _column(path, name):
+    return np.load(os.path.join(path, f"{name}.npy"), mmap_mode = 'r',
+                   allow_pickle = False)
+
+def loadImport(path, start = None, stop = None, columns = None):
+    # columns between two epoch times in ns, as views of the mapped files:
+    # the index gives the row range, only its pages of the time and the
+    # requested columns are read
+    seconds = np.load(os.path.join(path, 'indexSeconds.npy'))
+    first = np.load(os.path.join(path, 'indexRows.npy'))
+    time = _column(path, 'time')
+    count = len(time)
+
+    i0 = 0
+    i1 = count
+
+    if start is not None:
+        k = np.searchsorted(seconds, start//1000000000, 'left')
+        i0 = first[k] if k < len(first) else count
+
+    if stop is not None:
+        k = np.searchsorted(seconds, stop//1000000000, 'right')
+        i1 = first[k] if k < len(first) else count
+
+    times = time[i0:i1]
+    lo = np.searchsorted(times, start, 'left') if start is not None else 0
+    hi = (np.searchsorted(times, stop, 'right') if stop is not None
+          else len(times))
+
+    return {k : (times if k == 'time' else _column(path, k)[i0:i1])[lo:hi]
+            for k in (columns or fixDtype.names)}
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description = "Import pcap captures "
+                                        "and NMEA logs into columnar "
+                                        "directories, one .npy per column")
+    argParser.add_argument('files', nargs = '+')
+    argParser.add_argument('-o', '--output', default = '.',
+                           help = "output directory")
+    argParser.add_argument('-j', '--jobs', type = int, default = None,
+                           help = "parser processes (default all cores)")
+    argParser.add_argument('-p', '--port', type = int, default = 6003,
+                           help = "UDP port of the GPS datagrams in pcaps")
+    argParser.add_argument('-r', '--receiver', default = receiverIDs[0],
+                           help = "receiver of untagged NMEA lines")
+    argParser.add_argument('-d', '--date', default = None,
+                           help = "UTC date of NMEA logs, YYYY-MM-DD "
+                                  "(default the date of their first RMC or "
+                                  "ZDA sentence)")
+    argParser.add_argument('--chunk-size', type = int, default = 8,
+                           help = "MB parsed by a worker at a time")
+
+    args = argParser.parse_args()
+    baseDate = (datetime.strptime(args.date, "%Y-%m-%d")
+                if args.date is not None else None)
+
+    os.makedirs(args.output, exist_ok = True)
+
+    with ProcessPoolExecutor(args.jobs) as executor:
+        for path in args.files:
+            rows = importFile(path, executor, args.port, args.receiver,
+                              baseDate, args.chunk_size << 20)
+            out = os.path.join(args.output,
+                               os.path.splitext(os.path.basename(path))[0])
+
+            saveImport(out, rows)
+
+            print(f"{path}: {len(rows)} fixes -> {out}")
+
+    sys.exit(0)
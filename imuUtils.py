@@ -1,89 +1,258 @@
-import sys, socket, re
-from time import gmtime, strptime
-from influxdb import InfluxDBClient
+import sys
+from time import gmtime, perf_counter_ns
+from calendar import timegm
+from datetime import datetime
+import numpy as np
 from numpy import nan
-
-quatQuery = ("SELECT \"instance\", \"value\" FROM \"HKB\" "
-             "WHERE (\"metric\" = 'quaternions' "
-             "AND time > now()-{}s)")
-
-rawGyroQuery = ("SELECT \"instance\", \"value\" FROM \"HKB\" "
-                "WHERE (\"metric\" = 'position' "
-                "AND time > now()-{}s)")
-
-rawAccelQuery = ("SELECT \"instance\", \"value\" FROM \"HKB\" "
-                 "WHERE (\"metric\" = 'acceleration' "
-                 "AND time > now()-{}s)")
-
-queries = {'quat'  : {'query'     : quatQuery, 
+from convUtils import imuConverter
+from fusionUtils import fusionBackends, quatToEuler
+from recordUtils import sessionRecorder
+from perfUtils import perf
+from sourceUtils import lazySource
+
+# one round trip for every metric: points newer than the per-metric cursors
+# are fetched with epoch='ns', so cursors are plain integer nanoseconds
+combinedQuery = ("SELECT \"metric\", \"instance\", \"value\" FROM \"HKB\" "
+                 "WHERE {}")
+metricCondition = "(\"metric\" = '{}' AND time > {})"
+
+# 'scale' converts the decoded values to physical units, None keeps the raw
+# sensor counts. The full scale ranges of the sensors are not stored with
+# the data: imuLogger sets the scales from its accelRange and gyroRange.
+# The quaternions are stored already normalized
+queries = {'quat'  : {'metric'    : 'quaternions',
                       'instances' : ['q1','q2','q3','q4'],
-                      'toSigned'  : None},
-           'accel' : {'query'     : rawAccelQuery,
+                      'toSigned'  : None,
+                      'scale'     : None},
+           'accel' : {'metric'    : 'acceleration',
                       'instances' : ['X','Y','Z'],
-                      'toSigned'  : 16},
-           'gyro'  : {'query'     : rawGyroQuery,
+                      'toSigned'  : 16,
+                      'scale'     : None},
+           'gyro'  : {'metric'    : 'position',
                       'instances' : ['X','Y','Z'],
-                      'toSigned'  : 16}}
-
-numericPattern = "([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)*)"
-convPattern = (f"Q{numericPattern},{numericPattern},"
-               f"{numericPattern},{numericPattern}"
-               f"E{numericPattern},{numericPattern},"
-               f"{numericPattern}")
-convRegex = re.compile(convPattern)
+                      'toSigned'  : 16,
+                      'scale'     : None}}
 
 iToE = {0:'roll',
         1:'pitch',
         2:'yaw'}
 
+convDtype = np.dtype([('time', np.int64)] +
+                     [(f"q{i+1}", np.float64) for i in range(4)] +
+                     [(iToE[i], np.float64) for i in range(3)])
+
+_daySeconds = {}
+_lastSecond = ('', 0)
+
+def rfc3339ToNs(timeStr):
+    # "YYYY-MM-DDTHH:MM:SS[.f...]Z" as InfluxDB returns it, without strptime:
+    # query results are time ordered, so the whole seconds of the previous
+    # timestamp are reused and the date part is computed once per day
+    global _lastSecond
+
+    if timeStr[-1:] != 'Z' or timeStr[10:11] != 'T':
+        dt = datetime.fromisoformat(timeStr.replace('Z', '+00:00'))
+        return round(dt.timestamp()*1e9)
+
+    prefix = timeStr[:19]
+
+    if prefix == _lastSecond[0]:
+        secs = _lastSecond[1]
+    else:
+        day = timeStr[:10]
+        secs = _daySeconds.get(day)
+
+        if secs is None:
+            secs = timegm((int(day[0:4]), int(day[5:7]), int(day[8:10]),
+                           0, 0, 0))
+            _daySeconds[day] = secs
+
+        secs += (int(timeStr[11:13])*3600 + int(timeStr[14:16])*60 +
+                 int(timeStr[17:19]))
+        _lastSecond = (prefix, secs)
+
+    frac = timeStr[20:-1]
+
+    if len(frac) == 9:
+        return secs*1000000000 + int(frac)
+
+    return secs*1000000000 + (int(frac.ljust(9, '0')[:9]) if frac else 0)
+
+def toSignedArray(values, bits):
+    v = np.asarray(values, dtype = np.int64) & ((1 << bits) - 1)
+
+    return v - ((v & (1 << (bits-1))) << 1)
+
+def batchDtype(instances, valueType = np.float64):
+    return np.dtype([('time', np.int64)] + [(k, valueType) for k in instances])
+
+def queryDtype(tQ):
+    # raw sensor counts stay integers, scaled values are floats
+    if tQ['toSigned'] is not None and tQ.get('scale') is None:
+        return batchDtype(tQ['instances'], np.int64)
+
+    return batchDtype(tQ['instances'])
+
+def scaledQueries(dbQueries, **ranges):
+    # copy of the queries with the scales of the signed queries set from a
+    # full scale range, e.g. accel = 2.0 for a +-2 g accelerometer gives g
+    scaled = dict(dbQueries)
+
+    for qN, fullScale in ranges.items():
+        if fullScale is not None:
+            tQ = dbQueries[qN]
+            scaled[qN] = dict(tQ, scale = fullScale/(1 << (tQ['toSigned']-1)))
+
+    return scaled
+
+maxPendingAccel = 1 << 14
+
+def rawCounts(values, tQ):
+    # inverse of the query scaling: the converter service takes the sensor
+    # counts
+    scale = tQ.get('scale')
+
+    if scale is None:
+        return np.asarray(values)
+
+    return np.rint(np.asarray(values, np.float64)/scale).astype(np.int64)
+
+def nearestIndex(times, targets):
+    # index of the element of the sorted times closest to every target
+    if len(times) < 2:
+        return np.zeros(len(targets), dtype = np.intp)
+
+    idx = np.clip(np.searchsorted(times, targets), 1, len(times) - 1)
+
+    return idx - ((targets - times[idx-1]) <= (times[idx] - targets))
+
+def nsToTimeStr(ns):
+    secs = (ns // 1000000000) % 86400
+
+    return f"{secs // 3600:02d}:{(secs // 60) % 60:02d}:{secs % 60:02d}"
+
 class imuLogger(object):
     def __init__(self, dbHost = 'calibano.ba.infn.it', dbPort = 8086,
                  dbQueries = queries, database='spbmonitor',
                  queryInterval = 2, 
                  convHost = '127.0.0.1', convPort = 5000,
                  logFileName = None, bufSize = 1024,
-                 *args, **kwargs):
+                 convBackfill = False, fusion = None, fusionParams = None,
+                 imuSink = None, lazy = True, dbTimeout = 10.0,
+                 accelRange = None, gyroRange = None, *args, **kwargs):
         super(imuLogger, self).__init__(*args, **kwargs)
 
-        self._dbClient = InfluxDBClient(host=dbHost, 
-                                        port=dbPort,
-                                        database=database)
+        # full scale of the sensors in g and deg/s: accel and gyro are
+        # given in these units, without them in sensor counts
+        dbQueries = scaledQueries(dbQueries, accel = accelRange,
+                                  gyro = gyroRange)
+
+        # set by the sources once they are open
+        self._dbClient = None
+        self._imuConv = None
 
         self._initTime = gmtime()
         self._queryInterval = queryInterval
         self._bufSize = bufSize
         self._dbQueries = dbQueries
-        self._imuConv = None
+        self._metrics = {qV['metric'] : qN for qN, qV in dbQueries.items()}
+        self._cursors = {qN : None for qN in dbQueries}
         # results from db queries
         self._imuResults = {qN : {k : nan for k in qV['instances']} 
                             for qN, qV in queries.items()}
+        # every complete sequence of the last fetch, as structured arrays
+        self._imuBatches = {qN : np.zeros(0, queryDtype(qV))
+                            for qN, qV in dbQueries.items()}
         # results from converter
         self._imuResults.update({'convQuat' : {f"q{i+1}" : nan
                                                for i in range(4)},
                                  'euler'    : {iToE[i] : nan
                                                for i in range(3)}})
 
-        self._logFileName = (f"{logFileName}-"
-                             f"{self._initTime.tm_year}"
-                             f"{self._initTime.tm_mon}"
-                             f"{self._initTime.tm_mday}-"
-                             f"{self._initTime.tm_hour}"
-                             f"{self._initTime.tm_min}"
-                             f"{self._initTime.tm_sec}.dat")
+        # every fetched batch and converted sample is recorded under
+        # <logFileName>-<session>-<stream>-<rotation>.rec
+        self._imuRecorder = None
+
+        if logFileName is not None:
+            self._imuRecorder = sessionRecorder(logFileName,
+                                                {'conv' : convDtype})
+
+        self._imuSink = imuSink
+        self._convBackfill = convBackfill
+        self._convBatch = np.zeros(0, convDtype)
+        # accel samples fetched while no gyro sample came in yet
+        self._pendingAccel = None
+        self._fusion = None
+
+        # the in-process backend takes the place of the converter service
+        if fusion is not None:
+            # a scaled gyro query already gives deg/s
+            params = ({'gyroScale' : 1.0}
+                      if dbQueries['gyro'].get('scale') is not None else {})
+            params.update(fusionParams or {})
+
+            self._fusion = fusionBackends[fusion](**params)
+            convHost = None
+
+        # neither the database nor the converter may stop the logger: they
+        # are opened with retries in the background and reported as not yet
+        # available meanwhile. lazy skips the first attempt on this thread
+        self._sources = {}
+
+        if dbHost is not None:
+            self._sources['database'] = lazySource(
+                'database',
+                lambda: self._openDB(dbHost, dbPort, database, dbTimeout),
+                self._setDBClient, lambda client: client.close())
 
         if convHost is not None:
-            imuConvSocket = socket.socket(socket.AF_INET,
-                                          socket.SOCK_STREAM)
-            
-            welcomeStr = b''
-            if imuConvSocket is not None:
-                imuConvSocket.connect((convHost, convPort))
-                welcomeStr = imuConvSocket.recv(bufSize)
-            
-            if welcomeStr == b'Imu conv':
-                print("Imu converter ready")
-                
-                self._imuConv = imuConvSocket
+            self._sources['converter'] = lazySource(
+                'converter',
+                lambda: self._openConverter(convHost, convPort, bufSize),
+                self._setConverter, lambda conv: conv.close())
+
+        for source in self._sources.values():
+            if lazy:
+                source.start()
+            else:
+                source.open()
+
+    def _openDB(self, host, port, database, timeout):
+        # influxdb pulls in requests: imported only when it is used
+        from influxdb import InfluxDBClient
+
+        client = InfluxDBClient(host = host, port = port,
+                                database = database, timeout = timeout)
+
+        try:
+            client.ping()
+        except Exception:
+            client.close()
+            raise
+
+        return client
+
+    def _setDBClient(self, client):
+        self._dbClient = client
+
+    def _openConverter(self, host, port, bufSize):
+        imuConv = imuConverter(host, port, bufSize)
+        imuConv.connect()
+
+        return imuConv
+
+    def _setConverter(self, imuConv):
+        self._imuConv = imuConv
+
+        if imuConv is not None:
+            print("Imu converter ready")
+
+    @property
+    def sources(self):
+        # name: status of what the logger depends on, merged along the MRO
+        return dict(getattr(super(imuLogger, self), 'sources', {}),
+                    **{name : source.status
+                       for name, source in self._sources.items()})
 
     @property
     def accel(self):
@@ -105,6 +274,22 @@ class imuLogger(object):
     def eulers(self):
         return self._imuResults['euler']
 
+    @property
+    def accelBatch(self):
+        return self._imuBatches['accel']
+
+    @property
+    def gyroBatch(self):
+        return self._imuBatches['gyro']
+
+    @property
+    def quaternionsBatch(self):
+        return self._imuBatches['quat']
+
+    @property
+    def convBatch(self):
+        return self._convBatch
+
     @property
     def results(self):
         return self._imuResults
@@ -117,95 +302,348 @@ class imuLogger(object):
         
         return n | (-(n & (1 << (bits-1))))
 
-    def _getTime(self, timeStr, fmt = "%Y-%m-%dT%H:%M:%S.%f"):
-            cT = timeStr.replace('Z','').split('.')
+    def _getCmpltSeqs(self, sequence, instances, keyword = 'instance',
+                      toSigned = None, maxSpan = 1000000000):
+        # single pass over the points: one (time, v1, ..., vn) tuple for
+        # every run of instances[0..n-1] spanning at most maxSpan ns, the
+        # time being the one of its last point
+        seqs = []
+        n = len(instances)
+        first = instances[0]
+        vals = [None]*n
+        j = 0
+        t0 = 0
+
+        for s in sequence:
+            inst = s[keyword]
+
+            if inst != instances[j]:
+                if inst != first:
+                    continue
+                j = 0
+
+            t = s['time']
+            if t.__class__ is not int:
+                t = rfc3339ToNs(t)
+
+            if j == 0:
+                t0 = t
 
-            # on linux the decimal part of seconds cannot be > 6 digits
-            uS = cT[1][:6]
+            v = s['value']
+            vals[j] = v if toSigned is None else self._toSigned(v, toSigned)
+            j += 1
 
-            cT = cT[0]+'.'+uS
+            if j == n:
+                j = 0
 
-            return strptime(cT, fmt)
+                if t - t0 <= maxSpan:
+                    seqs.append((t, *vals))
+
+        return seqs
 
     def _getCmpltSeq(self, sequence, instances,
                      keyword = 'instance', toSigned = None):
-        retVal = {k : None for k in instances}
-        i = 0
-        j = 0
-        t0 = None
-        seq = sequence.copy()
+        # most recent complete sequence as a dictionary
+        seqs = self._getCmpltSeqs(sequence, instances, keyword, toSigned)
+
+        if not seqs:
+            return None
+
+        t = seqs[-1][0]
+        retVal = dict(zip(instances, seqs[-1][1:]))
+        retVal.update({'time'      : nsToTimeStr(t),
+                       'timestamp' : t})
+
+        return retVal
+
+    def _dbQuery(self):
+        # one time condition per metric: a metric that stopped receiving
+        # points must not hold back the lower bound of the others
+        default = f"now()-{self._queryInterval}s"
+
+        return combinedQuery.format(' OR '.join(
+                    metricCondition.format(self._dbQueries[qN]['metric'],
+                                           default if c is None else c)
+                    for qN, c in self._cursors.items()))
+
+    def _decodeBatch(self, points, tQ):
+        instances = tQ['instances']
+        toSigned = tQ['toSigned']
+        scale = tQ.get('scale')
+
+        seqs = self._getCmpltSeqs(points, instances)
+        batch = np.empty(len(seqs), queryDtype(tQ))
+
+        if not seqs:
+            return batch
+
+        raw = np.array(seqs, dtype = np.int64 if toSigned else object)
+        batch['time'] = raw[:, 0]
+
+        for i, k in enumerate(instances):
+            values = raw[:, i+1]
+
+            if toSigned is not None:
+                values = toSignedArray(values, toSigned)
 
-        while(i < len(sequence)):
-            s = seq.pop(0)
+            if scale is not None:
+                values = values*scale
 
-            t1 = self._getTime(s['time'])
+            batch[k] = values
 
-            if s[keyword] != instances[j]:
-                i = i + 1
+        return batch
+
+    def _updateQueryResults(self, tN, points):
+        self._setBatch(tN, self._decodeBatch(points, self._dbQueries[tN]))
+
+    def _setBatch(self, tN, batch):
+        self._imuBatches[tN] = batch
+
+        if len(batch) == 0:
+            return
+
+        if self._imuRecorder is not None:
+            self._imuRecorder.record(tN, batch)
+
+        # the scalar properties expose the latest row of the batch
+        last = batch[-1]
+        t = int(last['time'])
+        qRes = {k : last[k].item() for k in self._dbQueries[tN]['instances']}
+        qRes.update({'time'      : nsToTimeStr(t),
+                     'timestamp' : t})
+
+        self._imuResults.update({tN : qRes})
+
+    def _updateDBResults(self, points):
+        byQuery = {qN : [] for qN in self._dbQueries}
+
+        for p in points:
+            qN = self._metrics.get(p['metric'])
+
+            if qN is None:
                 continue
 
-            if t0 is None:
-                t0 = self._getTime(s['time'])
+            cursor = self._cursors[qN]
 
-            i = i + 1
-            j = (j + 1)%len(instances)
+            if cursor is None or p['time'] > cursor:
+                byQuery[qN].append(p)
 
-            val = self._toSigned(s['value'], toSigned)
+        for qN, qR in byQuery.items():
+            if not qR:
+                # nothing new: the window must not be processed again
+                self._imuBatches[qN] = self._imuBatches[qN][:0]
+                continue
+
+            self._updateQueryResults(qN, qR)
+
+            # advance only up to the last point closing a sequence: a
+            # sequence still being written is fetched again next time
+            lastInstance = self._dbQueries[qN]['instances'][-1]
 
-            retVal.update({s[keyword] : val})
+            for p in reversed(qR):
+                if p['instance'] == lastInstance:
+                    self._cursors[qN] = p['time']
+                    break
 
-            if ((s[keyword] == instances[-1]) and 
-                (t1.tm_sec - t0.tm_sec <= 1.0)):
-                hours = t1.tm_hour
-                mins = t1.tm_min
-                secs = t1.tm_sec
+    def _convRequest(self):
+        accelRes = self._imuResults['accel']
+        gyroRes = self._imuResults['gyro']
 
-                timeStr = f"{hours:02d}:{mins:02d}:{secs:02d}"
+        if (accelRes is None) or (gyroRes is None):
+            return None
 
-                retVal.update({'time' : timeStr})
+        gyro = [gyroRes['X'], gyroRes['Y'], gyroRes['Z']]
+        accel = [accelRes['X'], accelRes['Y'], accelRes['Z']]
+
+        # nothing fetched yet
+        if np.isnan(gyro + accel).any():
+            return None
+
+        return (tuple(rawCounts(gyro, self._dbQueries['gyro']).tolist()),
+                tuple(rawCounts(accel, self._dbQueries['accel']).tolist()))
+
+    def _updateConvResults(self, reply):
+        if reply is None:
+            return
+
+        quat, euler = reply
+
+        convResDict = {'convQuat' : {f"q{i+1}" : q
+                                     for i,q in enumerate(quat)},
+                       'euler'    : {iToE[i] : e
+                                     for i,e in enumerate(euler)}}
+        self._imuResults.update(convResDict)
+
+    def _pairedWindow(self):
+        # every accel sample of the last fetch with the nearest gyro sample.
+        # Without gyro samples the accel ones wait for the next fetch, the
+        # latest maxPendingAccel of them
+        accel = self._imuBatches['accel']
+        gyro = self._imuBatches['gyro']
+
+        if self._pendingAccel is not None:
+            accel = np.concatenate((self._pendingAccel, accel))
+
+        if len(gyro) == 0:
+            self._pendingAccel = (accel[-maxPendingAccel:] if len(accel)
+                                  else None)
+            return None
+
+        self._pendingAccel = None
+
+        if len(accel) == 0:
+            return None
+
+        g = gyro[nearestIndex(gyro['time'], accel['time'])]
+
+        return (accel['time'],
+                np.stack((g['X'], g['Y'], g['Z']), axis = 1),
+                np.stack((accel['X'], accel['Y'], accel['Z']), axis = 1))
+
+    def _setConvBatch(self, times, values):
+        convBatch = np.zeros(len(times), convDtype)
+        convBatch['time'] = times
+
+        for i, k in enumerate(convDtype.names[1:]):
+            convBatch[k] = values[:, i]
+
+        self._convBatch = convBatch
+
+        if self._imuRecorder is not None:
+            self._imuRecorder.record('conv', convBatch)
+
+        if self._imuSink is not None:
+            self._imuSink.writeConv(convBatch)
+
+        last = values[-1].tolist()
+        self._updateConvResults((tuple(last[:4]), tuple(last[4:7])))
+
+    def _convertWindow(self):
+        # backfill: the whole window goes to the converter in one pipelined
+        # batch
+        window = self._pairedWindow()
+
+        if window is None:
+            return
 
-                return retVal
+        times, gyro, accel = window
+        gyro = rawCounts(gyro, self._dbQueries['gyro'])
+        accel = rawCounts(accel, self._dbQueries['accel'])
+        samples = list(zip(map(tuple, gyro.tolist()),
+                           map(tuple, accel.tolist())))
 
-        return None
+        replies = self._imuConv.convertBatch(samples)
+
+        self._setConvBatch(times,
+                           np.array([(*r[0], *r[1]) if r is not None
+                                     else (nan,)*7 for r in replies]))
+
+    def _fuseWindow(self):
+        window = self._pairedWindow()
+
+        if window is None:
+            return
+
+        times, gyro, accel = window
+
+        # the accel and gyro batches of a fetch only hold samples newer
+        # than the cursors, so nothing is fed to the filter twice
+        quats = self._fusion.updateBatch(times, gyro, accel)
+
+        self._setConvBatch(times, np.hstack((quats, quatToEuler(quats))))
+
+    def ingestBatches(self, batches):
+        # entry point for sources other than the database (replay, import):
+        # structured arrays keyed by query name and optionally 'conv', the
+        # orientation already computed when the batches were recorded
+        for tN in self._dbQueries:
+            batch = batches.get(tN)
+            self._setBatch(tN, batch if batch is not None
+                               else self._imuBatches[tN][:0])
+
+        conv = batches.get('conv')
+
+        if (conv is not None and len(conv) and
+            self._fusion is None and self._imuConv is None):
+            self._setConvBatch(conv['time'],
+                               np.stack([conv[k] for k in convDtype.names[1:]],
+                                        axis = 1))
+            return
+
+        self._processWindow()
 
     def updateIMU(self):
-        qRes = {}
-        for tN,tQ in self._dbQueries.items():
-            q = tQ['query'].format(self._queryInterval)
-            qR = list(self._dbClient.query(q).get_points())
-            qRes = self._getCmpltSeq(qR, tQ['instances'],
-                                     toSigned = tQ['toSigned'])
+        if self._dbClient is None:
+            return
+
+        t0 = perf_counter_ns()
+
+        try:
+            qR = self._dbClient.query(self._dbQuery(), epoch = 'ns')
+        except Exception as e:
+            # connection errors as well as the client ones: the database is
+            # reopened in the background and the loop goes on
+            self._sources['database'].failed(e)
+            return
+
+        t0 = perf.since('imu.query', t0)
+
+        self._updateDBResults(list(qR.get_points()))
+        t0 = perf.since('imu.decode', t0)
 
-            if qRes is not None:
-                self._imuResults.update({tN : qRes})
+        self._processWindow()
+        perf.since('imu.process', t0)
+
+    def _processWindow(self):
+        t0 = perf_counter_ns()
+
+        if self._fusion is not None:
+            self._fuseWindow()
+            perf.since('imu.fusion', t0)
+            return
 
         if self._imuConv is None:
             return
-        
-        accelRes = self._imuResults['accel']
-        gyroRes = self._imuResults['gyro']
 
-        if (accelRes is not None) and (gyroRes is not None):
-            accelStr = f"{accelRes['X']},{accelRes['Y']},{accelRes['Z']}"
-            gyroStr = f"{gyroRes['X']},{gyroRes['Y']},{gyroRes['Z']}"
+        # a converter that went away is reopened in the background
+        if self._convBackfill:
+            try:
+                self._convertWindow()
+            except OSError as e:
+                self._sources['converter'].failed(e)
+                return
+
+            perf.since('imu.convBatch', t0)
+            return
+
+        sample = self._convRequest()
 
-            strToSend = f"{gyroStr},{accelStr}\n".encode('utf-8')
+        if sample is not None:
+            try:
+                reply = self._imuConv.convert(*sample)
+            except OSError as e:
+                self._sources['converter'].failed(e)
+                return
 
-            self._imuConv.send(strToSend)
+            perf.since('imu.convRTT', t0)
 
-            recD = self._imuConv.recv(self._bufSize).decode('utf-8')
-            imuConvData = convRegex.findall(recD)
+            self._updateConvResults(reply)
 
-            if imuConvData is not None:
-                convQuatDict = {f"q{i+1}":float(q or nan) 
-                                for i,q in enumerate(imuConvData[0][:4])}
-                
-                eulersDict = {iToE[i]:float(e or nan) 
-                              for i,e in enumerate(imuConvData[0][4:7])}
-                
-                convResDict = {'convQuat' : convQuatDict,
-                               'euler'    : eulersDict}
-                self._imuResults.update(convResDict)
+            if reply is None:
+                return
+
+            t = self._imuResults['accel'].get('timestamp')
+
+            # a row without the time of its sample would land at epoch 0
+            if t is None:
+                return
+
+            if self._imuRecorder is not None:
+                self._imuRecorder.record('conv', (t, *reply[0], *reply[1]))
+
+            if self._imuSink is not None:
+                self._imuSink.writeConv(np.array([(t, *reply[0], *reply[1])],
+                                                 convDtype))
 
     def __str__(self):
         return (f"ACCEL = ({self.accel['X']},"
@@ -233,10 +671,11 @@ class imuLogger(object):
             self._dbClient.close()
 
     def close(self):
-        if self._imuConv is not None:
-            self._imuConv.close()
-        if self._dbClient is not None:
-            self._dbClient.close()
+        for source in self._sources.values():
+            source.close()
+
+        if self._imuRecorder is not None:
+            self._imuRecorder.close()
 
 if __name__ == "__main__":
     try:
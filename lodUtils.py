@@ -0,0 +1,93 @@
+import numpy as np
+
+def bucketWidth(span, pixels):
+    # bucket width snapped to a power of two: it changes only when the span
+    # doubles or halves, so the cached buckets survive a growing history
+    if not span > 0.0 or pixels < 1:
+        return None
+
+    return 2.0**np.ceil(np.log2(span/pixels))
+
+def minMaxIndices(keys, columns, width):
+    # indices of the rows holding the minimum and the maximum of every
+    # column in each bucket of `width` key units, in key order
+    if len(keys) == 0:
+        return np.zeros(0, np.intp)
+
+    buckets = np.floor(keys/width)
+    starts = np.flatnonzero(np.diff(buckets, prepend = buckets[0] - 1))
+    counts = np.diff(starts, append = len(keys))
+    index = np.arange(len(keys))
+    kept = []
+
+    for values in columns:
+        for fill, reduce in ((np.inf, np.minimum), (-np.inf, np.maximum)):
+            v = np.where(np.isnan(values), fill, values)
+            extreme = np.repeat(reduce.reduceat(v, starts), counts)
+            first = np.where(v == extreme, index, len(keys))
+
+            kept.append(np.minimum.reduceat(first, starts))
+
+    return np.unique(np.concatenate(kept))
+
+class minMaxLOD(object):
+    # Incremental min/max decimation of a history sorted by `key`. Buckets
+    # are aligned on multiples of the bucket width, so once a bucket is
+    # complete its points never change: every update decimates only the rows
+    # from the last incomplete bucket on.
+    def __init__(self, fields, key = 'time', *args, **kwargs):
+        super(minMaxLOD, self).__init__(*args, **kwargs)
+
+        self._fields = fields
+        self._key = key
+        self.reset()
+
+    @property
+    def width(self):
+        return self._width
+
+    def reset(self):
+        self._width = None
+        self._doneKey = None
+        self._done = None
+
+    def update(self, rows, width):
+        key = self._key
+
+        if len(rows) == 0 or width is None:
+            self.reset()
+            return rows
+
+        keys = rows[key]
+
+        # history cleared or resolution changed: start over
+        if (width != self._width or
+            (self._doneKey is not None and keys[-1] < self._doneKey)):
+            self.reset()
+            self._width = width
+
+        if self._done is None:
+            self._done = rows[:0].copy()
+            newRows = rows
+        else:
+            # forget the buckets that left the history
+            first = np.searchsorted(self._done[key], keys[0], 'left')
+            self._done = self._done[first:]
+            newRows = rows[np.searchsorted(keys, self._doneKey, 'left'):]
+
+        newKeys = newRows[key]
+        idx = minMaxIndices(newKeys, [newRows[f] for f in self._fields],
+                            width)
+        selected = newRows[idx]
+
+        # the last bucket can still change, it is kept out of the cache
+        lastBucket = np.floor(newKeys[-1]/width)*width
+        complete = selected[key] < lastBucket
+
+        self._done = np.concatenate((self._done, selected[complete]))
+        self._doneKey = lastBucket
+
+        # the newest row is always shown, it is the current value
+        tail = rows[-1:] if idx[-1] != len(newRows) - 1 else rows[:0]
+
+        return np.concatenate((self._done, selected[~complete], tail))
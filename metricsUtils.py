@@ -0,0 +1,304 @@
+import json, threading
+from time import time
+from math import isnan
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from perfUtils import perf
+
+# A metric family is (name, type, help, samples), samples being
+# (labels dict, value) pairs or (labels dict, value, name suffix) for the
+# _count and _sum of summaries. Collectors are callables returning a list of
+# families; they run on the HTTP thread and only read immutable snapshots
+# (fixes, result dictionaries replaced as a whole), so they take no lock.
+
+prometheusType = 'text/plain; version=0.0.4; charset=utf-8'
+
+_fixMetrics = (('latitude', 'latitude_degrees', "Latitude"),
+               ('longitude', 'longitude_degrees', "Longitude"),
+               ('altitude', 'altitude_meters', "Altitude above MSL"),
+               ('yaw', 'yaw_degrees', "Yaw of the antenna baseline"),
+               ('tilt', 'tilt_degrees', "Tilt of the antenna baseline"),
+               ('quality', 'quality', "GGA fix quality, -1 unknown"),
+               ('satellites', 'satellites', "Satellites in use"),
+               ('hdop', 'hdop', "Horizontal dilution of precision"))
+
+_imuMetrics = (('accel', 'imu_accel', "Latest accelerometer sample"),
+               ('gyro', 'imu_gyro', "Latest gyroscope sample"),
+               ('quat', 'imu_quaternion', "Latest quaternion from the "
+                                          "database"),
+               ('convQuat', 'imu_conv_quaternion', "Latest converted "
+                                                   "quaternion"),
+               ('euler', 'imu_euler_degrees', "Latest converted Euler "
+                                              "angles"))
+
+def _value(v):
+    if v is None:
+        return 'NaN'
+
+    v = float(v)
+
+    if isnan(v):
+        return 'NaN'
+
+    if v in (float('inf'), float('-inf')):
+        return '+Inf' if v > 0 else '-Inf'
+
+    return repr(v)
+
+def _labels(labels):
+    if not labels:
+        return ''
+
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"')
+               .replace('\n', '\\n') for v in labels.values())
+
+    return '{' + ','.join(f'{k}="{v}"'
+                          for k, v in zip(labels, escaped)) + '}'
+
+def formatMetrics(families):
+    lines = []
+
+    for name, kind, help, samples in families:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{s[2] if len(s) > 2 else ''}{_labels(s[0])} "
+                     f"{_value(s[1])}" for s in samples)
+
+    return '\n'.join(lines) + '\n'
+
+def gpsMetrics(gps, now = None):
+    families = []
+    states = gps.receivers.states(now)
+    best = gps.fix
+
+    for field, name, help in _fixMetrics:
+        samples = [({'receiver' : r}, getattr(s.fix, field))
+                   for r, s in states.items()]
+        samples.append(({'receiver' : 'best'}, getattr(best, field)))
+
+        families.append((f"gps_{name}", 'gauge', help, samples))
+
+    families += [('gps_fix_age_seconds', 'gauge',
+                  "Seconds since the last fix of the receiver",
+                  [({'receiver' : r}, s.age) for r, s in states.items()]),
+                 ('gps_fix_rate_hertz', 'gauge',
+                  "Fix rate of the receiver",
+                  [({'receiver' : r}, s.rate) for r, s in states.items()]),
+                 ('gps_receiver_stale', 'gauge',
+                  "1 when the receiver stopped sending fixes",
+                  [({'receiver' : r}, int(s.stale))
+                   for r, s in states.items()]),
+                 ('gps_fixes_total', 'counter',
+                  "Fixes received from the receiver",
+                  [({'receiver' : r}, s.count) for r, s in states.items()]),
+                 ('gps_datagrams_total', 'counter',
+                  "GPS datagrams by outcome",
+                  [({'outcome' : k}, v) for k, v in gps.counters.items()]),
+                 ('nmea_sentences_total', 'counter',
+                  "NMEA sentences by outcome",
+                  [({'outcome' : k}, v)
+                   for k, v in gps.parserCounters.items()])]
+
+    return families
+
+def imuMetrics(imu):
+    families = []
+    results = imu.results
+
+    for key, name, help in _imuMetrics:
+        values = results.get(key) or {}
+        samples = [({'component' : k}, v) for k, v in values.items()
+                   if k not in ('time', 'timestamp')]
+
+        if samples:
+            families.append((name, 'gauge', help, samples))
+
+    stamps = [({'query' : k}, v['timestamp']*1e-9)
+              for k, v in results.items()
+              if isinstance(v, dict) and v.get('timestamp') is not None]
+
+    families.append(('imu_sample_timestamp_seconds', 'gauge',
+                     "Epoch time of the latest sample of the query",
+                     stamps))
+
+    return families
+
+def recorderMetrics(recorder):
+    return [(f"recorder_{k}_total", 'counter', f"Recorder {k}", [({}, v)])
+            for k, v in recorder.counters.items()]
+
+def sinkMetrics(sink):
+    counters = sink.counters
+    pending = counters.pop('pending')
+
+    return ([(f"sink_{k}_total", 'counter', f"Sink rows {k}", [({}, v)])
+             for k, v in counters.items()] +
+            [('sink_pending', 'gauge', "Sink rows waiting to be written",
+              [({}, pending)])])
+
+def publisherMetrics(publisher):
+    return [('shm_published_rows_total', 'counter',
+             "Rows published in shared memory",
+             [({'ring' : r}, v) for r, v in publisher.published.items()])]
+
+def sourceMetrics(sources):
+    return [('gpslogger_source_ready', 'gauge',
+             "1 once the source (database, converter, ...) is available",
+             [({'source' : name}, int(status == 'ready'))
+              for name, status in sources.items()])]
+
+def perfMetrics(monitor = perf):
+    # Prometheus summaries: quantiles over the monitor window, count and
+    # sum since the start
+    quantiles = (0.5, 0.95, 0.99)
+    samples = []
+
+    for stage, histogram in sorted(monitor.stages.items()):
+        _, values, _ = histogram.snapshot(quantiles)
+        samples += [({'stage' : stage, 'quantile' : str(q)}, v)
+                    for q, v in zip(quantiles, values)]
+        samples += [({'stage' : stage}, histogram.count, '_count'),
+                    ({'stage' : stage}, histogram.total, '_sum')]
+
+    return [('gpslogger_stage_seconds', 'summary',
+             "Latency of the acquisition and plotting stages", samples)]
+
+def loggerMetrics(logger):
+    # gpsLogger and/or imuLogger, the two interfaces being detected
+    families = []
+
+    if hasattr(logger, 'receivers'):
+        families += gpsMetrics(logger)
+
+    if hasattr(logger, 'results'):
+        families += imuMetrics(logger)
+
+    recorder = (getattr(logger, '_gpsRecorder', None) or
+                getattr(logger, '_imuRecorder', None))
+
+    if recorder is not None:
+        families += recorderMetrics(recorder)
+
+    sink = (getattr(logger, '_gpsSink', None) or
+            getattr(logger, '_imuSink', None))
+
+    if sink is not None and getattr(sink, 'counters', None) is not None:
+        families += sinkMetrics(sink)
+
+    publisher = getattr(logger, '_publisher', None)
+
+    if publisher is not None:
+        families += publisherMetrics(publisher)
+
+    sources = getattr(logger, 'sources', None)
+
+    if sources:
+        families += sourceMetrics(sources)
+
+    return families + perfMetrics()
+
+def _jsonValue(v):
+    # NaN is not JSON
+    if isinstance(v, float) and isnan(v):
+        return None
+
+    if isinstance(v, dict):
+        return {k : _jsonValue(x) for k, x in v.items()}
+
+    if isinstance(v, (list, tuple)):
+        return [_jsonValue(x) for x in v]
+
+    return v
+
+def loggerState(logger):
+    state = {'time' : time()}
+
+    if hasattr(logger, 'receivers'):
+        state['fix'] = logger.fix._asdict()
+        state['receivers'] = {r : dict(s._asdict(), fix = s.fix._asdict())
+                              for r, s in logger.receivers.states().items()}
+        state['gpsCounters'] = logger.counters
+
+    if hasattr(logger, 'results'):
+        state['imu'] = logger.results
+
+    if hasattr(logger, 'sources'):
+        state['sources'] = logger.sources
+
+    return _jsonValue(state)
+
+class _metricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server.metricsServer
+        path = self.path.split('?', 1)[0]
+
+        try:
+            if path == '/metrics':
+                body = formatMetrics(server.collect()).encode('utf-8')
+                contentType = prometheusType
+            elif path == '/state':
+                body = json.dumps(server.state()).encode('utf-8')
+                contentType = 'application/json'
+            else:
+                self.send_error(404)
+                return
+        except Exception as e:
+            self.send_error(500, str(e))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class metricsServer(object):
+    # GET /metrics: Prometheus text format, GET /state: JSON snapshot
+    def __init__(self, logger, host = '127.0.0.1', port = 9108,
+                 collectors = None, *args, **kwargs):
+        super(metricsServer, self).__init__(*args, **kwargs)
+
+        self._logger = logger
+        self._collectors = list(collectors or [])
+        self._server = ThreadingHTTPServer((host, port), _metricsHandler)
+        self._server.daemon_threads = True
+        self._server.metricsServer = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def addCollector(self, collector):
+        self._collectors.append(collector)
+
+    def collect(self):
+        families = loggerMetrics(self._logger)
+
+        for collector in self._collectors:
+            families += collector()
+
+        return families
+
+    def state(self):
+        return loggerState(self._logger)
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target = self._server.serve_forever,
+                                        kwargs = {'poll_interval' : 0.5},
+                                        name = 'metricsServer',
+                                        daemon = True)
+        self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+
+        self._server.server_close()
@@ -0,0 +1,305 @@
+from math import nan, floor
+from geoUtils import ddmmToDegrees
+
+receiverIDs = ('gps1', 'gps2')
+
+recordFields = ('receiver', 'time', 'sod',
+                'latitude', 'longitude', 'altitude',
+                'quality', 'satellites', 'hdop',
+                'yaw', 'tilt',
+                'speed', 'course', 'date',
+                'latErr', 'lonErr', 'altErr')
+
+_foldMasks = tuple((1 << (8*n)) - 1 for n in (64, 32, 16, 8, 4, 2, 1))
+
+def nmeaChecksum(body):
+    # xor of all the bytes between '$' and '*'. The bytes are read as one big
+    # integer and folded in halves: sentences are at most 82 characters long,
+    # so seven folds cover them without a per-byte Python loop
+    if len(body) > 128:
+        return nmeaChecksum(body[:128]) ^ nmeaChecksum(body[128:])
+
+    x = int.from_bytes(body.encode('ascii', 'replace'), 'little')
+    m64, m32, m16, m8, m4, m2, m1 = _foldMasks
+
+    x = (x >> 512) ^ (x & m64)
+    x = (x >> 256) ^ (x & m32)
+    x = (x >> 128) ^ (x & m16)
+    x = (x >> 64) ^ (x & m8)
+    x = (x >> 32) ^ (x & m4)
+    x = (x >> 16) ^ (x & m2)
+
+    return (x >> 8) ^ (x & m1)
+
+def nmeaSentence(body):
+    return f"${body}*{nmeaChecksum(body):02X}"
+
+# Handlers index the fields directly and convert them with float()/int(): a
+# malformed sentence raises IndexError or ValueError, which the parser counts
+# as invalid. Every value is converted before the first write to the record,
+# so a bad sentence never leaves it half updated.
+
+def _f(field):
+    return float(field) if field else nan
+
+def _coord(field, hemisphere):
+    value = ddmmToDegrees(float(field)) if field else nan
+
+    return -value if hemisphere == 'S' or hemisphere == 'W' else value
+
+def coordField(value, positive, negative):
+    # inverse of _coord: NMEA field and hemisphere of a coordinate
+    if value != value:
+        return '', ''
+
+    degrees = floor(abs(value))
+    ddmm = 100.0*degrees + (abs(value) - degrees)*60.0
+
+    return f"{ddmm:.7f}", positive if value >= 0.0 else negative
+
+def sodField(sod):
+    t = int(sod)
+
+    return f"{t // 3600:02d}{(t // 60) % 60:02d}{sod - 60*(t // 60):05.2f}"
+
+def _sod(field):
+    return int(field[0:2])*3600 + int(field[2:4])*60 + float(field[4:])
+
+def _parseGGA(fields, record):
+    if fields[10] != 'M':
+        return False
+
+    t = fields[1]
+    sod = _sod(t)
+    lat = _coord(fields[2], fields[3])
+    lon = _coord(fields[4], fields[5])
+    quality = int(fields[6]) if fields[6] else -1
+    satellites = int(fields[7]) if fields[7] else -1
+    hdop = float(fields[8]) if fields[8] else nan
+    alt = float(fields[9]) if fields[9] else nan
+
+    record['time'] = f"{t[0:2]}:{t[2:4]}:{t[4:6]}"
+    record['sod'] = sod
+    record['latitude'] = lat
+    record['longitude'] = lon
+    record['quality'] = quality
+    record['satellites'] = satellites
+    record['hdop'] = hdop
+    record['altitude'] = alt
+
+    return True
+
+def _parseAVR(fields, record):
+    if fields[4] != 'Yaw' or fields[6] != 'Tilt':
+        return False
+
+    yaw = float(fields[3]) if fields[3] else nan
+    tilt = float(fields[5]) if fields[5] else nan
+    t = fields[2]
+
+    # the attitude carries its own UTC time, the only one on receivers that
+    # send no GGA
+    if len(t) >= 6:
+        record['time'] = f"{t[0:2]}:{t[2:4]}:{t[4:6]}"
+        record['sod'] = _sod(t)
+
+    record['yaw'] = yaw
+    record['tilt'] = tilt
+
+    return True
+
+def _parseRMC(fields, record):
+    if fields[2] != 'A':
+        return False
+
+    t = fields[1]
+    sod = _sod(t)
+    lat = _coord(fields[3], fields[4])
+    lon = _coord(fields[5], fields[6])
+    speed = _f(fields[7])
+    course = _f(fields[8])
+
+    record['time'] = f"{t[0:2]}:{t[2:4]}:{t[4:6]}"
+    record['sod'] = sod
+    record['latitude'] = lat
+    record['longitude'] = lon
+    record['speed'] = speed
+    record['course'] = course
+    record['date'] = fields[9]
+
+    return True
+
+def _parseVTG(fields, record):
+    course = _f(fields[1])
+    speed = _f(fields[5])
+
+    record['course'] = course
+    record['speed'] = speed
+
+    return True
+
+def _parseGST(fields, record):
+    latErr = _f(fields[6])
+    lonErr = _f(fields[7])
+    altErr = _f(fields[8])
+
+    record['latErr'] = latErr
+    record['lonErr'] = lonErr
+    record['altErr'] = altErr
+
+    return True
+
+def _parseZDA(fields, record):
+    t = fields[1]
+    sod = _sod(t)
+    day, month, year = int(fields[2]), int(fields[3]), int(fields[4])
+
+    if not (1 <= day <= 31 and 1 <= month <= 12):
+        return False
+
+    record['time'] = f"{t[0:2]}:{t[2:4]}:{t[4:6]}"
+    record['sod'] = sod
+    # ddmmyy, as in RMC
+    record['date'] = f"{day:02d}{month:02d}{year % 100:02d}"
+
+    return True
+
+# standard sentences are keyed without the talker ID ("GPGGA" and "GNGGA"
+# are both "GGA"), proprietary ones by their address and sentence name
+sentenceHandlers = {'GGA'      : _parseGGA,
+                    'RMC'      : _parseRMC,
+                    'VTG'      : _parseVTG,
+                    'GST'      : _parseGST,
+                    'ZDA'      : _parseZDA,
+                    'PTNL,AVR' : _parseAVR}
+
+def registerSentence(key, handler):
+    sentenceHandlers[key] = handler
+
+class nmeaParser(object):
+    def __init__(self, receivers = receiverIDs, requireChecksum = True,
+                 *args, **kwargs):
+        super(nmeaParser, self).__init__(*args, **kwargs)
+
+        self._receivers = frozenset(receivers)
+        self._requireChecksum = requireChecksum
+        # one record per receiver: a receiver never overwrites the fields of
+        # another one
+        self._records = {}
+        self._record = self._newRecord(None)
+        self._lastSentences = []
+        self._lastReceivers = []
+        self._counters = {'sentences'   : 0,
+                          'badChecksum' : 0,
+                          'invalid'     : 0}
+
+    def _newRecord(self, receiver):
+        record = dict.fromkeys(recordFields, nan)
+        record.update({'receiver'   : receiver,
+                       'time'       : '',
+                       'date'       : '',
+                       'quality'    : -1,
+                       'satellites' : -1})
+
+        return record
+
+    @property
+    def record(self):
+        # record of the last receiver updated
+        return self._record
+
+    @property
+    def records(self):
+        return self._records
+
+    @property
+    def sentences(self):
+        return self._lastSentences
+
+    @property
+    def updated(self):
+        # receivers updated by the last parse, in order
+        return self._lastReceivers
+
+    @property
+    def counters(self):
+        return dict(self._counters)
+
+    def _parseSentence(self, sentence):
+        body, star, cs = sentence.partition('*')
+
+        if star:
+            try:
+                valid = int(cs[:2], 16) == nmeaChecksum(body)
+            except ValueError:
+                valid = False
+        else:
+            valid = not self._requireChecksum
+
+        if not valid:
+            self._counters['badChecksum'] += 1
+            return None
+
+        fields = body.split(',')
+        address = fields[0]
+
+        if address[:1] == 'P':
+            key = address + ',' + fields[1] if len(fields) > 1 else address
+        else:
+            key = address[2:]
+
+        handler = sentenceHandlers.get(key)
+
+        try:
+            parsed = handler is not None and handler(fields, self._record)
+        except (IndexError, ValueError):
+            parsed = False
+
+        if not parsed:
+            self._counters['invalid'] += 1
+            return None
+
+        self._counters['sentences'] += 1
+
+        return key
+
+    def parse(self, msg):
+        # a datagram holds one or more lines "<receiver>,$<sentence>*hh",
+        # lines without the receiver tag belong to the last tagged one
+        receiver = None
+        record = None
+        sentences = self._lastSentences = []
+        updated = self._lastReceivers = []
+
+        for line in msg.split('\n'):
+            tag, sep, line = line.partition('$')
+
+            if not sep:
+                continue
+
+            if tag:
+                tag = tag.strip().rstrip(',').rstrip()
+
+                if tag:
+                    receiver = tag if tag in self._receivers else None
+                    record = self._records.get(receiver)
+
+                    if record is None and receiver is not None:
+                        record = self._records[receiver] = \
+                                 self._newRecord(receiver)
+
+            if receiver is None:
+                continue
+
+            self._record = record
+
+            for sentence in line.rstrip().split('$'):
+                key = self._parseSentence(sentence)
+
+                if key is not None:
+                    sentences.append(key)
+
+                    if receiver not in updated:
+                        updated.append(receiver)
+
+        return len(sentences)
@@ -0,0 +1,196 @@
+import threading
+from time import monotonic, perf_counter_ns
+
+# Latencies are kept in log-linear buckets: the bit length of the value in
+# ns and the two bits after the leading one, so a bucket spans at most 25%
+# of its lower bound. Recording is an increment in a list; the histogram
+# covers the last `window` seconds in `slices` rotating slices.
+_subBits = 2
+_subMask = (1 << _subBits) - 1
+_buckets = 64 << _subBits
+
+def _bucket(ns):
+    b = ns.bit_length()
+
+    if b <= _subBits + 1:
+        return ns
+
+    return (b << _subBits) | ((ns >> (b - _subBits - 1)) & _subMask)
+
+def _bucketUpper(idx):
+    if idx < (_subBits + 2) << _subBits:
+        return idx + 1
+
+    b = idx >> _subBits
+
+    return ((1 << _subBits) + (idx & _subMask) + 1) << (b - _subBits - 1)
+
+class latencyHistogram(object):
+    def __init__(self, window = 60.0, slices = 6, *args, **kwargs):
+        super(latencyHistogram, self).__init__(*args, **kwargs)
+
+        self._sliceLength = window/slices
+        self._slices = [[0]*_buckets for _ in range(slices)]
+        self._maxes = [0]*slices
+        self._current = 0
+        self._sliceEnd = monotonic() + self._sliceLength
+        # totals since the start, for the Prometheus counters
+        self._count = 0
+        self._sum = 0
+        # record() runs on the acquisition threads, snapshot() on the
+        # metrics one: both may rotate the slices
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def total(self):
+        return self._sum*1e-9
+
+    def _rotate(self, now):
+        # slices older than the window are emptied, skipping the ones that
+        # got no value at all
+        n = len(self._slices)
+        steps = min(n, int((now - self._sliceEnd)/self._sliceLength) + 1)
+
+        for _ in range(steps):
+            self._current = (self._current + 1) % n
+            self._slices[self._current] = [0]*_buckets
+            self._maxes[self._current] = 0
+
+        self._sliceEnd += self._sliceLength*int((now - self._sliceEnd)/
+                                                self._sliceLength + 1)
+
+    def record(self, ns):
+        now = monotonic()
+        idx = _bucket(ns)
+
+        with self._lock:
+            if now >= self._sliceEnd:
+                self._rotate(now)
+
+            self._slices[self._current][idx] += 1
+            self._count += 1
+            self._sum += ns
+
+            if ns > self._maxes[self._current]:
+                self._maxes[self._current] = ns
+
+    def snapshot(self, qs = (0.5, 0.95, 0.99)):
+        # over the window: count, upper bounds of the buckets holding the
+        # quantiles and maximum, in seconds (None without values)
+        now = monotonic()
+
+        with self._lock:
+            if now >= self._sliceEnd:
+                self._rotate(now)
+
+            counts = [sum(c) for c in zip(*self._slices)]
+            peak = max(self._maxes)*1e-9
+
+        total = sum(counts)
+
+        if total == 0:
+            return 0, [None]*len(qs), None
+
+        result = []
+
+        for q in qs:
+            rank = q*total
+            seen = 0
+
+            for idx, c in enumerate(counts):
+                seen += c
+
+                if c and seen >= rank:
+                    result.append(_bucketUpper(idx)*1e-9)
+                    break
+
+        return total, [min(q, peak) for q in result], peak
+
+class perfMonitor(object):
+    # one histogram per stage, created on first use. record() costs about a
+    # microsecond: the loggers time their stages unconditionally, enabled
+    # only saves that microsecond
+    def __init__(self, window = 60.0, slices = 6, *args, **kwargs):
+        super(perfMonitor, self).__init__(*args, **kwargs)
+
+        self._window = window
+        self._slices = slices
+        self._stages = {}
+        self._start = monotonic()
+        self.enabled = True
+
+    @property
+    def stages(self):
+        return dict(self._stages)
+
+    @property
+    def window(self):
+        return self._window
+
+    def record(self, stage, ns):
+        if not self.enabled:
+            return
+
+        histogram = self._stages.get(stage)
+
+        if histogram is None:
+            histogram = self._stages.setdefault(stage,
+                                                latencyHistogram(self._window,
+                                                                 self._slices))
+
+        histogram.record(ns)
+
+    def since(self, stage, t0):
+        # records the time elapsed since t0 = perf_counter_ns(), returns now
+        # so that consecutive stages can be chained
+        t1 = perf_counter_ns()
+        self.record(stage, t1 - t0)
+
+        return t1
+
+    def timed(self, stage):
+        # decorator for whole functions or methods
+        def decorator(func):
+            def wrapper(*args, **kwargs):
+                t0 = perf_counter_ns()
+
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(stage, perf_counter_ns() - t0)
+
+            wrapper.__name__ = func.__name__
+            wrapper.__doc__ = func.__doc__
+
+            return wrapper
+
+        return decorator
+
+    def reset(self):
+        self._stages = {}
+        self._start = monotonic()
+
+    def summary(self):
+        # stages over the last window: rate and latency quantiles in ms
+        span = min(self._window, monotonic() - self._start) or 1.0
+        lines = [f"{'stage':<20} {'rate/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+                 f"{'p99 ms':>9} {'max ms':>9}"]
+
+        for stage in sorted(self._stages):
+            count, (p50, p95, p99), peak = self._stages[stage].snapshot()
+
+            if count == 0:
+                continue
+
+            lines.append(f"{stage:<20} {count/span:9.1f} "
+                         f"{1e3*p50:9.3f} {1e3*p95:9.3f} {1e3*p99:9.3f} "
+                         f"{1e3*peak:9.3f}")
+
+        return '\n'.join(lines)
+
+# process wide monitor the loggers record their stages into
+perf = perfMonitor()
@@ -0,0 +1,163 @@
+from math import inf
+from time import monotonic
+from collections import namedtuple, deque
+
+receiverState = namedtuple('receiverState', ['receiver', 'fix', 'age',
+                                             'rate', 'count', 'stale'])
+
+# GGA fix quality from the best to the worst: RTK fixed, RTK float, DGPS
+# and PPS, autonomous, dead reckoning. 0 (no fix) is never selected
+qualityRank = {4 : 0, 5 : 1, 2 : 2, 3 : 2, 1 : 3, 6 : 4}
+
+class receiverStore(object):
+    # Latest fix of every receiver, keyed by receiver ID. Fixes are
+    # immutable: update() replaces a receiver entry as a whole, so readers on
+    # other threads never see half updated states.
+    def __init__(self, staleAfter = 3.0, rateWindow = 32, *args, **kwargs):
+        super(receiverStore, self).__init__(*args, **kwargs)
+
+        self._staleAfter = staleAfter
+        self._rateWindow = rateWindow
+        # receiver -> (fix, update time, arrival times, count)
+        self._states = {}
+        # receiver (None for all of them) -> callbacks
+        self._subscribers = {}
+        self._callbackErrors = 0
+        self._lastError = None
+
+    @property
+    def receivers(self):
+        return list(self._states)
+
+    @property
+    def callbackErrors(self):
+        return self._callbackErrors
+
+    @property
+    def lastError(self):
+        return self._lastError
+
+    def update(self, fix, now = None, notify = True):
+        now = monotonic() if now is None else now
+        old = self._states.get(fix.receiver)
+
+        if old is None:
+            arrivals = deque(maxlen = self._rateWindow)
+            count = 0
+        else:
+            arrivals = old[2]
+            count = old[3]
+
+        arrivals.append(now)
+        self._states[fix.receiver] = (fix, now, arrivals, count + 1)
+
+        if notify:
+            self.notify(fix)
+
+    def notify(self, fix):
+        # callbacks run on the updating thread (the receiver thread when
+        # started): they must be quick. One raising is counted and skipped,
+        # the other subscribers and the caller still get the fix
+        for receiver in (fix.receiver, None):
+            for callback in self._subscribers.get(receiver, ()):
+                try:
+                    callback(fix)
+                except Exception as e:
+                    self._callbackErrors += 1
+                    self._lastError = f"{type(e).__name__}: {e}"
+
+    def fix(self, receiver):
+        state = self._states.get(receiver)
+
+        return state[0] if state is not None else None
+
+    def state(self, receiver, now = None):
+        s = self._states.get(receiver)
+
+        if s is None:
+            return None
+
+        now = monotonic() if now is None else now
+        fix, updated, arrivals, count = s
+        age = now - updated
+        span = arrivals[-1] - arrivals[0]
+        rate = (len(arrivals) - 1)/span if span > 0.0 else 0.0
+
+        return receiverState(receiver, fix, age, rate, count,
+                             age > self._staleAfter)
+
+    def states(self, now = None):
+        now = monotonic() if now is None else now
+
+        return {r : self.state(r, now) for r in list(self._states)}
+
+    def subscribe(self, callback, receiver = None):
+        # copy on write: update() may be iterating over the current list
+        callbacks = list(self._subscribers.get(receiver, ()))
+        callbacks.append(callback)
+        self._subscribers[receiver] = callbacks
+
+        return (receiver, callback)
+
+    def unsubscribe(self, handle):
+        receiver, callback = handle
+        callbacks = [c for c in self._subscribers.get(receiver, ())
+                     if c is not callback]
+
+        self._subscribers[receiver] = callbacks
+
+    def best(self, now = None, fuse = False):
+        # best live position by fix quality, then HDOP, then age. With fuse
+        # the positions of the receivers sharing the best quality are
+        # averaged with 1/HDOP^2 weights. A position without orientation
+        # takes yaw and tilt from the freshest receiver providing them
+        now = monotonic() if now is None else now
+        live = [s for s in self._states.values()
+                if now - s[1] <= self._staleAfter]
+
+        if not live:
+            return None
+
+        def rank(s):
+            fix = s[0]
+            hdop = fix.hdop if fix.hdop == fix.hdop else inf
+
+            return (qualityRank.get(fix.quality, len(qualityRank)), hdop,
+                    -s[1])
+
+        placed = [s for s in live
+                  if s[0].latitude == s[0].latitude and s[0].quality != 0]
+
+        if not placed:
+            return max(live, key = lambda s: s[1])[0]
+
+        placed.sort(key = rank)
+        top = placed[0][0]
+
+        if fuse and len(placed) > 1:
+            topRank = rank(placed[0])[0]
+            group = [s[0] for s in placed if rank(s)[0] == topRank]
+
+            if len(group) > 1:
+                weights = [1.0/(f.hdop*f.hdop) if f.hdop == f.hdop and
+                           f.hdop > 0.0 else 1.0 for f in group]
+                total = sum(weights)
+
+                def mean(field):
+                    return sum(w*getattr(f, field)
+                               for w, f in zip(weights, group))/total
+
+                top = top._replace(receiver = '+'.join(f.receiver
+                                                       for f in group),
+                                   latitude = mean('latitude'),
+                                   longitude = mean('longitude'),
+                                   altitude = mean('altitude'))
+
+        if top.yaw != top.yaw:
+            oriented = [s for s in live if s[0].yaw == s[0].yaw]
+
+            if oriented:
+                o = max(oriented, key = lambda s: s[1])[0]
+                top = top._replace(yaw = o.yaw, tilt = o.tilt)
+
+        return top
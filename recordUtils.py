@@ -0,0 +1,277 @@
+import os, json, threading
+import numpy as np
+from collections import deque
+from time import time, gmtime, strftime
+
+# A recording is one file per stream and rotation: a JSON header padded to
+# a multiple of 64 bytes, followed by fixed-width records of the stream
+# dtype, so a file can be memory mapped as a structured array.
+recordMagic = b'GPSIMREC'
+recordVersion = 1
+recordAlign = 64
+recordSuffix = '.rec'
+
+def _encodeHeader(header):
+    body = json.dumps(header).encode('utf-8')
+    size = len(recordMagic) + 4 + len(body)
+    pad = -size % recordAlign
+
+    return (recordMagic + (len(body) + pad).to_bytes(4, 'little') +
+            body + b' '*pad)
+
+def _descrToDtype(descr):
+    # json turns the (name, format) tuples of dtype.descr into lists
+    return np.dtype([tuple(d) if isinstance(d, list) else d for d in descr])
+
+def readHeader(f):
+    magic = f.read(len(recordMagic))
+
+    if magic != recordMagic:
+        raise ValueError(f"{getattr(f, 'name', f)} is not a recording")
+
+    size = int.from_bytes(f.read(4), 'little')
+    header = json.loads(f.read(size).decode('utf-8'))
+    header['offset'] = len(recordMagic) + 4 + size
+    header['dtype'] = _descrToDtype(header['dtype'])
+
+    return header
+
+def readRecording(path, mmap = True):
+    # header and records of a recording; a record cut by a crash is ignored
+    with open(path, 'rb') as f:
+        header = readHeader(f)
+
+    dtype = header['dtype']
+    count = (os.path.getsize(path) - header['offset'])//dtype.itemsize
+
+    if not mmap:
+        with open(path, 'rb') as f:
+            f.seek(header['offset'])
+            return header, np.fromfile(f, dtype, count)
+
+    if count == 0:
+        return header, np.zeros(0, dtype)
+
+    return header, np.memmap(path, dtype, 'r', header['offset'], (count,))
+
+def listRecordings(prefix, stream = None):
+    # files of a session in rotation order
+    directory, base = os.path.split(prefix)
+    directory = directory or '.'
+    paths = []
+
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith(base + '-') and name.endswith(recordSuffix)):
+            continue
+
+        # <base>-<session>-<stream>-<rotation>.rec
+        if stream is not None and name.rsplit('-', 2)[1] != stream:
+            continue
+
+        paths.append(os.path.join(directory, name))
+
+    return paths
+
+class sessionRecorder(object):
+    def __init__(self, prefix, streams = None, maxBytes = 256 << 20,
+                 maxSeconds = 3600.0, flushInterval = 0.5, maxQueue = 100000,
+                 bufSize = 1 << 20, *args, **kwargs):
+        super(sessionRecorder, self).__init__(*args, **kwargs)
+
+        self._prefix = prefix
+        self._session = strftime('%Y%m%d-%H%M%S', gmtime())
+        self._streams = {k : np.dtype(v) for k, v in (streams or {}).items()}
+        self._maxBytes = maxBytes
+        self._maxSeconds = maxSeconds
+        self._flushInterval = flushInterval
+        # rows waiting for the writer, not entries: one batch can hold
+        # thousands
+        self._maxQueue = maxQueue
+        self._queuedRows = 0
+        self._queueLock = threading.Lock()
+        self._bufSize = bufSize
+        # stream -> [file, bytes written, opening time, rotation number]
+        self._files = {}
+        # stream -> next rotation number, kept when a broken file is dropped
+        self._rotations = {}
+        self._queue = deque()
+        self._counters = {'records' : 0,
+                          'bytes'   : 0,
+                          'files'   : 0,
+                          'dropped' : 0,
+                          'errors'  : 0}
+
+        directory = os.path.dirname(prefix)
+
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+
+        self._stopEvent = threading.Event()
+        self._writer = threading.Thread(target = self._writeLoop,
+                                        name = 'sessionRecorder',
+                                        daemon = True)
+        self._writer.start()
+
+    @property
+    def prefix(self):
+        return self._prefix
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def counters(self):
+        return dict(self._counters)
+
+    def addStream(self, stream, dtype):
+        self._streams.setdefault(stream, np.dtype(dtype))
+
+    def record(self, stream, rows):
+        # called on the acquisition path: no conversion and no I/O, rows
+        # (a structured array or one record) are queued for the writer
+        count = len(rows) if isinstance(rows, np.ndarray) else 1
+
+        with self._queueLock:
+            if self._queuedRows + count > self._maxQueue:
+                self._counters['dropped'] += count
+                return
+
+            self._queuedRows += count
+            self._queue.append((stream, rows))
+
+    def _fileFor(self, stream, nbytes):
+        entry = self._files.get(stream)
+        now = time()
+
+        if entry is not None:
+            f, size, opened, _ = entry
+
+            if size + nbytes <= self._maxBytes and \
+               now - opened < self._maxSeconds:
+                return entry
+
+            f.close()
+
+        seq = self._rotations.get(stream, 0)
+        path = (f"{self._prefix}-{self._session}-{stream}-"
+                f"{seq:04d}{recordSuffix}")
+        header = _encodeHeader({'version'  : recordVersion,
+                                'stream'   : stream,
+                                'session'  : self._session,
+                                'sequence' : seq,
+                                'created'  : now,
+                                'dtype'    : self._streams[stream].descr})
+
+        f = open(path, 'wb', buffering = self._bufSize)
+        f.write(header)
+
+        entry = self._files[stream] = [f, 0, now, seq]
+        self._rotations[stream] = seq + 1
+        self._counters['files'] += 1
+
+        return entry
+
+    def _toArray(self, stream, items):
+        dtype = self._streams.get(stream)
+
+        if dtype is None:
+            first = items[0]
+            dtype = first.dtype if hasattr(first, 'dtype') else None
+
+            if dtype is None:
+                raise ValueError(f"no dtype for recording stream {stream}")
+
+            dtype = self._streams[stream] = dtype
+
+        # runs of single records are converted in one go, arrays as they are
+        chunks = []
+        rows = []
+
+        for item in items:
+            if isinstance(item, np.ndarray):
+                if rows:
+                    chunks.append(np.array(rows, dtype))
+                    rows = []
+                chunks.append(item.astype(dtype, copy = False))
+            else:
+                rows.append(item)
+
+        if rows:
+            chunks.append(np.array(rows, dtype))
+
+        return np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+
+    def _flush(self):
+        pending = {}
+
+        with self._queueLock:
+            while self._queue:
+                stream, rows = self._queue.popleft()
+                pending.setdefault(stream, []).append(rows)
+
+            self._queuedRows = 0
+
+        for stream, items in pending.items():
+            try:
+                data = self._toArray(stream, items)
+            except (ValueError, TypeError):
+                # rows not matching the stream dtype are lost, not the thread
+                self._counters['errors'] += len(items)
+                continue
+
+            if len(data) == 0:
+                continue
+
+            # rotation happens on record boundaries only
+            perRow = data.dtype.itemsize
+            perFile = max(1, self._maxBytes//perRow)
+
+            try:
+                for i in range(0, len(data), perFile):
+                    chunk = data[i:i+perFile].tobytes()
+                    entry = self._fileFor(stream, len(chunk))
+
+                    entry[0].write(chunk)
+                    entry[1] += len(chunk)
+
+                    self._counters['bytes'] += len(chunk)
+                    self._counters['records'] += len(chunk)//perRow
+            except OSError:
+                # full disk, removed directory, ...: the rest of the rows
+                # are lost, the next flush opens the next rotation
+                self._counters['errors'] += 1
+                self._dropFile(stream)
+
+        for stream, entry in list(self._files.items()):
+            try:
+                entry[0].flush()
+            except OSError:
+                self._counters['errors'] += 1
+                self._dropFile(stream)
+
+    def _dropFile(self, stream):
+        entry = self._files.pop(stream, None)
+
+        if entry is not None:
+            try:
+                entry[0].close()
+            except OSError:
+                pass
+
+    def _writeLoop(self):
+        while not self._stopEvent.wait(self._flushInterval):
+            self._flush()
+
+        self._flush()
+
+    def close(self):
+        if self._writer is None:
+            return
+
+        self._stopEvent.set()
+        self._writer.join()
+        self._writer = None
+
+        for stream in list(self._files):
+            self._dropFile(stream)
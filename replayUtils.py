@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+
+import sys, argparse
+import numpy as np
+from time import monotonic, sleep
+from recordUtils import listRecordings, readRecording
+from nmeaUtils import nmeaSentence, coordField, sodField
+from gpsUtils import gpsFix
+
+replayAddr = ('replay', 0)
+
+def _num(value, fmt):
+    return '' if value != value else format(value, fmt)
+
+def fixDatagram(row):
+    # a recorded fix back to the "<receiver>,$GPGGA...\r\n<receiver>,$PTNL..."
+    # datagram the receivers send, so that the replay goes through the parser
+    receiver = row['receiver'].decode('ascii', 'replace').lower()
+    sod = float(row['sod'])
+    t = sodField(sod) if sod == sod else ''
+    lines = []
+
+    if t:
+        lat, ns = coordField(float(row['latitude']), 'N', 'S')
+        lon, ew = coordField(float(row['longitude']), 'E', 'W')
+        quality = row['quality'] if row['quality'] >= 0 else ''
+        satellites = (f"{row['satellites']:02d}" if row['satellites'] >= 0
+                      else '')
+
+        lines.append(nmeaSentence(f"GPGGA,{t},{lat},{ns},{lon},{ew},"
+                                  f"{quality},{satellites},"
+                                  f"{_num(row['hdop'], '.1f')},"
+                                  f"{_num(row['altitude'], '.3f')},M,,M,,"))
+
+    if row['yaw'] == row['yaw'] or row['tilt'] == row['tilt']:
+        lines.append(nmeaSentence(f"PTNL,AVR,{t},"
+                                  f"{_num(row['yaw'], '+.4f')},Yaw,"
+                                  f"{_num(row['tilt'], '+.4f')},Tilt,,,,,"))
+
+    return ''.join(f"{receiver},{l}\r\n" for l in lines).encode('ascii')
+
+def fixFromRow(row):
+    sod = float(row['sod'])
+    t = int(sod) if sod == sod else None
+
+    return gpsFix(row['receiver'].decode('ascii', 'replace'),
+                  f"{t // 3600:02d}:{(t // 60) % 60:02d}:{t % 60:02d}"
+                  if t is not None else "",
+                  sod, float(row['latitude']), float(row['longitude']),
+                  float(row['altitude']), float(row['yaw']),
+                  float(row['tilt']), int(row['quality']),
+                  int(row['satellites']), float(row['hdop']))
+
+class _streamCursor(object):
+    # rotation files of a stream read in order, each one memory mapped
+    def __init__(self, chunks, *args, **kwargs):
+        super(_streamCursor, self).__init__(*args, **kwargs)
+
+        self._chunks = [c for c in chunks if len(c)]
+        self._chunk = 0
+        self._pos = 0
+
+    @property
+    def first(self):
+        return int(self._chunks[0]['time'][0]) if self._chunks else None
+
+    @property
+    def last(self):
+        return int(self._chunks[-1]['time'][-1]) if self._chunks else None
+
+    @property
+    def finished(self):
+        return self._chunk >= len(self._chunks)
+
+    def take(self, until):
+        # rows up to time `until` included, zero copy within one file
+        parts = []
+
+        while self._chunk < len(self._chunks):
+            chunk = self._chunks[self._chunk]
+            end = np.searchsorted(chunk['time'], until, 'right')
+
+            if end > self._pos:
+                parts.append(chunk[self._pos:end])
+
+            if end < len(chunk):
+                self._pos = end
+                break
+
+            self._chunk += 1
+            self._pos = 0
+
+        if not parts:
+            return None
+
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+class sessionReplay(object):
+    # speed: 1.0 real time, N for N times faster, None as fast as possible,
+    # advancing the session clock by stepSeconds at every step
+    def __init__(self, prefix, speed = 1.0, stepSeconds = 1.0,
+                 resynthesize = True, *args, **kwargs):
+        super(sessionReplay, self).__init__(*args, **kwargs)
+
+        chunks = {}
+
+        for path in listRecordings(prefix):
+            header, rows = readRecording(path)
+            chunks.setdefault(header['stream'], []).append(rows)
+
+        if not chunks:
+            raise FileNotFoundError(f"no recording found for {prefix}")
+
+        self._cursors = {k : _streamCursor(v) for k, v in chunks.items()}
+        firsts = [c.first for c in self._cursors.values()
+                  if c.first is not None]
+        lasts = [c.last for c in self._cursors.values()
+                 if c.last is not None]
+
+        self._start = min(firsts) if firsts else 0
+        self._end = max(lasts) if lasts else 0
+        self._clock = self._start - 1
+        self._speed = speed
+        self._step = int(stepSeconds*1e9)
+        self._resynthesize = resynthesize
+        self._wallStart = None
+        self._counters = {'gps' : 0, 'imu' : 0, 'steps' : 0}
+
+    @property
+    def streams(self):
+        return list(self._cursors)
+
+    @property
+    def duration(self):
+        return (self._end - self._start)*1e-9
+
+    @property
+    def position(self):
+        return max(0, self._clock - self._start)*1e-9
+
+    @property
+    def finished(self):
+        return all(c.finished for c in self._cursors.values())
+
+    @property
+    def counters(self):
+        return dict(self._counters)
+
+    def step(self, gps = None, imu = None):
+        if self._speed is None:
+            self._clock += self._step
+        else:
+            now = monotonic()
+
+            if self._wallStart is None:
+                self._wallStart = now
+
+            self._clock = (self._start +
+                           int((now - self._wallStart)*self._speed*1e9))
+
+        fed = 0
+        rows = self._cursors['gps'].take(self._clock) \
+               if 'gps' in self._cursors else None
+
+        if rows is not None:
+            if gps is not None:
+                for row in rows:
+                    if self._resynthesize:
+                        gps._handleDatagram(fixDatagram(row), replayAddr)
+                    else:
+                        gps._handleFix(fixFromRow(row))
+
+            fed += len(rows)
+            self._counters['gps'] += len(rows)
+
+        batches = {}
+
+        for stream, cursor in self._cursors.items():
+            if stream == 'gps':
+                continue
+
+            rows = cursor.take(self._clock)
+
+            if rows is not None:
+                batches[stream] = rows
+                fed += len(rows)
+                self._counters['imu'] += len(rows)
+
+        if batches and imu is not None:
+            imu.ingestBatches(batches)
+
+        self._counters['steps'] += 1
+
+        return fed
+
+    def run(self, gps = None, imu = None, update = None, idle = 0.01):
+        # update() is called after every step, the plotter update paces the
+        # replay with its frame rate
+        while not self.finished:
+            self.step(gps, imu)
+
+            if update is not None:
+                update()
+            elif self._speed is not None:
+                sleep(idle)
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description = "Replay a recorded "
+                                        "session")
+    argParser.add_argument('prefix', help = "recording prefix, the "
+                           "logFileName of the session")
+    argParser.add_argument('-s', '--speed', default = '1',
+                           help = "replay speed factor or 'max' "
+                                  "(default real time)")
+    argParser.add_argument('--step', type = float, default = 1.0,
+                           help = "session seconds per step at max speed")
+    argParser.add_argument('--fixes', action = 'store_true',
+                           help = "feed the recorded fixes without "
+                                  "going through the NMEA parser")
+    argParser.add_argument('--no-plot', action = 'store_true',
+                           help = "parse and update the state only")
+    argParser.add_argument('--fusion', default = None,
+                           help = "orientation backend for the IMU samples")
+
+    args = argParser.parse_args()
+    speed = None if args.speed == 'max' else float(args.speed)
+
+    replay = sessionReplay(args.prefix, speed, args.step,
+                           resynthesize = not args.fixes)
+
+    if args.no_plot:
+        from gpsUtils import gpsLogger
+        from imuUtils import imuLogger
+
+        gps = gpsLogger(localPort = None)
+        imu = imuLogger(dbHost = None, convHost = None, fusion = args.fusion)
+        update = None
+    else:
+        from graphUtils import gpsPlotter
+
+        gps = imu = gpsPlotter(localPort = None, dbHost = None,
+                               convHost = None, fusion = args.fusion,
+                               blit = True, lod = True, plotInterval = 0,
+                               plotPoints = 100000,
+                               frameRate = None if speed is None else 10)
+        update = gps.update
+
+    t0 = monotonic()
+
+    try:
+        replay.run(gps, imu, update)
+    except KeyboardInterrupt:
+        pass
+
+    elapsed = monotonic() - t0
+    counters = replay.counters
+
+    print(f"{replay.position:.1f} s of session replayed in {elapsed:.2f} s "
+          f"({replay.position/elapsed:.1f}x): "
+          f"{counters['gps']/elapsed:.0f} fixes/s, "
+          f"{counters['imu']/elapsed:.0f} IMU samples/s, "
+          f"{counters['steps']/elapsed:.1f} steps/s")
+
+    if update is not None:
+        print(f"FPS = {gps.fps:.1f}")
+
+    gps.close()
+
+    if imu is not gps:
+        imu.close()
+
+    sys.exit(0)
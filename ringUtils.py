@@ -0,0 +1,87 @@
+import numpy as np
+
+class ringBuffer(object):
+    # Fixed capacity circular buffer of structured rows. Every row is written
+    # twice, at head and head + capacity: the last `size` rows are then
+    # always contiguous in memory and every read is a view, never a copy.
+    def __init__(self, dtype, capacity, *args, **kwargs):
+        super(ringBuffer, self).__init__(*args, **kwargs)
+
+        if capacity < 1:
+            raise ValueError(f"ring buffer capacity must be positive, "
+                             f"got {capacity}")
+
+        self._capacity = capacity
+        self._data = np.zeros(2*capacity, dtype)
+        self._head = 0
+        self._size = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def full(self):
+        return self._size == self._capacity
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row):
+        h = self._head
+
+        self._data[h] = row
+        self._data[h + self._capacity] = row
+
+        self._head = h + 1 if h + 1 < self._capacity else 0
+
+        if self._size < self._capacity:
+            self._size += 1
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype = self._data.dtype)[-self._capacity:]
+        n = len(rows)
+
+        if n == 0:
+            return
+
+        idx = (self._head + np.arange(n)) % self._capacity
+
+        self._data[idx] = rows
+        self._data[idx + self._capacity] = rows
+
+        self._head = (self._head + n) % self._capacity
+        self._size = min(self._size + n, self._capacity)
+
+    def view(self, count = None):
+        # the last `count` rows (all by default), oldest first
+        end = self._head + self._capacity
+        count = self._size if count is None else min(count, self._size)
+
+        return self._data[end - count:end]
+
+    def window(self, start = None, stop = None, key = 'time'):
+        # rows with start <= key <= stop; key must be non decreasing
+        rows = self.view()
+        keys = rows[key]
+
+        i0 = 0 if start is None else np.searchsorted(keys, start, 'left')
+        i1 = len(rows) if stop is None else np.searchsorted(keys, stop,
+                                                            'right')
+
+        return rows[i0:i1]
+
+    @property
+    def last(self):
+        if self._size == 0:
+            return None
+
+        return self._data[self._head + self._capacity - 1]
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
@@ -0,0 +1,660 @@
+#!/usr/bin/python3
+
+import os, sys, json, mmap, argparse
+import numpy as np
+from multiprocessing import shared_memory
+from time import time_ns, monotonic, sleep
+from gpsUtils import gpsLogger, gpsFix, fixDtype
+from imuUtils import imuLogger, convDtype, queryDtype, nsToTimeStr
+from sourceUtils import notAvailable
+
+# SharedMemory(track = False) is 3.13+: the older Pythons map the segments
+# of the readers themselves
+_untracked = sys.version_info >= (3, 13)
+_posixshmem = None
+
+if not _untracked:
+    try:
+        import _posixshmem
+    except ImportError:
+        # Windows: a segment goes away with its last handle
+        pass
+
+# One acquisition process publishes, any number of processes read. The
+# segment holds a JSON header describing its rings, then one ring per
+# stream: a write count, a sequence number per slot and the rows. The
+# publisher is the only writer of a ring (seqlock): it makes the slot
+# sequence odd, writes the row, makes it even (2n + 2 for the n-th row)
+# and then advances the count. Readers copy the rows and keep those whose
+# sequence is still the expected one afterwards, without locks nor any
+# message to the publisher.
+shmMagic = b'GPSIMSHM'
+shmAlign = 64
+
+_stateOpen = 1
+_stateClosed = 2
+
+def _aligned(n):
+    return n + (-n % shmAlign)
+
+def _descrToDtype(descr):
+    return np.dtype([tuple(d) if isinstance(d, list) else d for d in descr])
+
+class _mapping(object):
+    # a POSIX segment mapped by a reader, for the Pythons without
+    # SharedMemory(track = False)
+    def __init__(self, name, *args, **kwargs):
+        super(_mapping, self).__init__(*args, **kwargs)
+
+        fd = _posixshmem.shm_open('/' + name, os.O_RDWR, mode = 0o600)
+
+        try:
+            self._mmap = mmap.mmap(fd, os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+
+        self.buf = memoryview(self._mmap)
+
+    def close(self):
+        self.buf.release()
+        self._mmap.close()
+
+def _openSegment(name):
+    # SharedMemory registers a POSIX segment with the resource tracker of
+    # multiprocessing, which unlinks it when the reader exits, taking it
+    # away from the publisher
+    if _untracked:
+        return shared_memory.SharedMemory(name, track = False)
+
+    if _posixshmem is None:
+        return shared_memory.SharedMemory(name)
+
+    return _mapping(name)
+
+def _pidAlive(pid):
+    if os.name == 'nt':
+        # os.kill() would terminate the process
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+class sharedRing(object):
+    # views on one ring of a segment
+    def __init__(self, buf, offset, dtype, capacity, *args, **kwargs):
+        super(sharedRing, self).__init__(*args, **kwargs)
+
+        self._capacity = capacity
+        self._count = np.ndarray(1, np.uint64, buf, offset)
+        self._seqs = np.ndarray(capacity, np.uint64, buf, offset + shmAlign)
+        self._rows = np.ndarray(capacity, dtype, buf,
+                                offset + shmAlign +
+                                _aligned(8*capacity))
+
+    @staticmethod
+    def size(dtype, capacity):
+        return shmAlign + _aligned(8*capacity) + _aligned(dtype.itemsize*
+                                                           capacity)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def dtype(self):
+        return self._rows.dtype
+
+    @property
+    def count(self):
+        return int(self._count[0])
+
+    def append(self, row):
+        # publisher side, one row (tuple or record)
+        n = int(self._count[0])
+        i = n % self._capacity
+
+        self._seqs[i] = 2*n + 1
+        self._rows[i] = row
+        self._seqs[i] = 2*n + 2
+        self._count[0] = n + 1
+
+    def extend(self, rows):
+        # publisher side, rows of the ring dtype; only the last capacity
+        # rows of a larger batch can be kept
+        n = int(self._count[0])
+        k = len(rows)
+
+        if k == 0:
+            return
+
+        if k > self._capacity:
+            n += k - self._capacity
+            rows = rows[-self._capacity:]
+            k = self._capacity
+
+        seqs = 2*np.arange(n, n + k, dtype = np.uint64)
+        idx = np.arange(n, n + k) % self._capacity
+
+        self._seqs[idx] = seqs + 1
+        self._rows[idx] = rows
+        self._seqs[idx] = seqs + 2
+        self._count[0] = n + k
+
+    def latest(self, retries = 3):
+        # (index, row) of the last complete row, None when there is none
+        for _ in range(retries):
+            n = int(self._count[0]) - 1
+
+            if n < 0:
+                return None
+
+            i = n % self._capacity
+            seq = 2*n + 2
+
+            if self._seqs[i] != seq:
+                continue
+
+            row = self._rows[i].copy()
+
+            if self._seqs[i] == seq:
+                return n, row
+
+        return None
+
+    def read(self, cursor):
+        # rows from index cursor on: (rows, new cursor, rows lost because
+        # the publisher overwrote them before they were read)
+        count = int(self._count[0])
+        start = max(cursor, count - self._capacity)
+
+        if start >= count:
+            return self._rows[:0].copy(), count, start - cursor
+
+        n = np.arange(start, count, dtype = np.uint64)
+        idx = n % self._capacity
+        rows = self._rows[idx]
+        valid = self._seqs[idx] == 2*n + 2
+
+        # slots overwritten while copying are the oldest ones
+        lost = start - cursor + len(rows) - int(np.count_nonzero(valid))
+
+        return rows[valid], count, lost
+
+class sharedSegment(object):
+    # a named segment: created by the publisher, attached by the readers
+    def __init__(self, name, rings = None, *args, **kwargs):
+        super(sharedSegment, self).__init__(*args, **kwargs)
+
+        self._name = name
+
+        if rings is None:
+            self._shm = _openSegment(name)
+            self._readHeader()
+        else:
+            self._create(rings)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def header(self):
+        return self._header
+
+    @property
+    def rings(self):
+        return self._rings
+
+    @property
+    def closed(self):
+        return self._state[0] != _stateOpen
+
+    def _create(self, rings):
+        layout = {}
+        offset = 0
+
+        for ringName, (dtype, capacity) in rings.items():
+            layout[ringName] = {'dtype'    : np.dtype(dtype).descr,
+                                'capacity' : capacity,
+                                'offset'   : offset}
+            offset += sharedRing.size(np.dtype(dtype), capacity)
+
+        header = {'pid'     : os.getpid(),
+                  'created' : time_ns(),
+                  'rings'   : layout}
+        body = json.dumps(header).encode('utf-8')
+        base = _aligned(len(shmMagic) + 4 + len(body)) + shmAlign
+
+        try:
+            self._shm = shared_memory.SharedMemory(self._name, True,
+                                                   base + offset)
+        except FileExistsError:
+            self._replaceStale()
+            self._shm = shared_memory.SharedMemory(self._name, True,
+                                                   base + offset)
+
+        # the magic goes last: readers attaching meanwhile retry later
+        buf = self._shm.buf
+        buf[len(shmMagic):len(shmMagic) + 4] = len(body).to_bytes(4, 'little')
+        buf[len(shmMagic) + 4:len(shmMagic) + 4 + len(body)] = body
+        buf[:len(shmMagic)] = shmMagic
+
+        self._setViews(header, base)
+        self._state[0] = _stateOpen
+
+    def _replaceStale(self):
+        # a segment left behind by a publisher that died is reused, a live
+        # publisher is never taken over
+        try:
+            old = sharedSegment(self._name)
+        except (ValueError, FileNotFoundError):
+            old = None
+
+        if old is not None:
+            pid = old.header['pid']
+            live = not old.closed and _pidAlive(pid)
+            old.close()
+
+            if live:
+                raise RuntimeError(f"{self._name}: already published by "
+                                   f"process {pid}")
+
+        # unlink() also takes the segment off the resource tracker
+        try:
+            stale = shared_memory.SharedMemory(self._name)
+        except FileNotFoundError:
+            return
+
+        stale.close()
+        stale.unlink()
+
+    def _readHeader(self):
+        buf = self._shm.buf
+
+        if bytes(buf[:len(shmMagic)]) != shmMagic:
+            self._shm.close()
+            raise ValueError(f"{self._name} is not a gpsLogger segment")
+
+        size = int.from_bytes(buf[len(shmMagic):len(shmMagic) + 4],
+                              'little')
+        body = bytes(buf[len(shmMagic) + 4:len(shmMagic) + 4 + size])
+        base = _aligned(len(shmMagic) + 4 + size) + shmAlign
+
+        self._setViews(json.loads(body.decode('utf-8')), base)
+
+    def _setViews(self, header, base):
+        buf = self._shm.buf
+
+        self._header = header
+        self._state = np.ndarray(1, np.uint64, buf, base - shmAlign)
+        self._rings = {ringName : sharedRing(buf, base + r['offset'],
+                                             _descrToDtype(r['dtype']),
+                                             r['capacity'])
+                       for ringName, r in header['rings'].items()}
+
+    def close(self, unlink = False):
+        if self._shm is None:
+            return
+
+        if unlink:
+            self._state[0] = _stateClosed
+
+        # the views hold the buffer: they go before the mapping
+        self._state = None
+        self._rings = {}
+        self._shm.close()
+
+        if unlink:
+            self._shm.unlink()
+
+        self._shm = None
+
+# the latest IMU results, one 'key.instance' field per value
+def imuStateDtype(results):
+    fields = [('time', np.int64)]
+
+    for key, values in results.items():
+        fields += [(f"{key}.{k}", np.float64) for k in values
+                   if k not in ('time', 'timestamp')]
+        fields.append((f"{key}.timestamp", np.int64))
+
+    return np.dtype(fields)
+
+class statePublisher(object):
+    # Publishes the state of a logger: every receiver fix ('gps'), the best
+    # fix ('best'), the IMU results ('imu'), the fetched batches (one ring
+    # per query) and the converted orientation ('conv'). writeFix() and
+    # writeConv() make it a sink of the logger, publishIMU() follows every
+    # updateIMU().
+    def __init__(self, logger, name = 'gpsLogger', capacity = 1 << 16,
+                 stateCapacity = 64, *args, **kwargs):
+        super(statePublisher, self).__init__(*args, **kwargs)
+
+        self._imuKeys = {key : [k for k in values
+                                if k not in ('time', 'timestamp')]
+                         for key, values in logger.results.items()}
+        self._dbQueries = logger._dbQueries
+
+        rings = {'gps'  : (fixDtype, capacity),
+                 'best' : (fixDtype, stateCapacity),
+                 'imu'  : (imuStateDtype(self._imuKeys), stateCapacity),
+                 'conv' : (convDtype, capacity)}
+        rings.update({qN : (queryDtype(qV), capacity)
+                      for qN, qV in self._dbQueries.items()})
+
+        self._segment = sharedSegment(name, rings)
+        self._rings = self._segment.rings
+        self._lastBatches = {}
+
+    @property
+    def name(self):
+        return self._segment.name
+
+    @property
+    def published(self):
+        return {ringName : ring.count
+                for ringName, ring in self._rings.items()}
+
+    def _fixRow(self, fix, t):
+        return (t, (fix.receiver or '').encode('ascii'), fix.sod,
+                fix.latitude, fix.longitude, fix.altitude, fix.yaw, fix.tilt,
+                fix.quality, fix.satellites, fix.hdop)
+
+    def writeFix(self, fix, best = None):
+        t = time_ns()
+
+        self._rings['gps'].append(self._fixRow(fix, t))
+        self._rings['best'].append(self._fixRow(best or fix, t))
+
+    def writeConv(self, batch):
+        self._rings['conv'].extend(batch)
+
+    def publishIMU(self, logger):
+        row = [time_ns()]
+
+        for key, instances in self._imuKeys.items():
+            values = logger.results.get(key, {})
+            row += [values.get(k, np.nan) for k in instances]
+            row.append(values.get('timestamp', 0))
+
+        self._rings['imu'].append(tuple(row))
+
+        # the batches of the last fetch, each one once
+        for qN in self._dbQueries:
+            batch = logger._imuBatches[qN]
+
+            if batch is not self._lastBatches.get(qN):
+                self._lastBatches[qN] = batch
+                self._rings[qN].extend(batch)
+
+    def close(self, timeout = None):
+        self._rings = {}
+        self._segment.close(unlink = True)
+
+class stateSubscriber(object):
+    # Reader of a publisher segment. It may be started before the publisher
+    # and outlives its restarts: until a segment is attached it is not
+    # available, and a closed one is replaced by the next publisher's.
+    def __init__(self, name = 'gpsLogger', *args, **kwargs):
+        super(stateSubscriber, self).__init__(*args, **kwargs)
+
+        self._name = name
+        self._segment = None
+        self._cursors = {}
+        self._lost = 0
+        self._attach()
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def available(self):
+        # a publisher killed without closing its segment leaves it open:
+        # its process is checked as well
+        return (self._segment is not None and not self._segment.closed and
+                _pidAlive(self._segment.header['pid']))
+
+    @property
+    def lost(self):
+        # rows overwritten before this subscriber could read them
+        return self._lost
+
+    @property
+    def rings(self):
+        return {} if self._segment is None else self._segment.rings
+
+    @property
+    def generation(self):
+        # creation time of the attached segment, changes with the publisher
+        return None if self._segment is None else \
+               self._segment.header['created']
+
+    def _attach(self, fromStart = False):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+        try:
+            self._segment = sharedSegment(self._name)
+        except (FileNotFoundError, ValueError):
+            return False
+
+        # the segment of a dead publisher, until its successor replaces it
+        if not self.available:
+            self._segment.close()
+            self._segment = None
+            return False
+
+        # a publisher found at start is followed from now on, one that
+        # shows up later from its first row
+        self._cursors = {ringName : 0 if fromStart else ring.count
+                         for ringName, ring in self._segment.rings.items()}
+
+        return True
+
+    def _check(self):
+        if self.available:
+            return True
+
+        return self._attach(fromStart = True)
+
+    def latest(self, ringName):
+        # (index, row) of the last row of a ring, None when not available
+        if not self._check():
+            return None
+
+        ring = self._segment.rings.get(ringName)
+
+        return None if ring is None else ring.latest()
+
+    def read(self, ringName):
+        # rows published since the previous read, None when not available
+        if not self._check():
+            return None
+
+        ring = self._segment.rings.get(ringName)
+
+        if ring is None:
+            return None
+
+        rows, self._cursors[ringName], lost = ring.read(
+                                                self._cursors[ringName])
+        self._lost += lost
+
+        return rows
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+def _rowToFix(row):
+    _, receiver, sod, *values, quality, satellites, hdop = row.item()
+    t = '' if sod != sod else (f"{int(sod) // 3600:02d}:"
+                               f"{(int(sod) // 60) % 60:02d}:"
+                               f"{int(sod) % 60:02d}")
+
+    return gpsFix(receiver.decode('ascii') or None, t, sod, *values,
+                  quality, satellites, hdop)
+
+class sharedState(object):
+    # Takes the place of the acquisition in a gpsLogger/imuLogger: the
+    # socket, the database client and the converter are not created, and
+    # updateGPS()/updateIMU() load what the publisher named shmName put in
+    # shared memory, so every property reads as in the acquisition process.
+    # Mixed in before the logger classes (sharedLogger) or a plotter.
+    def __init__(self, shmName = 'gpsLogger', *args, **kwargs):
+        kwargs.update({'localPort' : None,
+                       'dbHost'    : None,
+                       'convHost'  : None,
+                       'fusion'    : None})
+
+        super(sharedState, self).__init__(*args, **kwargs)
+
+        # with a logFileName the published session is recorded again here
+        if self._gpsRecorder is None and self._imuRecorder is not None:
+            self._gpsRecorder = self._imuRecorder
+            self._gpsRecorder.addStream('gps', fixDtype)
+
+        self._subscriber = stateSubscriber(shmName)
+        self._lastState = {'best' : None, 'imu' : None}
+
+    @property
+    def subscriber(self):
+        return self._subscriber
+
+    @property
+    def sources(self):
+        publisher = ('ready' if self._subscriber.available else
+                     notAvailable)
+
+        return dict(super(sharedState, self).sources, publisher = publisher)
+
+    def _changed(self, ringName):
+        latest = self._subscriber.latest(ringName)
+
+        if latest is None:
+            return None
+
+        key = (self._subscriber.generation, latest[0])
+
+        if key == self._lastState[ringName]:
+            return None
+
+        self._lastState[ringName] = key
+
+        return latest[1]
+
+    def updateGPS(self):
+        row = self._changed('best')
+
+        if row is not None:
+            self._fix = _rowToFix(row)
+
+        rows = self._subscriber.read('gps')
+
+        if rows is None or len(rows) == 0:
+            return
+
+        # the receivers see every fix, as in the acquisition process
+        now = monotonic()
+
+        for r in rows:
+            fix = _rowToFix(r)
+            self._receivers.update(fix, now, notify = False)
+            self._fixHistory.append(fix)
+            self._receivers.notify(fix)
+
+        if self._gpsRecorder is not None:
+            self._gpsRecorder.record('gps', rows)
+
+    def updateIMU(self):
+        row = self._changed('imu')
+
+        if row is not None:
+            for name in row.dtype.names[1:]:
+                key, _, k = name.partition('.')
+                values = self._imuResults.setdefault(key, {})
+
+                if k != 'timestamp':
+                    values[k] = row[name].item()
+                elif row[name]:
+                    t = int(row[name])
+                    values.update({'time'      : nsToTimeStr(t),
+                                   'timestamp' : t})
+
+        for qN in self._dbQueries:
+            rows = self._subscriber.read(qN)
+
+            if rows is not None:
+                self._imuBatches[qN] = rows
+
+                if len(rows) and self._imuRecorder is not None:
+                    self._imuRecorder.record(qN, rows)
+
+        rows = self._subscriber.read('conv')
+
+        if rows is not None:
+            self._convBatch = rows
+
+            if len(rows) and self._imuRecorder is not None:
+                self._imuRecorder.record('conv', rows)
+
+    def close(self):
+        self._subscriber.close()
+
+        super(sharedState, self).close()
+
+class sharedLogger(sharedState, gpsLogger, imuLogger):
+    def close(self):
+        sharedState.close(self)
+        imuLogger.close(self)
+
+def sharedPlotter(shmName = 'gpsLogger', *args, **kwargs):
+    # the dashboard of a headless logger publishing in shared memory;
+    # matplotlib is only loaded for it
+    from graphUtils import gpsPlotter
+
+    class sharedPlotter(sharedState, gpsPlotter):
+        pass
+
+    return sharedPlotter(shmName, *args, **kwargs)
+
+if __name__ == '__main__':
+    argParser = argparse.ArgumentParser(description = "Follow the state "
+                                        "published by a gpsLogger")
+    argParser.add_argument('--name', default = 'gpsLogger',
+                           help = "name of the shared memory segment")
+    argParser.add_argument('--interval', type = float, default = 1.0,
+                           metavar = 'SECONDS',
+                           help = "print the state every SECONDS")
+    argParser.add_argument('--log', default = None, metavar = 'PREFIX',
+                           help = "record the published session under "
+                                  "PREFIX")
+
+    args = argParser.parse_args()
+    logger = sharedLogger(args.name, logFileName = args.log)
+
+    try:
+        while True:
+            logger.updateGPS()
+            logger.updateIMU()
+
+            if logger.subscriber.available:
+                print(f"{gpsLogger.__str__(logger)} "
+                      f"{imuLogger.__str__(logger)}")
+            else:
+                print(f"{args.name}: not yet available")
+
+            sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.close()
@@ -0,0 +1,350 @@
+import random, threading, http.client
+import numpy as np
+from collections import deque
+from time import time_ns, monotonic
+from urllib.parse import urlencode
+from gpsUtils import sodToEpochNs
+
+# A sink receives what the loggers compute (fixes, converted orientation
+# batches) and stores it somewhere else. writeFix()/writeConv() run on the
+# acquisition path: they only queue the objects, the formatting and the I/O
+# happen on the sink thread.
+
+def _escapeKey(s):
+    return s.replace(',', '\\,').replace('=', '\\=').replace(' ', '\\ ')
+
+def _escapeMeasurement(s):
+    return s.replace(',', '\\,').replace(' ', '\\ ')
+
+def _fieldValue(v):
+    if isinstance(v, (bool, np.bool_)):
+        return 'true' if v else 'false'
+
+    if isinstance(v, (int, np.integer)):
+        return f"{v}i"
+
+    if isinstance(v, str):
+        return '"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    return repr(float(v))
+
+def lineProtocol(measurement, tags, fields, timeNs):
+    # one InfluxDB line; NaN fields are left out (the line protocol has no
+    # NaN), None when no field is left
+    fieldStr = ','.join(f"{_escapeKey(k)}={_fieldValue(v)}"
+                        for k, v in fields.items() if v == v)
+
+    if not fieldStr:
+        return None
+
+    tagStr = ''.join(f",{_escapeKey(k)}={_escapeKey(str(v))}"
+                     for k, v in sorted(tags.items()) if v != '')
+
+    return f"{_escapeMeasurement(measurement)}{tagStr} {fieldStr} {timeNs}"
+
+def fixLine(fix, timeNs, measurement = 'gpsFix', receiver = None):
+    return lineProtocol(measurement,
+                        {'receiver' : receiver or fix.receiver or ''},
+                        {'latitude'   : fix.latitude,
+                         'longitude'  : fix.longitude,
+                         'altitude'   : fix.altitude,
+                         'yaw'        : fix.yaw,
+                         'tilt'       : fix.tilt,
+                         'quality'    : int(fix.quality),
+                         'satellites' : int(fix.satellites),
+                         'hdop'       : fix.hdop},
+                        timeNs)
+
+def convLines(batch, measurement = 'imuConv'):
+    # convDtype rows, one line each
+    names = [n for n in batch.dtype.names if n != 'time']
+    prefix = _escapeMeasurement(measurement) + ' '
+    lines = []
+
+    for row in batch.tolist():
+        fields = ','.join(f"{k}={v!r}" for k, v in zip(names, row[1:])
+                          if v == v)
+
+        if fields:
+            lines.append(f"{prefix}{fields} {row[0]}")
+
+    return lines
+
+def _entryRows(entry):
+    return len(entry[1]) if entry[0] == 'conv' else 1
+
+class influxSink(object):
+    # Batches are sent when batchSize rows are queued or every
+    # flushInterval seconds. A failed batch is retried with exponential
+    # backoff and stays at the head of the queue; while the server is
+    # unreachable at most maxPending rows are kept, the oldest are dropped.
+    def __init__(self, host = '127.0.0.1', port = 8086,
+                 database = 'spbmonitor', username = None, password = None,
+                 gpsMeasurement = 'gpsFix', convMeasurement = 'imuConv',
+                 batchSize = 5000, flushInterval = 1.0, maxPending = 200000,
+                 timeout = 5.0, retryBase = 0.5, retryMax = 30.0,
+                 writeBest = True, *args, **kwargs):
+        super(influxSink, self).__init__(*args, **kwargs)
+
+        params = {'db' : database, 'precision' : 'ns'}
+
+        if username is not None:
+            params.update({'u' : username, 'p' : password or ''})
+
+        self._addr = (host, port)
+        self._path = f"/write?{urlencode(params)}"
+        self._gpsMeasurement = gpsMeasurement
+        self._convMeasurement = convMeasurement
+        self._batchSize = batchSize
+        self._flushInterval = flushInterval
+        self._maxPending = maxPending
+        self._timeout = timeout
+        self._retryBase = retryBase
+        self._retryMax = retryMax
+        self._writeBest = writeBest
+        self._conn = None
+        # (kind, object, time) entries and the lines of the batch being sent
+        self._queue = deque()
+        self._batch = []
+        # the queue, its row count and the counters are shared by the
+        # acquisition threads and the sink thread
+        self._lock = threading.Lock()
+        self._queuedRows = 0
+        self._failures = 0
+        self._lastError = None
+        self._counters = {'queued'   : 0,
+                          'written'  : 0,
+                          'batches'  : 0,
+                          'retries'  : 0,
+                          'rejected' : 0,
+                          'dropped'  : 0}
+
+        self._wakeEvent = threading.Event()
+        self._stopEvent = threading.Event()
+        self._thread = threading.Thread(target = self._writeLoop,
+                                        name = 'influxSink',
+                                        daemon = True)
+        self._thread.start()
+
+    @property
+    def counters(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters['pending'] = self._queuedRows + len(self._batch)
+
+        return counters
+
+    @property
+    def lastError(self):
+        return self._lastError
+
+    def _put(self, entry, rows):
+        with self._lock:
+            self._queue.append(entry)
+            self._queuedRows += rows
+            self._counters['queued'] += rows
+
+            # bounded memory, the batch held for a retry included: the
+            # oldest entries go first
+            while (self._queue and
+                   self._queuedRows + len(self._batch) > self._maxPending):
+                old = self._queue.popleft()
+                count = _entryRows(old)
+                self._queuedRows -= count
+                self._counters['dropped'] += count
+
+            full = self._queuedRows >= self._batchSize
+
+        if full:
+            self._wakeEvent.set()
+
+    def writeFix(self, fix, best = None):
+        # the receiver fix and, when given, the best fix of that moment
+        t = time_ns()
+
+        self._put(('fix', fix, t), 1)
+
+        if best is not None and self._writeBest:
+            self._put(('best', best, t), 1)
+
+    def writeConv(self, batch):
+        if len(batch):
+            self._put(('conv', batch, None), len(batch))
+
+    def _fixTime(self, fix, received):
+        # GPS time when the fix has one, the reception time otherwise
+        sod = fix.sod
+
+        if sod != sod:
+            return received
+
+        return int(sodToEpochNs(sod, received))
+
+    def _takeLines(self):
+        lines = self._batch
+
+        while len(lines) < self._batchSize:
+            with self._lock:
+                if not self._queue:
+                    break
+
+                entry = self._queue.popleft()
+                self._queuedRows -= _entryRows(entry)
+
+            kind, obj, t = entry
+
+            if kind == 'conv':
+                lines.extend(convLines(obj, self._convMeasurement))
+                continue
+
+            line = fixLine(obj, self._fixTime(obj, t), self._gpsMeasurement,
+                           'best' if kind == 'best' else None)
+
+            if line is not None:
+                lines.append(line)
+
+        self._batch = lines
+
+        return lines
+
+    def _post(self, body):
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(*self._addr,
+                                                    timeout = self._timeout)
+
+        try:
+            self._conn.request('POST', self._path, body,
+                               {'Content-Type' : 'text/plain; charset=utf-8'})
+            response = self._conn.getresponse()
+            reply = response.read()
+        except (OSError, http.client.HTTPException):
+            self._conn.close()
+            self._conn = None
+            raise
+
+        return response.status, reply
+
+    def _send(self):
+        # True when the batch left the queue (written or rejected)
+        lines = self._takeLines()
+
+        if not lines:
+            return True
+
+        try:
+            status, reply = self._post(('\n'.join(lines) + '\n')
+                                       .encode('utf-8'))
+        except (OSError, http.client.HTTPException) as e:
+            self._lastError = f"{type(e).__name__}: {e}"
+            return False
+
+        if status == 429 or status >= 500:
+            self._lastError = f"HTTP {status}: {reply[:200]!r}"
+            return False
+
+        if status >= 300:
+            # malformed points are not retried, they would never pass
+            self._lastError = f"HTTP {status}: {reply[:200]!r}"
+
+        with self._lock:
+            if status >= 300:
+                self._counters['rejected'] += len(lines)
+            else:
+                self._counters['written'] += len(lines)
+                self._counters['batches'] += 1
+
+            self._batch = []
+
+        return True
+
+    def _flush(self):
+        # sends full batches until the queue is empty or a batch fails
+        while self._queue or self._batch:
+            if not self._send():
+                return False
+
+            self._failures = 0
+
+        return True
+
+    def _writeLoop(self):
+        while not self._stopEvent.is_set():
+            if self._failures:
+                delay = min(self._retryMax,
+                            self._retryBase*2**(self._failures - 1))
+                # jitter: sinks restarted together do not retry in lockstep
+                self._stopEvent.wait(delay*random.uniform(0.5, 1.0))
+            else:
+                self._wakeEvent.wait(self._flushInterval)
+
+            self._wakeEvent.clear()
+
+            if self._failures:
+                with self._lock:
+                    self._counters['retries'] += 1
+
+            if not self._flush():
+                self._failures += 1
+
+    def close(self, timeout = None):
+        # one last attempt to send what is queued, then the connection goes
+        if self._thread is None:
+            return
+
+        self._stopEvent.set()
+        self._wakeEvent.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+        deadline = monotonic() + (self._timeout if timeout is None
+                                  else timeout)
+
+        while (self._queue or self._batch) and monotonic() < deadline:
+            if not self._send():
+                break
+
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+class sinkGroup(object):
+    # several sinks fed with the same fixes and batches, e.g. the database
+    # and the shared memory publisher
+    def __init__(self, *sinks, **kwargs):
+        super(sinkGroup, self).__init__(**kwargs)
+
+        self._sinks = [s for s in sinks if s is not None]
+
+    @property
+    def sinks(self):
+        return list(self._sinks)
+
+    @property
+    def counters(self):
+        # summed over the sinks keeping counters, None without any
+        counters = None
+
+        for sink in self._sinks:
+            c = getattr(sink, 'counters', None)
+
+            if c is None:
+                continue
+
+            counters = counters or dict.fromkeys(c, 0)
+
+            for k, v in c.items():
+                counters[k] = counters.get(k, 0) + v
+
+        return counters
+
+    def writeFix(self, fix, best = None):
+        for sink in self._sinks:
+            sink.writeFix(fix, best)
+
+    def writeConv(self, batch):
+        for sink in self._sinks:
+            sink.writeConv(batch)
+
+    def close(self, timeout = None):
+        for sink in self._sinks:
+            sink.close(timeout)
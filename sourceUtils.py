@@ -0,0 +1,154 @@
+import random, threading
+from time import monotonic
+
+notAvailable = 'not yet available'
+
+def _errorText(error, length = 80):
+    # status lines stay on one line: urllib3 errors run to several hundreds
+    # of characters
+    text = f"{type(error).__name__}: {error}"
+
+    return text if len(text) <= length else text[:length - 3] + '...'
+
+class lazySource(object):
+    # Something the loggers depend on but must not wait for: the database
+    # client, the converter connection, the map. opener() runs on a
+    # background thread and is retried with jittered exponential backoff
+    # until it returns; onChange(value) is called with what it returned,
+    # and with None when the owner reports the source lost with failed().
+    # Until then the source is reported as not yet available.
+    def __init__(self, name, opener, onChange = None, closer = None,
+                 retryBase = 0.5, retryMax = 30.0, *args, **kwargs):
+        super(lazySource, self).__init__(*args, **kwargs)
+
+        self._name = name
+        self._opener = opener
+        self._onChange = onChange
+        self._closer = closer
+        self._retryBase = retryBase
+        self._retryMax = retryMax
+        self._value = None
+        self._lastError = None
+        self._attempts = 0
+        self._retryAt = None
+        self._lock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._thread = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def ready(self):
+        return self._value is not None
+
+    @property
+    def value(self):
+        return self._value
+
+    @property
+    def lastError(self):
+        return self._lastError
+
+    @property
+    def status(self):
+        if self._value is not None:
+            return 'ready'
+
+        if self._lastError is None:
+            return notAvailable
+
+        retry = ('' if self._retryAt is None else
+                 f", retry in {max(0.0, self._retryAt - monotonic()):.1f} s")
+
+        return f"{notAvailable} ({self._lastError}{retry})"
+
+    def _set(self, value):
+        self._value = value
+
+        if self._onChange is not None:
+            self._onChange(value)
+
+    def _attempt(self):
+        try:
+            value = self._opener()
+        except Exception as e:
+            # whatever the source raises, the owner keeps running
+            self._lastError = _errorText(e)
+            self._attempts += 1
+            return False
+
+        self._lastError = None
+        self._attempts = 0
+        self._retryAt = None
+        self._set(value)
+
+        return True
+
+    def _openLoop(self):
+        while not self._stopEvent.is_set():
+            if self._attempt():
+                break
+
+            delay = min(self._retryMax,
+                        self._retryBase*2**(self._attempts - 1))
+            delay *= random.uniform(0.5, 1.0)
+            self._retryAt = monotonic() + delay
+            self._stopEvent.wait(delay)
+
+        with self._lock:
+            self._thread = None
+
+    def start(self):
+        # opens in the background, returns at once
+        with self._lock:
+            if self._value is not None or self._thread is not None:
+                return self
+
+            self._stopEvent.clear()
+            self._thread = threading.Thread(target = self._openLoop,
+                                            name = f"open-{self._name}",
+                                            daemon = True)
+            self._thread.start()
+
+        return self
+
+    def open(self):
+        # one attempt on the calling thread, the retries in the background
+        if not self._attempt():
+            self.start()
+
+        return self
+
+    def failed(self, error = None):
+        # the source broke while in use: it is closed and opened again
+        value = self._value
+
+        if value is None:
+            return
+
+        self._lastError = None if error is None else _errorText(error)
+        self._set(None)
+
+        if self._closer is not None:
+            self._closer(value)
+
+        self.start()
+
+    def close(self):
+        self._stopEvent.set()
+
+        with self._lock:
+            thread = self._thread
+
+        if thread is not None:
+            thread.join()
+
+        value = self._value
+
+        if value is not None:
+            self._set(None)
+
+            if self._closer is not None:
+                self._closer(value)
@@ -0,0 +1,336 @@
+#!/usr/bin/python3
+
+import sys, argparse, threading
+import numpy as np
+from ringUtils import ringBuffer
+from fusionUtils import quatToEuler
+from gpsUtils import sodToEpochNs, _dayNs
+
+# Both streams are kept at full resolution on one clock, epoch ns: the GPS
+# fixes from their NMEA time of day, dated with their reception time, the IMU
+# samples with their InfluxDB timestamps.
+syncGPSDtype = np.dtype([('time', np.int64),
+                         ('latitude', np.float64),
+                         ('longitude', np.float64),
+                         ('altitude', np.float64),
+                         ('yaw', np.float64),
+                         ('tilt', np.float64)])
+
+syncIMUDtype = np.dtype([('time', np.int64)] +
+                        [(f"q{i+1}", np.float64) for i in range(4)])
+
+alignedDtype = np.dtype([('time', np.int64),
+                         ('latitude', np.float64),
+                         ('longitude', np.float64),
+                         ('altitude', np.float64),
+                         ('gpsYaw', np.float64),
+                         ('gpsTilt', np.float64)] +
+                        [(f"q{i+1}", np.float64) for i in range(4)] +
+                        [('imuRoll', np.float64),
+                         ('imuPitch', np.float64),
+                         ('imuYaw', np.float64),
+                         ('gap', np.float64)])
+
+_gpsFields = {'latitude'  : 'latitude',
+              'longitude' : 'longitude',
+              'altitude'  : 'altitude',
+              'yaw'       : 'gpsYaw',
+              'tilt'      : 'gpsTilt'}
+
+def slerp(q0, q1, u):
+    # (n, 4) quaternions and (n,) fractions: shortest path interpolation,
+    # normalized lerp where the two are too close for the sine
+    q0 = np.asarray(q0, np.float64)
+    q1 = np.array(q1, np.float64)
+    u = np.asarray(u, np.float64)[:, None]
+
+    dot = np.sum(q0*q1, axis = 1)
+    q1[dot < 0.0] *= -1.0
+    dot = np.abs(dot)[:, None]
+
+    theta = np.arccos(np.minimum(dot, 1.0))
+    sinTheta = np.sin(theta)
+    close = sinTheta < 1e-6
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        w0 = np.where(close, 1.0 - u, np.sin((1.0 - u)*theta)/sinTheta)
+        w1 = np.where(close, u, np.sin(u*theta)/sinTheta)
+
+    q = w0*q0 + w1*q1
+
+    return q/np.linalg.norm(q, axis = 1, keepdims = True)
+
+def _bracket(times, targets):
+    # for every target the sample i with times[i] <= target <= times[i+1],
+    # the fraction of the way and the interval between the two in s. Targets
+    # outside the samples get an infinite interval
+    i = np.clip(np.searchsorted(times, targets, 'right') - 1, 0,
+                len(times) - 2)
+    span = (times[i+1] - times[i]).astype(np.float64)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        u = np.where(span > 0, (targets - times[i])/span, 0.0)
+
+    outside = (targets < times[0]) | (targets > times[-1])
+    span = np.where(outside, np.inf, span*1e-9)
+
+    return i, np.clip(u, 0.0, 1.0), span
+
+def _single(t, times):
+    # interval of a lone sample: only its own time is covered
+    return np.where(times == t, 0.0, np.inf)
+
+def interpolateQuaternions(imu, times):
+    # SLERP of the IMU orientation at the given times, and the interval
+    # between the two samples used
+    t = imu['time']
+    q = np.stack([imu[f"q{i+1}"] for i in range(4)], axis = 1)
+
+    if len(t) == 1:
+        return np.repeat(q, len(times), axis = 0), _single(t[0], times)
+
+    i, u, span = _bracket(t, times)
+
+    return slerp(q[i], q[i+1], u), span
+
+def interpolateField(t, v, times, angle = False):
+    # linear interpolation on the samples that have a value (the receivers
+    # fill different fields), on the unwrapped angle for angles in degrees
+    ok = ~np.isnan(v)
+    t, v = t[ok], v[ok]
+
+    if len(t) == 0:
+        return np.full(len(times), np.nan), np.full(len(times), np.inf)
+
+    if len(t) == 1:
+        return np.full(len(times), v[0]), _single(t[0], times)
+
+    if angle:
+        v = np.degrees(np.unwrap(np.radians(v)))
+
+    i, u, span = _bracket(t, times)
+    values = v[i] + u*(v[i+1] - v[i])
+
+    return (values % 360.0 if angle else values), span
+
+class syncBuffer(object):
+    # GPS fixes and IMU orientations in two ring buffers on a common epoch
+    # clock. aligned() interpolates the IMU at the GPS times (SLERP) or the
+    # GPS at the IMU times; drain() returns the joint samples that became
+    # computable since the previous call. Nothing is interpolated across
+    # samples more than maxGap seconds apart: such IMU intervals drop the
+    # row, such GPS intervals leave the field NaN
+    def __init__(self, capacity = 1 << 16, maxGap = 1.5, *args, **kwargs):
+        super(syncBuffer, self).__init__(*args, **kwargs)
+
+        self._gps = ringBuffer(syncGPSDtype, capacity)
+        self._imu = ringBuffer(syncIMUDtype, capacity)
+        self._maxGap = maxGap
+        self._drained = {'gps' : None, 'imu' : None}
+        # the receiver thread appends fixes while the main thread appends
+        # IMU rows and copies the windows out
+        self._lock = threading.Lock()
+
+    @property
+    def gps(self):
+        return self._gps.view()
+
+    @property
+    def imu(self):
+        return self._imu.view()
+
+    @property
+    def maxGap(self):
+        return self._maxGap
+
+    def _restart(self, ring):
+        # with the lock held
+        ring.clear()
+        self._drained = {'gps' : None, 'imu' : None}
+
+    def _append(self, ring, rows):
+        # rows older than the last one are dropped (a late fix of the other
+        # receiver), a clock that went back by more than half a day (new
+        # session, replay) starts over
+        if len(rows) == 0:
+            return
+
+        if np.any(np.diff(rows['time']) < 0):
+            rows = rows[np.argsort(rows['time'], kind = 'stable')]
+
+        with self._lock:
+            last = ring.last
+
+            if last is not None:
+                if rows['time'][-1] < last['time'] - _dayNs//2:
+                    self._restart(ring)
+                else:
+                    rows = rows[rows['time'] >= last['time']]
+
+            ring.extend(rows)
+
+    def addFix(self, fix, received = None):
+        # on the receiver thread: plain arithmetic and a single row append,
+        # received is the reception time in ns, now by default
+        if fix.sod != fix.sod:
+            return
+
+        t = sodToEpochNs(fix.sod, received)
+        row = (t, fix.latitude, fix.longitude, fix.altitude, fix.yaw,
+               fix.tilt)
+
+        with self._lock:
+            last = self._gps.last
+
+            if last is not None and t < last['time']:
+                if t >= last['time'] - _dayNs//2:
+                    return
+
+                self._restart(self._gps)
+
+            self._gps.append(row)
+
+    def addFixes(self, rows):
+        # fixDtype rows (recordings, replays): 'time' is the reception time
+        rows = rows[~np.isnan(rows['sod'])]
+        out = np.zeros(len(rows), syncGPSDtype)
+        out['time'] = sodToEpochNs(rows['sod'], rows['time'])
+
+        for k in _gpsFields:
+            out[k] = rows[k]
+
+        self._append(self._gps, out)
+
+    def addIMU(self, batch):
+        # any rows with time (ns) and q1..q4: convDtype, quaternion batches
+        out = np.zeros(len(batch), syncIMUDtype)
+
+        for k in syncIMUDtype.names:
+            out[k] = batch[k]
+
+        self._append(self._imu, out)
+
+    def attach(self, gps):
+        # follows the fixes of a gpsLogger as they are parsed, the IMU side
+        # is fed with addIMU() after every query
+        return gps.receivers.subscribe(self.addFix)
+
+    def aligned(self, start = None, stop = None, on = 'gps'):
+        # joint samples at the times of one stream, up to the last sample of
+        # the other
+        with self._lock:
+            if len(self._gps) == 0 or len(self._imu) == 0:
+                return np.zeros(0, alignedDtype)
+
+            target = self._gps if on == 'gps' else self._imu
+            other = self._imu if on == 'gps' else self._gps
+            # the receivers share their epochs: one joint sample per time
+            times = np.unique(target.window(start, stop)['time'])
+            times = times[times <= other.last['time']]
+
+            if len(times) == 0:
+                return np.zeros(0, alignedDtype)
+
+            # only the samples that can bracket the targets, copied: the
+            # windows are views the writers keep overwriting
+            first = times[0] - int(self._maxGap*1e9)
+            gps = self._gps.window(first).copy()
+            imu = self._imu.window(first).copy()
+
+        return self._join(gps, imu, times)
+
+    def drain(self, on = 'gps'):
+        # joint samples newer than the previous drain; a restart in the
+        # meantime replaces the dict and the mark below is discarded
+        drained = self._drained
+        last = drained[on]
+        rows = self.aligned(None if last is None else last + 1, on = on)
+
+        if len(rows):
+            drained[on] = int(rows['time'][-1])
+
+        return rows
+
+    def _join(self, gps, imu, times):
+        out = np.zeros(len(times), alignedDtype)
+
+        if len(imu) == 0:
+            return out[:0]
+
+        out['time'] = times
+        q, gap = interpolateQuaternions(imu, times)
+
+        for i in range(4):
+            out[f"q{i+1}"] = q[:, i]
+
+        euler = quatToEuler(q)
+        out['imuRoll'] = euler[:, 0]
+        out['imuPitch'] = euler[:, 1]
+        out['imuYaw'] = euler[:, 2] % 360.0
+
+        # rows are kept when at least one GPS field could be interpolated
+        nearest = np.full(len(times), np.inf)
+
+        for k, name in _gpsFields.items():
+            values, span = interpolateField(gps['time'], gps[k], times,
+                                            angle = k == 'yaw')
+            values[span > self._maxGap] = np.nan
+            out[name] = values
+            nearest = np.minimum(nearest, span)
+
+        out['gap'] = np.maximum(gap, nearest)
+
+        return out[out['gap'] <= self._maxGap]
+
+def _loadStream(prefix, stream):
+    from recordUtils import listRecordings, readRecording
+
+    parts = [readRecording(path, mmap = False)[1]
+             for path in listRecordings(prefix, stream)]
+
+    return np.concatenate(parts) if parts else None
+
+if __name__ == '__main__':
+    argParser = argparse.ArgumentParser(description = "Align the GPS fixes "
+                                        "and the converted IMU orientation "
+                                        "of a recorded session")
+    argParser.add_argument('prefix', help = "recording prefix")
+    argParser.add_argument('--on', choices = ('gps', 'imu'), default = 'gps',
+                           help = "stream whose times are kept")
+    argParser.add_argument('--max-gap', type = float, default = 1.5,
+                           metavar = 'SECONDS',
+                           help = "longest interval interpolated across")
+    argParser.add_argument('--save', default = None, metavar = 'FILE',
+                           help = "save the aligned samples to FILE (.npy)")
+
+    args = argParser.parse_args()
+
+    fixes = _loadStream(args.prefix, 'gps')
+    conv = _loadStream(args.prefix, 'conv')
+
+    if fixes is None or conv is None:
+        sys.exit(f"{args.prefix}: the session needs both gps and conv "
+                 f"recordings")
+
+    sync = syncBuffer(max(len(fixes), len(conv), 1), args.max_gap)
+    sync.addFixes(fixes)
+    sync.addIMU(conv)
+    rows = sync.aligned(on = args.on)
+
+    print(f"{len(fixes)} fixes, {len(conv)} IMU samples, "
+          f"{len(rows)} aligned")
+
+    # GPS attitude against the IMU one, the yaw difference wrapped to +-180
+    for name, gps, imu, wrap in (('yaw', 'gpsYaw', 'imuYaw', True),
+                                 ('tilt', 'gpsTilt', 'imuPitch', False)):
+        d = rows[gps] - rows[imu]
+        d = (d + 180.0) % 360.0 - 180.0 if wrap else d
+        d = d[~np.isnan(d)]
+
+        if len(d):
+            print(f"{name:<5} n {len(d):7d}  mean {d.mean():+9.3f}  "
+                  f"std {d.std():8.3f}  p95 |d| "
+                  f"{np.percentile(np.abs(d), 95):8.3f} deg")
+
+    if args.save is not None:
+        np.save(args.save, rows)
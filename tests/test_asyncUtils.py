@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from asyncUtils import asyncLogger
+from fakeServices import fakeConverter
+
+@pytest.fixture
+def converter():
+    converter = fakeConverter(dropAfter = 2)
+    converter.start()
+    yield converter
+    converter.stop()
+
+def _logger(convAddr = (None, 5000)):
+    logger = asyncLogger(localPort = None, dbHost = None,
+                         convHost = convAddr[0], convPort = convAddr[1],
+                         timeout = 2.0)
+    logger._imuResults['accel'] = {'X' : 0.0, 'Y' : 0.0, 'Z' : 1.0}
+    logger._imuResults['gyro'] = {'X' : 0.0, 'Y' : 0.0, 'Z' : 0.0}
+
+    return logger
+
+def testReopensTheConverter(converter):
+    logger = _logger(converter.address)
+
+    async def cycles():
+        await logger.open()
+
+        return [await logger.refresh() for _ in range(6)]
+
+    try:
+        errors = asyncio.run(cycles())
+    finally:
+        logger.close()
+
+    # two replies per connection, the cycle after the drop fails and the
+    # next one reconnects
+    assert [len(e) for e in errors] == [0, 0, 1, 0, 0, 1]
+    assert isinstance(errors[2][0], ConnectionError)
+    assert converter.replies == 4
+
+class _brokenWriter(object):
+    closed = False
+
+    def write(self, data):
+        raise BrokenPipeError(32, 'Broken pipe')
+
+    def close(self):
+        self.closed = True
+
+def testWriteErrorDropsTheStream():
+    logger = _logger(('127.0.0.1', 1))
+    writer = _brokenWriter()
+    logger._convStream = (None, writer)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(logger._convert(((0, 0, 0), (0, 0, 16384))))
+
+    assert logger._convStream is None
+    assert writer.closed
+
+    logger.close()
+
+def testDatagramErrorsAreCounted(monkeypatch):
+    logger = _logger()
+
+    def fail(msg):
+        raise RuntimeError('sink down')
+
+    monkeypatch.setattr(logger, '_parseGPSMessage', fail)
+    logger._handleDatagram(b'gps1,$GPGGA', ('127.0.0.1', 40000))
+
+    assert logger.counters['received'] == 1
+    assert logger.counters['errors'] == 1
+
+    logger.close()
@@ -0,0 +1,72 @@
+import pytest
+from convUtils import imuConverter, parseReply, convHandshakeError
+from fakeServices import fakeConverter, convReply
+
+samples = [((10*k, -5*k, 3), (300*k, -200, 16384)) for k in range(200)]
+
+def _expected():
+    return [parseReply(convReply(g, a)) for g, a in samples]
+
+@pytest.fixture
+def server(request):
+    server = fakeConverter(**getattr(request, 'param', {})).start()
+    yield server
+    server.stop()
+
+def _client(server, **kwargs):
+    return imuConverter(*server.address, timeout = 2.0, **kwargs)
+
+def testParseReply():
+    assert parseReply("Q1.0,0.0,-0.5,2e-3E10.5,-3.25,0.0000\n") == \
+           ((1.0, 0.0, -0.5, 0.002), (10.5, -3.25, 0.0))
+    assert parseReply("ERR") is None
+
+@pytest.mark.parametrize('server', [{}, {'splitReplies' : True}],
+                         indirect = True)
+def testPipelinedBatch(server):
+    conv = _client(server, maxInFlight = 16)
+
+    try:
+        assert conv.convertBatch(samples) == _expected()
+        assert conv.convert(*samples[3]) == _expected()[3]
+    finally:
+        conv.close()
+
+    assert conv.counters['requests'] == len(samples) + 1
+    assert conv.counters['malformed'] == 0
+    assert conv.counters['reconnects'] == 0
+
+@pytest.mark.parametrize('server', [{'dropAfter' : 30,
+                                     'splitReplies' : True}],
+                         indirect = True)
+def testReconnectsAndResends(server):
+    conv = _client(server, maxInFlight = 8)
+
+    try:
+        assert conv.convertBatch(samples) == _expected()
+    finally:
+        conv.close()
+
+    # one connection per 30 replies, unanswered requests sent again
+    assert conv.counters['reconnects'] == (len(samples) - 1)//30
+    assert conv.counters['replies'] == len(samples)
+
+def testGivesUpWithoutProgress(server):
+    # nobody listens anymore: every reconnection fails
+    conv = _client(server, retries = 2)
+    server.stop()
+
+    with pytest.raises((OSError, ConnectionError)):
+        conv.convertBatch(samples[:4])
+
+    assert conv.counters['reconnects'] == 2
+    assert not conv.connected
+
+@pytest.mark.parametrize('server', [{'welcome' : b'Hello'}], indirect = True)
+def testBadGreeting(server):
+    conv = _client(server)
+
+    with pytest.raises(convHandshakeError):
+        conv.connect()
+
+    assert not conv.connected
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from fusionUtils import madgwickFilter, accelAttitude, quatToEuler
+
+@pytest.mark.parametrize('roll, pitch', [(0.0, 0.0), (30.0, 0.0),
+                                         (0.0, -20.0), (-45.0, 10.0)])
+def testAccelAttitude(roll, pitch):
+    r, p = np.radians(roll), np.radians(pitch)
+    # gravity seen by a sensor rolled then pitched
+    accel = [-np.sin(p), np.sin(r)*np.cos(p), np.cos(r)*np.cos(p)]
+    q = accelAttitude([accel])
+
+    assert np.linalg.norm(q[0]) == pytest.approx(1.0)
+    assert quatToEuler(q)[0] == pytest.approx([roll, pitch, 0.0], abs = 1e-9)
+
+def testAccelScaleDoesNotMatter():
+    assert np.allclose(accelAttitude([[100, 200, 16384]]),
+                       accelAttitude([[1, 2, 163.84]]))
+
+def testConvergesToGravity():
+    # still sensor rolled by 30 degrees, filter started level
+    r = np.radians(30.0)
+    n = 4000
+    times = np.arange(n)*10000000
+    accel = np.tile([0.0, np.sin(r), np.cos(r)], (n, 1))
+    fusion = madgwickFilter(beta = 0.5, gyroScale = 1.0)
+    fusion._q = (1.0, 0.0, 0.0, 0.0)
+
+    q = fusion.updateBatch(times, np.zeros((n, 3)), accel)
+
+    assert q.shape == (n, 4)
+    assert np.allclose(np.linalg.norm(q, axis = 1), 1.0)
+    # the fixed gradient step leaves a small ripple around the target
+    assert quatToEuler(q[-1:])[0] == pytest.approx([30.0, 0.0, 0.0],
+                                                   abs = 0.5)
+
+def testIntegratesGyro():
+    # 90 deg/s about z for one second, gravity along z: yaw only
+    n = 101
+    times = np.arange(n)*10000000
+    gyro = np.tile([0.0, 0.0, 90.0], (n, 1))
+    accel = np.tile([0.0, 0.0, 1.0], (n, 1))
+    fusion = madgwickFilter(gyroScale = 1.0)
+
+    q = fusion.updateBatch(times[:50], gyro[:50], accel[:50])
+    q = np.vstack((q, fusion.updateBatch(times[50:], gyro[50:],
+                                         accel[50:])))
+
+    # the batches continue one another: the first sample has no time step
+    assert quatToEuler(q[-1:])[0] == pytest.approx([0.0, 0.0, 90.0],
+                                                   abs = 0.5)
+
+def testLargeGapsAreClipped():
+    fusion = madgwickFilter(gyroScale = 1.0, maxStep = 0.1)
+    q = fusion.updateBatch([0, 60000000000], [[0, 0, 90.0]]*2,
+                           [[0, 0, 1.0]]*2)
+
+    assert quatToEuler(q[-1:])[0][2] == pytest.approx(9.0, abs = 0.1)
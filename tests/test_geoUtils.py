@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from geoUtils import (ddmmToDegrees, degreesToDdmm, distance, bearing,
+                      speedOverGround, geodeticToECEF, ecefToGeodetic,
+                      geodeticToENU, enuToGeodetic, wgs84A, wgs84B)
+
+def testDdmm():
+    assert ddmmToDegrees(4807.038) == pytest.approx(48.1173)
+    assert ddmmToDegrees(1131.0) == pytest.approx(11.5166667)
+    assert ddmmToDegrees(0.6) == pytest.approx(0.01)
+    assert degreesToDdmm(-48.1173) == pytest.approx(4807.038)
+
+    # plain floats and arrays agree, NaN goes through
+    values = [4759.9995, 4759.99999, 0.0, 17959.9999, np.nan]
+
+    np.testing.assert_array_equal([ddmmToDegrees(v) for v in values],
+                                  ddmmToDegrees(values))
+    assert ddmmToDegrees(4759.99999) < 48.0
+
+    lat = np.linspace(-89.9999, 89.9999, 1001)
+
+    np.testing.assert_allclose(ddmmToDegrees(degreesToDdmm(lat)),
+                               np.abs(lat), atol = 1e-12)
+
+def testDistanceAndBearing():
+    # one degree of meridian and of equator on the mean sphere
+    degree = np.radians(1.0)*6371008.8
+
+    assert distance(0.0, 0.0, 1.0, 0.0) == pytest.approx(degree)
+    assert distance(0.0, 0.0, 0.0, -1.0) == pytest.approx(degree)
+    assert distance(10.0, 20.0, 10.0, 20.0) == 0.0
+    assert distance(0.0, 0.0, 0.0, 180.0) == pytest.approx(180.0*degree)
+
+    assert bearing(0.0, 0.0, 1.0, 0.0) == pytest.approx(0.0)
+    assert bearing(0.0, 0.0, 0.0, 1.0) == pytest.approx(90.0)
+    assert bearing(0.0, 0.0, -1.0, 0.0) == pytest.approx(180.0)
+    assert bearing(0.0, 0.0, 0.0, -1.0) == pytest.approx(270.0)
+
+def testSpeedOverGround():
+    # northwards at 10 m/s, with a repeated time
+    step = 10.0/(np.radians(1.0)*6371008.8)
+    times = [0.0, 1.0, 2.0, 2.0]
+    lat = [0.0, step, 2*step, 3*step]
+    speed, course = speedOverGround(times, lat, [5.0]*4)
+
+    assert np.isnan(speed[0]) and np.isnan(course[0])
+    np.testing.assert_allclose(speed[1:3], 10.0)
+    np.testing.assert_allclose(course[1:], 0.0, atol = 1e-9)
+    assert np.isnan(speed[3])
+    assert all(np.isnan(v).all() for v in speedOverGround([0.0], [0.0],
+                                                          [0.0]))
+
+def testECEF():
+    np.testing.assert_allclose(geodeticToECEF(0.0, 0.0, 0.0),
+                               (wgs84A, 0.0, 0.0), atol = 1e-6)
+    np.testing.assert_allclose(geodeticToECEF(90.0, 0.0, 0.0),
+                               (0.0, 0.0, wgs84B), atol = 1e-6)
+
+@pytest.mark.parametrize('lat, lon, alt', [(41.1, 16.9, 120.0),
+                                           (-33.87, 151.21, -20.0),
+                                           (89.9999, -45.0, 3000.0),
+                                           (0.0, 180.0, 0.0)])
+def testECEFRoundTrip(lat, lon, alt):
+    back = ecefToGeodetic(*geodeticToECEF(lat, lon, alt))
+
+    assert back[0] == pytest.approx(lat, abs = 1e-9)
+    assert back[1] % 360.0 == pytest.approx(lon % 360.0, abs = 1e-9)
+    assert back[2] == pytest.approx(alt, abs = 1e-3)
+
+def testENU():
+    lat0, lon0, alt0 = 41.1, 16.9, 50.0
+    e, n, u = geodeticToENU(lat0 + 0.001, lon0, alt0, lat0, lon0, alt0)
+
+    assert abs(e) < 1e-6
+    assert n == pytest.approx(111.0, rel = 0.01)
+    assert abs(u) < 0.01
+
+    e, n, u = geodeticToENU(lat0, lon0, alt0 + 10.0, lat0, lon0, alt0)
+
+    np.testing.assert_allclose((e, n, u), (0.0, 0.0, 10.0), atol = 1e-6)
+
+def testENURoundTrip():
+    rng = np.random.default_rng(0)
+    e, n, u = rng.uniform(-5000.0, 5000.0, (3, 100))
+    lat, lon, alt = enuToGeodetic(e, n, u, 41.1, 16.9, 50.0)
+    back = geodeticToENU(lat, lon, alt, 41.1, 16.9, 50.0)
+
+    assert lat.shape == (100,)
+    np.testing.assert_allclose(back, (e, n, u), atol = 1e-3)
@@ -0,0 +1,167 @@
+import struct
+import numpy as np
+import pytest
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from nmeaUtils import nmeaSentence, coordField, sodField
+from importUtils import importFile, saveImport, loadImport, fileKind
+
+baseDate = datetime(2025, 10, 9, tzinfo = timezone.utc)
+day = int(baseDate.timestamp())*1000000000
+
+def _gga(sod, lat):
+    latField, ns = coordField(lat, 'N', 'S')
+
+    return nmeaSentence(f"GPGGA,{sodField(sod)},{latField},{ns},"
+                        f"01652.2000,E,4,12,0.8,100.000,M,46.9,M,,")
+
+def _avr(sod, yaw):
+    return nmeaSentence(f"PTNL,AVR,{sodField(sod)},{yaw:+.4f},Yaw,"
+                        f"+0.5000,Tilt,,,60.191,3,2.5,6")
+
+def _rmc(sod, date):
+    return nmeaSentence(f"GPRMC,{sodField(sod)},A,4100.0000,N,01652.2000,E,"
+                        f"0.5,54.7,{date},,,D")
+
+def _zda(sod, date):
+    return nmeaSentence(f"GPZDA,{sodField(sod)},{date[0:2]},{date[2:4]},"
+                        f"20{date[4:6]},00,00")
+
+def _writeLog(path, sods, receivers = ('gps1', 'gps2'), dated = {}):
+    # dated: index -> date sentence written by gps1 before that GGA
+    with open(path, 'w') as f:
+        for k, sod in enumerate(sods):
+            if k in dated:
+                f.write(f"gps1,{dated[k]}\r\n")
+
+            f.write(f"{receivers[0]},{_gga(sod, 41.0 + 1e-4*k)}\r\n")
+            f.write(f"{receivers[1]},{_avr(sod, float(k % 360))}\r\n")
+
+def _udp(payload, port):
+    udp = struct.pack('>HHHH', 40000, port, 8 + len(payload), 0) + payload
+    ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(udp), 0, 0, 64, 17,
+                     0, b'\x7f\0\0\1', b'\x7f\0\0\1')
+
+    return b'\0'*12 + b'\x08\x00' + ip + udp
+
+def _writePcap(path, datagrams, port = 6003):
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+
+        for t, payload in datagrams:
+            packet = _udp(payload, port)
+            f.write(struct.pack('<IIII', t // 1000000000,
+                                (t % 1000000000) // 1000, len(packet),
+                                len(packet)))
+            f.write(packet)
+
+def testTextLog(tmp_path):
+    path = tmp_path/'log.txt'
+    _writeLog(path, [3600.0 + k for k in range(50)])
+
+    rows = importFile(str(path), baseDate = baseDate)
+
+    assert fileKind(str(path)) == 'text'
+    assert len(rows) == 100
+    assert rows['time'][0] == day + 3600*1000000000
+    assert np.all(np.diff(rows['time']) >= 0)
+    assert set(rows['receiver']) == {b'GPS1', b'GPS2'}
+    assert rows['latitude'][rows['receiver'] == b'GPS1'][-1] == \
+           pytest.approx(41.0049)
+
+def testTextLogCrossingMidnight(tmp_path):
+    path = tmp_path/'log.txt'
+    _writeLog(path, [86398.0, 86399.0, 0.0, 1.0])
+
+    times = importFile(str(path), baseDate = baseDate)['time']
+
+    assert (times[::2] - day).tolist() == [86398000000000, 86399000000000,
+                                           86400000000000, 86401000000000]
+
+@pytest.mark.parametrize('dated, first', [
+    ({0 : _rmc(86398.0, '091025')}, 86398),
+    ({0 : _zda(86398.0, '091025')}, 86398),
+    # a date sentence after midnight dates the rows before it as well
+    ({3 : _zda(1.0, '101025')}, 86398)])
+def testDateFromSentences(tmp_path, dated, first):
+    path = tmp_path/'log.txt'
+    _writeLog(path, [86398.0, 86399.0, 0.0, 1.0], dated = dated)
+
+    times = importFile(str(path))['time']
+
+    assert times[0] - day == first*1000000000
+    assert times[-1] - day == 86401*1000000000
+
+def testMissingDate(tmp_path):
+    path = tmp_path/'log.txt'
+    _writeLog(path, [3600.0, 3601.0])
+
+    with pytest.raises(ValueError):
+        importFile(str(path))
+
+@pytest.mark.parametrize('chunkSize, overlap', [(1 << 20, 64 << 10),
+                                                (2000, 64 << 10),
+                                                (2000, 500)])
+def testChunksAndWorkers(tmp_path, chunkSize, overlap):
+    # one receiver with position and attitude: the rows after a chunk
+    # start need the last GGA and AVR of the chunk before
+    path = tmp_path/'log.txt'
+    _writeLog(path, [float(k) for k in range(300)], ('gps1', 'gps1'))
+
+    single = importFile(str(path), baseDate = baseDate)
+
+    with ThreadPoolExecutor(4) as executor:
+        rows = importFile(str(path), executor, baseDate = baseDate,
+                          chunkSize = chunkSize, overlap = overlap)
+
+    assert len(rows) == 600
+    assert rows['time'].tolist() == single['time'].tolist()
+
+    for k in ('sod', 'latitude', 'yaw', 'tilt'):
+        np.testing.assert_array_equal(rows[k], single[k])
+
+    assert not np.isnan(rows['yaw'][1:]).any()
+
+def testPcap(tmp_path):
+    path = tmp_path/'capture.pcap'
+    t = day + 7200*1000000000
+    datagrams = [(t + k*100000000,
+                  f"gps1,{_gga(7200.0 + 0.1*k, 41.5)}\r\n".encode())
+                 for k in range(20)]
+    # other port, ignored
+    datagrams.append((t, f"gps1,{_gga(1.0, 0.0)}\r\n".encode()))
+    _writePcap(path, datagrams[:10] + datagrams[20:] + datagrams[10:20])
+
+    rows = importFile(str(path), chunkSize = 300)
+
+    assert fileKind(str(path)) == 'pcap'
+    assert len(rows) == 21
+    assert rows['time'][0] == t
+    assert np.all(np.diff(rows['time']) >= 0)
+
+    rows = importFile(str(path), port = 6004)
+
+    assert len(rows) == 0
+
+def testSaveAndLoad(tmp_path):
+    path = tmp_path/'log.txt'
+    _writeLog(path, [3600.0 + 0.25*k for k in range(400)])
+    rows = importFile(str(path), baseDate = baseDate)
+    out = str(tmp_path/'imported')
+
+    saveImport(out, rows)
+    columns = loadImport(out)
+
+    assert columns['time'].tolist() == rows['time'].tolist()
+    assert isinstance(columns['latitude'], np.memmap)
+
+    start = day + 3610*1000000000
+    stop = day + 3620*1000000000 + 500000000
+    part = loadImport(out, start, stop, ['time', 'yaw'])
+    expected = rows[(rows['time'] >= start) & (rows['time'] <= stop)]
+
+    assert sorted(part) == ['time', 'yaw']
+    assert part['time'].tolist() == expected['time'].tolist()
+    np.testing.assert_array_equal(part['yaw'], expected['yaw'])
+    assert len(loadImport(out, day)['time']) == len(rows)
+    assert len(loadImport(out, stop = day)['time']) == 0
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+from imuUtils import (imuLogger, queries, scaledQueries, rawCounts,
+                      rfc3339ToNs)
+from fakeServices import fakeInflux
+
+@pytest.fixture
+def imu():
+    imu = imuLogger(dbHost = None, convHost = None)
+    yield imu
+    imu.close()
+
+@pytest.fixture
+def influx():
+    influx = fakeInflux(hkbRate = 100.0)
+    yield influx
+    influx.stop()
+
+def _points(metric, rows):
+    return [{'time' : t, 'metric' : metric, 'instance' : k, 'value' : v}
+            for t, k, v in rows]
+
+def testCompleteSequences(imu):
+    points = _points('acceleration',
+                     [(10, 'Y', 9), (11, 'Z', 9),        # tail of a run
+                      (100, 'X', 1), (101, 'Y', 2), (102, 'Z', 3),
+                      (200, 'X', 4), (202, 'Z', 6),      # Y missing
+                      (300, 'X', 7), (301, 'Y', 8),      # cut by a new X
+                      (400, 'X', 10), (401, 'Y', 11), (402, 'Z', 12),
+                      (500, 'X', 13), (501, 'Y', 14)])   # still being written
+
+    assert imu._getCmpltSeqs(points, ['X', 'Y', 'Z']) == [(102, 1, 2, 3),
+                                                          (402, 10, 11, 12)]
+
+def testSequenceSpan(imu):
+    points = _points('acceleration', [(0, 'X', 1), (5, 'Y', 2), (10, 'Z', 3),
+                                      (20, 'X', 4), (21, 'Y', 5),
+                                      (22, 'Z', 6)])
+
+    assert imu._getCmpltSeqs(points, ['X', 'Y', 'Z'], maxSpan = 5) == \
+           [(22, 4, 5, 6)]
+
+def testDecodeSigned(imu):
+    points = _points('acceleration', [(1, 'X', 0xFFFF), (2, 'Y', 0x8000),
+                                      (3, 'Z', 16384)])
+    raw = imu._decodeBatch(points, queries['accel'])
+
+    assert raw['time'].tolist() == [3]
+    assert raw.dtype['X'] == np.int64
+    assert raw[['X', 'Y', 'Z']].tolist() == [(-1, -32768, 16384)]
+
+    tQ = scaledQueries(queries, accel = 2.0)['accel']
+    batch = imu._decodeBatch(points, tQ)
+
+    assert queries['accel']['scale'] is None
+    assert batch['X'][0] == pytest.approx(-2.0/32768.0)
+    assert batch['Y'][0] == pytest.approx(-2.0)
+    assert batch['Z'][0] == pytest.approx(1.0)
+    # the converter gets the sensor counts back
+    assert rawCounts([batch['X'][0], batch['Z'][0]], tQ).tolist() == \
+           [-1, 16384]
+
+def testSensorRanges():
+    imu = imuLogger(dbHost = None, convHost = None, accelRange = 4.0,
+                    gyroRange = 500.0, fusion = 'madgwick')
+
+    assert imu._dbQueries['accel']['scale'] == 4.0/32768.0
+    assert imu._dbQueries['gyro']['scale'] == 500.0/32768.0
+    assert imu._dbQueries['quat'] is queries['quat']
+    assert imu._fusion._gyroScale == pytest.approx(np.radians(1.0))
+
+    imu.close()
+
+@pytest.mark.parametrize('text, ns', [
+    ("1970-01-01T00:00:00Z", 0),
+    ("2025-10-09T08:53:20.123456789Z", 1759999999*10**9 + 1123456789),
+    ("2000-02-29T00:00:00.000000001Z", 951782400000000001),
+    ("2025-12-31T23:59:59.5Z", 1767225599500000000),
+    ("2025-12-31T23:59:59Z", 1767225599000000000),
+    ("2025-10-09T10:53:20+02:00", 1760000000000000000)])
+def testRFC3339(text, ns):
+    assert rfc3339ToNs(text) == ns
+
+@pytest.mark.parametrize('accelRange, gravity', [(None, 16384),
+                                                 (2.0, 1.0)])
+def testFakeInfluxBatches(influx, accelRange, gravity):
+    imu = imuLogger(dbHost = None, convHost = None, accelRange = accelRange)
+
+    # as updateIMU() queries: epoch ns, cursors in ns
+    def fetch():
+        result = influx.queryResult(imu._dbQuery(), 'ns')['results'][0]
+        series = result.get('series', [])
+        values = series[0]['values'] if series else []
+
+        imu._updateDBResults([dict(zip(('time', 'metric', 'instance',
+                                        'value'), v)) for v in values])
+
+        return {qN : imu._imuBatches[qN].copy() for qN in queries}
+
+    first = fetch()
+
+    for qN, batch in first.items():
+        assert len(batch) > 50
+        assert np.all(np.diff(batch['time']) > 0)
+
+    assert np.allclose(first['accel']['Z'], gravity)
+    assert np.allclose(first['quat']['q1']**2 + first['quat']['q4']**2, 1.0)
+
+    # the cursors carry over: the next fetch starts after the last sequence
+    second = fetch()
+
+    for qN in queries:
+        if len(second[qN]):
+            assert second[qN]['time'][0] > first[qN]['time'][-1]
+
+    imu.close()
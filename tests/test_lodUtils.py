@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from lodUtils import minMaxLOD, minMaxIndices, bucketWidth
+
+rowDtype = np.dtype([('time', np.float64), ('a', np.float64),
+                     ('b', np.float64)])
+
+def _rows(n, seed = 0):
+    rng = np.random.default_rng(seed)
+    rows = np.zeros(n, rowDtype)
+    rows['time'] = np.arange(n, dtype = np.float64)
+    rows['a'] = rng.normal(size = n).cumsum()
+    rows['b'] = rng.normal(size = n)
+    rows['b'][rng.integers(0, n, n//20)] = np.nan
+
+    return rows
+
+def _assertSame(x, y):
+    # nan-aware
+    for f in rowDtype.names:
+        np.testing.assert_array_equal(x[f], y[f])
+
+def testBucketWidth():
+    assert bucketWidth(1000.0, 100) == 16.0
+    assert bucketWidth(1024.0, 64) == 16.0
+    assert bucketWidth(0.0, 100) is None
+    assert bucketWidth(np.nan, 100) is None
+    assert bucketWidth(10.0, 0) is None
+
+def testMinMaxIndices():
+    keys = np.arange(8.0)
+    values = np.array([3.0, 1.0, 2.0, 5.0, np.nan, 4.0, 0.0, 0.0])
+    idx = minMaxIndices(keys, [values], 4.0)
+
+    # first minimum and maximum of each bucket of 4, nan ignored
+    assert idx.tolist() == [1, 3, 5, 6]
+    assert len(minMaxIndices(keys[:0], [values[:0]], 4.0)) == 0
+
+def _extremes(rows, width):
+    # per bucket and field the min and max, the reference to keep
+    buckets = np.floor(rows['time']/width)
+    out = []
+
+    for b in np.unique(buckets):
+        part = rows[buckets == b]
+        out.append([(np.nanmin(part[f]), np.nanmax(part[f]))
+                    if not np.all(np.isnan(part[f])) else None
+                    for f in ('a', 'b')])
+
+    return out
+
+def testKeepsExtremes():
+    rows = _rows(5000)
+    lod = minMaxLOD(['a', 'b'])
+    shown = lod.update(rows, 64.0)
+
+    assert len(shown) < len(rows)//10
+    assert shown[-1]['time'] == rows[-1]['time']
+    assert np.all(np.diff(shown['time']) > 0)
+    assert _extremes(shown, 64.0) == _extremes(rows, 64.0)
+
+def testIncrementalMatchesFull():
+    rows = _rows(3000, seed = 1)
+    lod = minMaxLOD(['a', 'b'])
+
+    for end in range(100, len(rows) + 1, 97):
+        shown = lod.update(rows[:end], 32.0)
+        full = minMaxLOD(['a', 'b']).update(rows[:end], 32.0)
+
+        _assertSame(shown, full)
+
+    # a sliding window: the buckets that left are forgotten, the one cut
+    # by the window start keeps the points it had
+    shown = lod.update(rows[1000:], 32.0)
+    full = minMaxLOD(['a', 'b']).update(rows[1000:], 32.0)
+
+    _assertSame(shown[shown['time'] >= 1024], full[full['time'] >= 1024])
+    assert shown['time'][0] >= 1000
+
+def testResetOnNewHistory():
+    lod = minMaxLOD(['a', 'b'])
+    lod.update(_rows(2000), 16.0)
+    shown = lod.update(_rows(500, seed = 2), 16.0)
+
+    _assertSame(shown, minMaxLOD(['a', 'b']).update(_rows(500, seed = 2),
+                                                    16.0))
+    assert len(lod.update(_rows(10), None)) == 10
+    assert lod.width is None
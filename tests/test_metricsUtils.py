@@ -0,0 +1,73 @@
+import json
+from math import nan, inf
+from urllib.request import urlopen
+from metricsUtils import formatMetrics, metricsServer, loggerState
+
+def testFormat():
+    families = [('gps_hdop', 'gauge', "Horizontal dilution of precision",
+                 [({'receiver' : 'GPS1'}, 0.8), ({'receiver' : 'best'}, None),
+                  ({}, nan)]),
+                ('gps_fixes_total', 'counter', "Fixes",
+                 [({'receiver' : 'GPS1'}, 3), ({'receiver' : 'GPS2'}, inf),
+                  ({'receiver' : 'GPS3'}, -inf)]),
+                ('stage_seconds', 'summary', "Latency",
+                 [({'stage' : 'parse', 'quantile' : '0.5'}, 1e-05),
+                  ({'stage' : 'parse'}, 3, '_count'),
+                  ({'stage' : 'parse'}, 0.25, '_sum')])]
+
+    assert formatMetrics(families).split('\n') == [
+        "# HELP gps_hdop Horizontal dilution of precision",
+        "# TYPE gps_hdop gauge",
+        'gps_hdop{receiver="GPS1"} 0.8',
+        'gps_hdop{receiver="best"} NaN',
+        "gps_hdop NaN",
+        "# HELP gps_fixes_total Fixes",
+        "# TYPE gps_fixes_total counter",
+        'gps_fixes_total{receiver="GPS1"} 3.0',
+        'gps_fixes_total{receiver="GPS2"} +Inf',
+        'gps_fixes_total{receiver="GPS3"} -Inf',
+        "# HELP stage_seconds Latency",
+        "# TYPE stage_seconds summary",
+        'stage_seconds{stage="parse",quantile="0.5"} 1e-05',
+        'stage_seconds_count{stage="parse"} 3.0',
+        'stage_seconds_sum{stage="parse"} 0.25',
+        ""]
+
+def testLabelEscaping():
+    text = formatMetrics([('m', 'gauge', "h",
+                           [({'path' : 'C:\\log "a"\nb'}, 1)])])
+
+    assert text.split('\n')[2] == 'm{path="C:\\\\log \\"a\\"\\nb"} 1.0'
+
+class _logger(object):
+    results = {'accel' : {'X' : nan, 'Y' : 1.0, 'timestamp' : 2*10**9}}
+    sources = {'influx' : 'ready', 'converter' : 'not yet available'}
+
+def testServer():
+    server = metricsServer(_logger(), port = 0,
+                           collectors = [lambda: [('extra', 'gauge', "x",
+                                                   [({}, nan)])]])
+    server.start()
+
+    try:
+        base = f"http://{server.address[0]}:{server.address[1]}"
+
+        with urlopen(f"{base}/metrics", timeout = 5) as r:
+            text = r.read().decode('utf-8')
+            assert r.headers['Content-Type'].startswith('text/plain')
+
+        with urlopen(f"{base}/state", timeout = 5) as r:
+            state = json.loads(r.read())
+    finally:
+        server.close()
+
+    assert 'imu_accel{component="X"} NaN' in text
+    assert 'imu_accel{component="Y"} 1.0' in text
+    assert 'imu_sample_timestamp_seconds{query="accel"} 2.0' in text
+    assert 'gpslogger_source_ready{source="influx"} 1.0' in text
+    assert 'gpslogger_source_ready{source="converter"} 0.0' in text
+    assert 'extra NaN' in text
+    # NaN is not JSON
+    assert state['imu'] == {'accel' : {'X' : None, 'Y' : 1.0,
+                                       'timestamp' : 2*10**9}}
+    assert state['sources'] == _logger.sources
@@ -0,0 +1,108 @@
+import pytest
+from functools import reduce
+from nmeaUtils import (nmeaParser, nmeaChecksum, nmeaSentence, coordField,
+                       sodField)
+
+def _gga(hhmmss):
+    return nmeaSentence(f"GPGGA,{hhmmss},4807.038,N,01131.000,E,4,12,0.8,"
+                        f"545.400,M,46.9,M,,")
+
+def testChecksum():
+    body = "GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,"
+
+    assert nmeaChecksum(body) == 0x47
+    assert nmeaSentence(body).endswith("*47")
+    # the folded xor against the plain one, past the 128 bytes split
+    longBody = body*3
+
+    assert nmeaChecksum(longBody) == reduce(lambda x, c: x ^ ord(c),
+                                            longBody, 0)
+
+def testGGA():
+    parser = nmeaParser()
+
+    assert parser.parse(f"gps1,{_gga('123519.25')}\r\n") == 1
+
+    rec = parser.record
+
+    assert rec['sod'] == pytest.approx(45319.25)
+    assert rec['altitude'] == pytest.approx(545.4)
+    assert (rec['quality'], rec['satellites']) == (4, 12)
+
+@pytest.mark.parametrize('lat, lon', [(41.1234567, 16.8712345),
+                                      (-33.8688197, 151.2092955),
+                                      (48.1173, -11.5166667),
+                                      (-0.0000123, -0.5)])
+def testGGARoundTrip(lat, lon):
+    latField, ns = coordField(lat, 'N', 'S')
+    lonField, ew = coordField(lon, 'E', 'W')
+    parser = nmeaParser()
+    gga = nmeaSentence(f"GPGGA,{sodField(45319.25)},{latField},{ns},"
+                       f"{lonField},{ew},4,12,0.8,545.400,M,46.9,M,,")
+
+    assert parser.parse(f"gps1,{gga}\r\n") == 1
+    assert parser.record['latitude'] == pytest.approx(lat, abs = 1e-9)
+    assert parser.record['longitude'] == pytest.approx(lon, abs = 1e-9)
+
+@pytest.mark.parametrize('lat, ns, lon, ew, expected', [
+    ('4807.038', 'S', '01131.000', 'W', (-48.1173, -11.5166667)),
+    # minutes rounding up to 60 stay below the next degree
+    ('4759.99970', 'N', '01659.99999', 'E', (47.9999950, 16.9999998)),
+    ('0000.0300', 'S', '00000.0000', 'W', (-0.0005, 0.0)),
+    ('', '', '', '', (None, None))])
+def testCoordinates(lat, ns, lon, ew, expected):
+    parser = nmeaParser()
+    gga = nmeaSentence(f"GPGGA,123519.00,{lat},{ns},{lon},{ew},4,12,0.8,"
+                       f"545.400,M,46.9,M,,")
+
+    assert parser.parse(f"gps1,{gga}\r\n") == 1
+
+    for k, value in zip(('latitude', 'longitude'), expected):
+        if value is None:
+            assert parser.record[k] != parser.record[k]
+        else:
+            assert parser.record[k] == pytest.approx(value, abs = 1e-7)
+
+def testAVRAndReceivers():
+    parser = nmeaParser()
+    avr = nmeaSentence("PTNL,AVR,123519.00,+12.5000,Yaw,-1.2500,Tilt,,,"
+                       "60.191,3,2.5,6")
+    gga = _gga('123519.00')
+
+    # the untagged line belongs to the last tagged receiver, the unknown
+    # receiver is ignored
+    assert parser.parse(f"gps2,{avr}\r\n{gga}\r\ngps9,{gga}\r\n") == 2
+    assert parser.sentences == ['PTNL,AVR', 'GGA']
+
+    rec = parser.record
+
+    assert rec['receiver'] == 'gps2'
+    assert (rec['yaw'], rec['tilt']) == (12.5, -1.25)
+    assert rec['sod'] == 45319.0
+
+def testZDA():
+    parser = nmeaParser()
+    zda = nmeaSentence("GPZDA,235959.50,09,10,2025,00,00")
+
+    assert parser.parse(f"gps1,{zda}\r\n") == 1
+    assert parser.sentences == ['ZDA']
+    assert (parser.record['sod'], parser.record['date']) == (86399.5,
+                                                             '091025')
+    # out of range day
+    assert parser.parse(f"gps1,{nmeaSentence('GPZDA,000000,32,10,2025,,')}"
+                        f"\r\n") == 0
+
+def testBadSentencesAreCounted():
+    parser = nmeaParser()
+    good = _gga('000140.00')
+    parser.parse(f"gps1,{good}")
+
+    corrupted = good[:-2] + ('00' if good[-2:] != '00' else '01')
+    truncated = nmeaSentence("GPGGA,123519,4807.038,N")
+
+    assert parser.parse(f"gps1,{corrupted}\ngps1,{truncated}") == 0
+    assert parser.counters == {'sentences'   : 1,
+                               'badChecksum' : 1,
+                               'invalid'     : 1}
+    # nothing of the rejected sentences reached the record
+    assert parser.record['sod'] == 100.0
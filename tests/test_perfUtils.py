@@ -0,0 +1,78 @@
+import pytest
+from perfUtils import latencyHistogram, perfMonitor, _bucket, _bucketUpper
+
+def testBuckets():
+    # every value lies in its bucket, buckets are contiguous and span at
+    # most 25% of their values
+    for ns in list(range(1, 5000)) + [123456789, 10**12]:
+        idx = _bucket(ns)
+        upper = _bucketUpper(idx)
+        previous = _bucket(ns - 1)
+
+        assert ns < upper <= max(ns + 1, 1.25*ns + 1)
+        assert previous <= idx
+        assert previous == idx or _bucketUpper(previous) == ns
+
+    assert [_bucket(ns) for ns in range(8)] == list(range(8))
+
+def testQuantiles():
+    histogram = latencyHistogram()
+
+    for k in range(1, 1001):
+        histogram.record(k*1000)
+
+    total, (p50, p99), peak = histogram.snapshot((0.5, 0.99))
+
+    assert total == histogram.count == 1000
+    assert histogram.total == pytest.approx(500.5e-3)
+    assert peak == pytest.approx(1e-3)
+    assert 500e-6 <= p50 <= 1.25*500e-6
+    assert 990e-6 <= p99 <= peak
+
+def testEmpty():
+    assert latencyHistogram().snapshot() == (0, [None]*3, None)
+
+def testWindow(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('perfUtils.monotonic', lambda: now[0])
+    histogram = latencyHistogram(window = 60.0, slices = 6)
+
+    histogram.record(10**6)
+    now[0] += 30.0
+    histogram.record(10**3)
+
+    assert histogram.snapshot()[0] == 2
+
+    now[0] += 40.0
+    total, _, peak = histogram.snapshot()
+
+    assert total == 1
+    assert peak == pytest.approx(1e-6)
+
+    now[0] += 1000.0
+
+    assert histogram.snapshot()[0] == 0
+    assert histogram.count == 2
+
+def testMonitor():
+    monitor = perfMonitor()
+
+    @monitor.timed('call')
+    def call(x):
+        return 2*x
+
+    assert call(21) == 42
+    assert call.__name__ == 'call'
+
+    monitor.enabled = False
+    call(1)
+    monitor.enabled = True
+    monitor.record('parse', 5000)
+
+    assert sorted(monitor.stages) == ['call', 'parse']
+    assert monitor.stages['call'].count == 1
+    assert 'parse' in monitor.summary()
+
+    monitor.reset()
+
+    assert monitor.stages == {}
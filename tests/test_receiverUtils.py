@@ -0,0 +1,134 @@
+import pytest
+from math import nan
+from gpsUtils import gpsLogger, gpsFix
+from receiverUtils import receiverStore
+
+def _fix(receiver, quality = 4, hdop = 0.8, lat = 41.0, yaw = nan):
+    return gpsFix(receiver, "12:00:00", 43200.0, lat, 16.0, 100.0, yaw,
+                  0.5 if yaw == yaw else nan, quality, 12, hdop)
+
+def testStates():
+    store = receiverStore(staleAfter = 3.0)
+
+    for k in range(11):
+        store.update(_fix('GPS1'), 100.0 + 0.1*k)
+
+    store.update(_fix('GPS2'), 100.0)
+
+    assert store.receivers == ['GPS1', 'GPS2']
+    assert store.fix('GPS3') is None
+    assert store.state('GPS3') is None
+
+    states = store.states(102.0)
+
+    assert states['GPS1'].count == 11
+    assert states['GPS1'].rate == pytest.approx(10.0)
+    assert states['GPS1'].age == pytest.approx(1.0)
+    assert not states['GPS1'].stale
+    assert states['GPS2'].rate == 0.0
+    assert store.state('GPS2', 103.5).stale
+
+@pytest.mark.parametrize('fixes, expected', [
+    # quality first, then HDOP, then the freshest
+    ([('GPS1', 1, 0.5), ('GPS2', 4, 2.0)], 'GPS2'),
+    ([('GPS1', 5, 0.9), ('GPS2', 5, 0.7)], 'GPS2'),
+    ([('GPS1', 2, 1.0), ('GPS2', 3, 1.0)], 'GPS2'),
+    ([('GPS1', 4, nan), ('GPS2', 4, 3.0)], 'GPS2'),
+    ([('GPS1', 0, 0.5), ('GPS2', 6, 9.0)], 'GPS2')])
+def testBestRanking(fixes, expected):
+    store = receiverStore()
+
+    for t, (r, quality, hdop) in enumerate(fixes):
+        store.update(_fix(r, quality, hdop), 10.0 + t)
+
+    assert store.best(12.0).receiver == expected
+
+def testBestSkipsStaleReceivers():
+    store = receiverStore(staleAfter = 3.0)
+    store.update(_fix('GPS1', 4), 10.0)
+    store.update(_fix('GPS2', 1), 12.0)
+
+    assert store.best(12.5).receiver == 'GPS1'
+    assert store.best(14.0).receiver == 'GPS2'
+    assert store.best(20.0) is None
+
+def testBestWithoutPosition():
+    store = receiverStore()
+    store.update(_fix('GPS1', 0, lat = nan, yaw = 10.0), 10.0)
+    store.update(_fix('GPS2', 0, lat = nan, yaw = 20.0), 11.0)
+
+    assert store.best(11.0).receiver == 'GPS2'
+
+def testFuse():
+    store = receiverStore()
+    store.update(_fix('GPS1', 4, 1.0, lat = 41.0), 10.0)
+    store.update(_fix('GPS2', 4, 2.0, lat = 42.0), 10.0)
+    store.update(_fix('GPS3', 1, 0.5, lat = 50.0), 10.0)
+
+    assert store.best(10.0).latitude == 41.0
+
+    fused = store.best(10.0, fuse = True)
+
+    assert fused.receiver == 'GPS1+GPS2'
+    assert fused.latitude == pytest.approx((41.0 + 0.25*42.0)/1.25)
+    assert fused.longitude == pytest.approx(16.0)
+
+def testBorrowsOrientation():
+    store = receiverStore()
+    store.update(_fix('GPS1', 4), 10.0)
+    store.update(_fix('GPS2', 0, lat = nan, yaw = 12.5), 10.5)
+
+    best = store.best(11.0)
+
+    assert best.receiver == 'GPS1'
+    assert (best.yaw, best.tilt) == (12.5, 0.5)
+
+def testSubscribe():
+    store = receiverStore()
+    seen = []
+    handle = store.subscribe(lambda f: seen.append(('GPS1', f.receiver)),
+                             'GPS1')
+    store.subscribe(lambda f: seen.append((None, f.receiver)))
+
+    store.update(_fix('GPS1'), 1.0)
+    store.update(_fix('GPS2'), 1.0)
+    store.unsubscribe(handle)
+    store.update(_fix('GPS1'), 2.0)
+
+    assert seen == [('GPS1', 'GPS1'), (None, 'GPS1'), (None, 'GPS2'),
+                    (None, 'GPS1')]
+
+def testRaisingSubscriber():
+    store = receiverStore()
+    seen = []
+
+    def fail(fix):
+        raise ValueError('bad subscriber')
+
+    store.subscribe(fail, 'GPS1')
+    store.subscribe(seen.append)
+    store.update(_fix('GPS1'), 1.0)
+
+    assert [f.receiver for f in seen] == ['GPS1']
+    assert store.callbackErrors == 1
+    assert store.lastError == "ValueError: bad subscriber"
+
+def testSubscribersSeeTheNewFix():
+    gps = gpsLogger(localPort = None)
+    seen = []
+
+    def fail(fix):
+        raise RuntimeError('bad subscriber')
+
+    gps.receivers.subscribe(fail)
+    gps.receivers.subscribe(lambda f: seen.append((gps.fix.sod,
+                                                   len(gps._fixHistory))))
+
+    for k in range(3):
+        gps._handleFix(_fix('GPS1')._replace(sod = 43200.0 + k), 1.0 + k)
+
+    assert gps.fix.sod == 43202.0
+    assert seen == [(43200.0, 1), (43201.0, 2), (43202.0, 3)]
+    assert gps.receivers.callbackErrors == 3
+
+    gps.close()
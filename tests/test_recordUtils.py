@@ -0,0 +1,175 @@
+import numpy as np
+import pytest
+from recordUtils import (sessionRecorder, readRecording, listRecordings,
+                         recordAlign)
+
+rowDtype = np.dtype([('time', np.int64), ('receiver', 'S8'),
+                     ('value', np.float64)])
+
+def _rows(start, count):
+    rows = np.zeros(count, rowDtype)
+    rows['time'] = np.arange(start, start + count)
+    rows['receiver'] = b'gps1'
+    rows['value'] = 0.25*rows['time']
+
+    return rows
+
+def _readAll(prefix, stream):
+    parts = [readRecording(path)[1] for path in listRecordings(prefix, stream)]
+
+    return np.concatenate(parts) if parts else np.zeros(0, rowDtype)
+
+def testReadBack(tmp_path):
+    prefix = str(tmp_path/'session')
+    recorder = sessionRecorder(prefix, {'gps' : rowDtype},
+                               flushInterval = 0.01)
+
+    recorder.record('gps', _rows(0, 100))
+    recorder.record('gps', (100, b'gps2', 25.0))
+    recorder.record('gps', _rows(101, 9))
+    recorder.close()
+
+    paths = listRecordings(prefix, 'gps')
+    header, rows = readRecording(paths[0])
+
+    assert len(paths) == 1
+    assert header['stream'] == 'gps'
+    assert header['session'] == recorder.session
+    assert header['dtype'] == rowDtype
+    assert header['offset'] % recordAlign == 0
+    assert isinstance(rows, np.memmap)
+    assert rows['time'].tolist() == list(range(110))
+    assert rows['receiver'][100] == b'gps2'
+    assert readRecording(paths[0], mmap = False)[1].tolist() == rows.tolist()
+    assert recorder.counters['records'] == 110
+
+def testRotation(tmp_path):
+    prefix = str(tmp_path/'session')
+    # room for 40 rows per file
+    recorder = sessionRecorder(prefix, {'gps' : rowDtype},
+                               maxBytes = 40*rowDtype.itemsize,
+                               flushInterval = 0.01)
+
+    for k in range(5):
+        recorder.record('gps', _rows(30*k, 30))
+
+    recorder.addStream('imu', rowDtype)
+    recorder.record('imu', _rows(0, 3))
+    recorder.close()
+
+    paths = listRecordings(prefix, 'gps')
+    sizes = [len(readRecording(p)[1]) for p in paths]
+
+    assert len(paths) > 1
+    assert recorder.counters['files'] == len(paths) + 1
+    assert max(sizes) <= 40
+    assert [readRecording(p)[0]['sequence'] for p in paths] == \
+           list(range(len(paths)))
+    # records are never split across files and come back in order
+    assert _readAll(prefix, 'gps')['time'].tolist() == list(range(150))
+    assert len(_readAll(prefix, 'imu')) == 3
+    assert len(listRecordings(prefix)) == len(paths) + 1
+
+def testTruncatedRecord(tmp_path):
+    prefix = str(tmp_path/'session')
+    recorder = sessionRecorder(prefix, {'gps' : rowDtype})
+    recorder.record('gps', _rows(0, 10))
+    recorder.close()
+
+    path = listRecordings(prefix, 'gps')[0]
+
+    with open(path, 'ab') as f:
+        f.write(b'\0'*(rowDtype.itemsize//2))
+
+    assert len(readRecording(path)[1]) == 10
+
+def testDropsWhenFull(tmp_path):
+    prefix = str(tmp_path/'session')
+    # the writer does not run before close()
+    recorder = sessionRecorder(prefix, {'gps' : rowDtype}, maxQueue = 100,
+                               flushInterval = 60.0)
+
+    recorder.record('gps', _rows(0, 60))
+    recorder.record('gps', _rows(60, 60))
+    recorder.record('gps', _rows(120, 40))
+    recorder.record('gps', (160, b'gps1', 0.0))
+    recorder.close()
+
+    # whole batches are dropped, counted in rows
+    assert recorder.counters['dropped'] == 61
+    assert recorder.counters['records'] == 100
+    assert _readAll(prefix, 'gps')['time'].tolist() == \
+           list(range(60)) + list(range(120, 160))
+
+def testMismatchedRowsAreCounted(tmp_path):
+    prefix = str(tmp_path/'session')
+    recorder = sessionRecorder(prefix, {'gps' : rowDtype},
+                               flushInterval = 60.0)
+
+    recorder.record('gps', ('not a time', b'gps1', 0.0))
+    recorder.record('other', (1, 2))
+    recorder.close()
+
+    assert recorder.counters['errors'] == 2
+    assert recorder.counters['records'] == 0
+
+class _fullDisk(object):
+    def __init__(self, f):
+        self._f = f
+
+    def write(self, data):
+        raise OSError(28, 'No space left on device')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._f.close()
+
+def testWriteErrorsReopenTheFile(tmp_path):
+    prefix = str(tmp_path/'session')
+    # flushed by hand, the writer waits for close()
+    recorder = sessionRecorder(prefix, {'gps' : rowDtype},
+                               flushInterval = 60.0)
+
+    recorder.record('gps', _rows(0, 10))
+    recorder._flush()
+    entry = recorder._files['gps']
+    entry[0] = _fullDisk(entry[0])
+
+    recorder.record('gps', _rows(10, 10))
+    recorder._flush()
+
+    assert recorder.counters['errors'] == 1
+    assert 'gps' not in recorder._files
+
+    recorder.record('gps', _rows(20, 10))
+    recorder.close()
+
+    paths = listRecordings(prefix, 'gps')
+
+    assert [readRecording(p)[0]['sequence'] for p in paths] == [0, 1]
+    assert _readAll(prefix, 'gps')['time'].tolist() == \
+           list(range(10)) + list(range(20, 30))
+    assert recorder.counters['records'] == 20
+    assert recorder.counters['files'] == 2
+
+def testOpenErrorsAreCounted(tmp_path):
+    directory = tmp_path/'recordings'
+    prefix = str(directory/'session')
+    recorder = sessionRecorder(prefix, {'gps' : rowDtype},
+                               flushInterval = 60.0)
+    directory.rmdir()
+
+    recorder.record('gps', _rows(0, 10))
+    recorder._flush()
+
+    assert recorder.counters['errors'] == 1
+    assert recorder._writer.is_alive()
+
+    directory.mkdir()
+    recorder.record('gps', _rows(10, 10))
+    recorder.close()
+
+    assert _readAll(prefix, 'gps')['time'].tolist() == list(range(10, 20))
+    assert recorder.counters['records'] == 10
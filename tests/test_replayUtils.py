@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from gpsUtils import gpsLogger, fixDtype
+from imuUtils import imuLogger, convDtype
+from nmeaUtils import nmeaParser
+from recordUtils import sessionRecorder
+from replayUtils import sessionReplay, fixDatagram, fixFromRow
+
+t0 = 1760000000*1000000000
+
+def _fixes(count):
+    rows = np.zeros(count, fixDtype)
+    rows['time'] = t0 + np.arange(count)*100000000
+    rows['receiver'] = [b'GPS1', b'GPS2']*(count//2)
+    rows['sod'] = 45319.0 + 0.1*np.arange(count)
+    rows['latitude'] = 41.1 + 1e-6*np.arange(count)
+    rows['longitude'] = -16.87
+    rows['altitude'] = 100.0
+    rows['yaw'] = np.where(rows['receiver'] == b'GPS2', 12.5, np.nan)
+    rows['tilt'] = np.where(rows['receiver'] == b'GPS2', -1.25, np.nan)
+    rows['quality'] = 4
+    rows['satellites'] = 12
+    rows['hdop'] = 0.8
+
+    return rows
+
+def _conv(count):
+    rows = np.zeros(count, convDtype)
+    rows['time'] = t0 + np.arange(count)*10000000
+    rows['q1'] = 1.0
+
+    return rows
+
+@pytest.fixture
+def session(tmp_path):
+    prefix = str(tmp_path/'session')
+    recorder = sessionRecorder(prefix, {'gps' : fixDtype, 'conv' : convDtype})
+    recorder.record('gps', _fixes(40))
+    recorder.record('conv', _conv(400))
+    recorder.close()
+
+    return prefix
+
+def testFixDatagramRoundTrip():
+    row = _fixes(2)[1]
+    parser = nmeaParser()
+
+    assert parser.parse(fixDatagram(row).decode('ascii')) == 2
+
+    rec = parser.record
+    fix = fixFromRow(row)
+
+    assert rec['sod'] == pytest.approx(fix.sod)
+    assert rec['latitude'] == pytest.approx(fix.latitude, abs = 1e-9)
+    assert rec['longitude'] == pytest.approx(fix.longitude, abs = 1e-9)
+    assert (rec['yaw'], rec['tilt']) == (fix.yaw, fix.tilt)
+    assert (rec['quality'], rec['satellites']) == (4, 12)
+
+def testMissingSession(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        sessionReplay(str(tmp_path/'nothing'))
+
+@pytest.mark.parametrize('resynthesize', [True, False])
+def testReplayFeedsTheLoggers(session, resynthesize):
+    replay = sessionReplay(session, None, 1.0, resynthesize)
+    gps = gpsLogger(localPort = None)
+    imu = imuLogger(dbHost = None, convHost = None)
+
+    assert sorted(replay.streams) == ['conv', 'gps']
+    assert replay.duration == pytest.approx(3.99)
+
+    try:
+        assert replay.step(gps, imu) > 0
+        replay.run(gps, imu)
+
+        fixes = gps.drainFixes()
+        counters = replay.counters
+
+        assert replay.finished
+        assert counters['gps'] == 40
+        assert counters['imu'] == 400
+        assert counters['steps'] == 4
+        assert len(fixes) == 40
+        assert [f.receiver for f in fixes[:2]] == ['GPS1', 'GPS2']
+        assert fixes[-1].latitude == pytest.approx(41.1 + 39e-6, abs = 1e-9)
+        assert gps.fix.yaw == 12.5
+        assert imu.convBatch['time'][-1] == t0 + 399*10000000
+    finally:
+        gps.close()
+        imu.close()
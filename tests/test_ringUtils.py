@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from ringUtils import ringBuffer
+
+rowDtype = np.dtype([('time', np.float64), ('value', np.float64)])
+
+def _rows(start, count):
+    rows = np.zeros(count, rowDtype)
+    rows['time'] = np.arange(start, start + count)
+    rows['value'] = -rows['time']
+
+    return rows
+
+def testCapacity():
+    with pytest.raises(ValueError):
+        ringBuffer(rowDtype, 0)
+
+def testAppendWraps():
+    ring = ringBuffer(rowDtype, 4)
+
+    assert len(ring) == 0
+    assert ring.last is None
+
+    for t in range(6):
+        ring.append((t, -t))
+
+    assert ring.full
+    assert ring.view()['time'].tolist() == [2, 3, 4, 5]
+    assert ring.view(2)['time'].tolist() == [4, 5]
+    assert ring.view(10)['time'].tolist() == [2, 3, 4, 5]
+    assert ring.last['value'] == -5
+
+def testViewsAreNotCopies():
+    ring = ringBuffer(rowDtype, 4)
+    ring.extend(_rows(0, 3))
+
+    view = ring.view()
+
+    assert np.shares_memory(view, ring._data)
+    assert view.flags['C_CONTIGUOUS']
+
+@pytest.mark.parametrize('sizes', [(3, 3), (4, 1), (2, 7), (10,),
+                                   (1, 1, 1, 1, 1)])
+def testExtendMatchesAppend(sizes):
+    extended = ringBuffer(rowDtype, 4)
+    appended = ringBuffer(rowDtype, 4)
+    start = 0
+
+    for n in sizes:
+        rows = _rows(start, n)
+        extended.extend(rows)
+
+        for row in rows:
+            appended.append(row)
+
+        start += n
+
+        assert extended.view().tolist() == appended.view().tolist()
+
+    assert extended.last['time'] == start - 1
+
+def testWindow():
+    ring = ringBuffer(rowDtype, 8)
+    ring.extend(_rows(0, 12))
+
+    assert ring.window()['time'].tolist() == list(range(4, 12))
+    assert ring.window(6, 8)['time'].tolist() == [6, 7, 8]
+    assert ring.window(5.5)['time'].tolist() == list(range(6, 12))
+    assert ring.window(stop = 4.5)['time'].tolist() == [4]
+    assert len(ring.window(20)) == 0
+
+def testClear():
+    ring = ringBuffer(rowDtype, 4)
+    ring.extend(_rows(0, 6))
+    ring.clear()
+
+    assert len(ring) == 0
+    ring.append((9, 0))
+    assert ring.view()['time'].tolist() == [9]
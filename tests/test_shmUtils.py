@@ -0,0 +1,125 @@
+import os
+import numpy as np
+import pytest
+import shmUtils
+from shmUtils import sharedRing, sharedSegment, stateSubscriber
+
+rowDtype = np.dtype([('time', np.int64), ('value', np.float64)])
+
+def _ring(capacity = 8):
+    return sharedRing(bytearray(sharedRing.size(rowDtype, capacity)), 0,
+                      rowDtype, capacity)
+
+def _rows(start, count):
+    rows = np.zeros(count, rowDtype)
+    rows['time'] = np.arange(start, start + count)
+    rows['value'] = 0.5*rows['time']
+
+    return rows
+
+def testReadFollowsTheWriter():
+    ring = _ring()
+
+    rows, cursor, lost = ring.read(0)
+    assert (len(rows), cursor, lost) == (0, 0, 0)
+
+    ring.extend(_rows(0, 3))
+    ring.append((3, 1.5))
+    rows, cursor, lost = ring.read(0)
+
+    assert rows['time'].tolist() == [0, 1, 2, 3]
+    assert (cursor, lost) == (4, 0)
+    assert ring.latest()[0] == 3
+    assert ring.latest()[1]['value'] == 1.5
+
+def testOverwrittenRowsAreLost():
+    ring = _ring(8)
+    ring.extend(_rows(0, 5))
+    rows, cursor, _ = ring.read(0)
+
+    # 13 more rows through an 8 slot ring: 5 of them were never seen
+    ring.extend(_rows(5, 13))
+    rows, cursor, lost = ring.read(cursor)
+
+    assert rows['time'].tolist() == list(range(10, 18))
+    assert (cursor, lost) == (18, 5)
+
+    # a batch larger than the ring keeps its last rows only
+    ring.extend(_rows(18, 20))
+    rows, cursor, lost = ring.read(cursor)
+
+    assert rows['time'].tolist() == list(range(30, 38))
+    assert (cursor, lost) == (38, 12)
+
+def testTornSlotIsSkipped():
+    ring = _ring(8)
+    ring.extend(_rows(0, 4))
+
+    # the writer stopped between the two sequence stores of row 4
+    ring._seqs[4] = 2*4 + 1
+    ring._count[0] = 5
+    rows, cursor, lost = ring.read(0)
+
+    assert rows['time'].tolist() == [0, 1, 2, 3]
+    assert (cursor, lost) == (5, 1)
+    assert ring.latest() is None
+
+    # and a slot reused by a newer row is not taken for the old one
+    ring._seqs[4] = 2*12 + 2
+    assert ring.read(4)[0]['time'].tolist() == []
+
+@pytest.fixture
+def name():
+    return f"gpsTest{os.getpid()}"
+
+def testSegmentRoundTrip(name):
+    pub = sharedSegment(name, {'a' : (rowDtype, 16), 'b' : (rowDtype, 4)})
+    sub = stateSubscriber(name)
+
+    try:
+        assert sub.available
+        assert sub.generation == pub.header['created']
+        assert sub.read('a').tolist() == []
+
+        pub.rings['a'].extend(_rows(0, 10))
+        pub.rings['b'].extend(_rows(0, 10))
+
+        assert sub.read('a')['time'].tolist() == list(range(10))
+        assert sub.read('b')['time'].tolist() == [6, 7, 8, 9]
+        assert sub.lost == 6
+        assert sub.read('missing') is None
+    finally:
+        pub.close(unlink = True)
+
+    # the publisher closed its segment and nobody replaced it
+    assert not sub.available
+    assert sub.read('a') is None
+
+    sub.close()
+
+def testReaderMappingBefore313(name, monkeypatch):
+    # the Pythons without SharedMemory(track = False) map the segment
+    # through _posixshmem, out of reach of the resource tracker
+    monkeypatch.setattr(shmUtils, '_untracked', False)
+    monkeypatch.setattr(shmUtils, '_posixshmem',
+                        pytest.importorskip('_posixshmem'))
+
+    pub = sharedSegment(name, {'a' : (rowDtype, 4)})
+
+    try:
+        pub.rings['a'].extend(_rows(0, 3))
+        sub = sharedSegment(name)
+
+        assert isinstance(sub._shm, shmUtils._mapping)
+        assert sub.rings['a'].read(0)[0]['time'].tolist() == [0, 1, 2]
+
+        sub.close()
+
+        # a second publisher replaces the segment of a dead one only
+        with pytest.raises(RuntimeError):
+            sharedSegment(name, {'a' : (rowDtype, 4)})
+    finally:
+        pub.close(unlink = True)
+
+    with pytest.raises(FileNotFoundError):
+        sharedSegment(name)
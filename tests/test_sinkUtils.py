@@ -0,0 +1,128 @@
+import socket
+import numpy as np
+import pytest
+from time import sleep, monotonic
+from gpsUtils import gpsFix
+from imuUtils import convDtype
+from fakeServices import fakeInflux
+from sinkUtils import influxSink, lineProtocol, convLines
+
+def _waitFor(condition, timeout = 5.0):
+    deadline = monotonic() + timeout
+
+    while not condition():
+        if monotonic() > deadline:
+            return False
+        sleep(0.01)
+
+    return True
+
+def _fix(sod = 45319.0):
+    return gpsFix('GPS1', '12:35:19', sod, 41.1, 16.87, 545.4, np.nan, np.nan,
+                  4, 12, 0.8)
+
+@pytest.fixture
+def influx():
+    influx = fakeInflux().start()
+    yield influx
+    influx.stop()
+
+def _sink(influx, **kwargs):
+    host, port = influx.address
+    args = {'flushInterval' : 0.05, 'retryBase' : 0.01, 'retryMax' : 0.05,
+            'timeout' : 1.0}
+    args.update(kwargs)
+
+    return influxSink(host, port, **args)
+
+def testLineProtocol():
+    line = lineProtocol('gps fix', {'receiver' : 'a,b', 'empty' : ''},
+                        {'x' : 1.5, 'n' : 3, 'nan' : np.nan, 'ok' : True,
+                         's' : 'say "hi"'}, 42)
+
+    assert line == ('gps\\ fix,receiver=a\\,b x=1.5,n=3i,ok=true,'
+                    's="say \\"hi\\"" 42')
+    assert lineProtocol('m', {}, {'nan' : np.nan}, 1) is None
+
+def testConvLines():
+    batch = np.zeros(2, convDtype)
+    batch['time'] = [10, 20]
+    batch['q1'] = 1.0
+    batch['roll'] = np.nan
+    lines = convLines(batch)
+
+    assert len(lines) == 2
+    assert lines[0].startswith('imuConv q1=1.0,q2=0.0,')
+    assert 'roll' not in lines[0]
+    assert lines[1].endswith(' 20')
+
+def testWritesBatches(influx):
+    sink = _sink(influx)
+    batch = np.zeros(100, convDtype)
+    batch['time'] = np.arange(100)
+
+    sink.writeFix(_fix(), _fix())
+    sink.writeConv(batch)
+    sink.close()
+
+    lines = influx.lines('spbmonitor')
+
+    assert len(lines) == 102
+    assert lines[0].startswith('gpsFix,receiver=GPS1 latitude=41.1,')
+    assert lines[1].startswith('gpsFix,receiver=best ')
+    assert sink.counters['written'] == 102
+    assert sink.counters['pending'] == 0
+
+def testRetriesServerErrors(influx):
+    influx.fail(3, 503)
+    sink = _sink(influx)
+    sink.writeFix(_fix())
+
+    assert _waitFor(lambda: sink.counters['written'] == 1)
+
+    counters = sink.counters
+    sink.close()
+
+    assert counters['retries'] >= 3
+    assert counters['rejected'] == 0
+    assert sink.lastError.startswith('HTTP 503')
+    # the batch went through once
+    assert len(influx.lines()) == 1
+
+def testRejectedBatchIsNotRetried(influx):
+    influx.fail(1, 400)
+    sink = _sink(influx)
+    sink.writeFix(_fix())
+
+    assert _waitFor(lambda: sink.counters['rejected'] == 1)
+
+    sink.writeFix(_fix())
+    sink.close()
+
+    assert sink.counters['retries'] == 0
+    assert sink.counters['written'] == 1
+    assert len(influx.lines()) == 1
+
+def testDropsOldestWhileUnreachable():
+    # a port nobody listens on
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+
+    sink = influxSink('127.0.0.1', port, batchSize = 10, maxPending = 100,
+                      flushInterval = 0.01, retryBase = 0.01, retryMax = 0.02)
+    batch = np.zeros(30, convDtype)
+
+    for k in range(10):
+        batch['time'] = k
+        sink.writeConv(batch.copy())
+        sink.writeFix(_fix())
+
+    counters = sink.counters
+    sink.close(0.1)
+
+    assert counters['queued'] == 310
+    assert counters['pending'] <= 100
+    assert counters['dropped'] == counters['queued'] - counters['pending']
+    assert counters['written'] == 0
@@ -0,0 +1,89 @@
+import threading
+import pytest
+from sourceUtils import lazySource, notAvailable
+
+class _opener(object):
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+        self.opened = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+
+        if self.calls <= self.failures:
+            raise ConnectionRefusedError(111, 'Connection refused '*10)
+
+        self.opened.set()
+
+        return f"connection{self.calls}"
+
+def testOpensInTheBackground():
+    opener = _opener(3)
+    changes = []
+    source = lazySource('db', opener, changes.append, retryBase = 0.01)
+
+    assert source.status == notAvailable
+    assert source.start() is source
+    assert opener.opened.wait(5)
+
+    source.close()
+
+    assert opener.calls == 4
+    assert changes == ['connection4', None]
+    assert source.value is None and source.lastError is None
+
+def testBackoff(monkeypatch):
+    delays = []
+    source = lazySource('db', _opener(10), retryBase = 0.5, retryMax = 4.0)
+    monkeypatch.setattr('sourceUtils.random.uniform', lambda a, b: b)
+
+    def wait(delay):
+        delays.append(delay)
+        return len(delays) == 6 and source._stopEvent.set()
+
+    monkeypatch.setattr(source._stopEvent, 'wait', wait)
+    source._openLoop()
+
+    assert delays == [0.5, 1.0, 2.0, 4.0, 4.0, 4.0]
+    assert source.status.startswith(f"{notAvailable} (ConnectionRefused")
+    assert len(source.lastError) == 80
+    assert source.lastError.endswith('...')
+
+def testOpenAndFailed():
+    opener = _opener(0)
+    changes = []
+    closed = []
+    source = lazySource('conv', opener, changes.append, closed.append,
+                        retryBase = 0.01)
+
+    assert source.open().ready
+    assert source.status == 'ready'
+
+    opener.opened.clear()
+    source.failed(BrokenPipeError(32, 'Broken pipe'))
+
+    assert closed == ['connection1']
+    assert opener.opened.wait(5)
+
+    source.close()
+
+    assert changes == ['connection1', None, 'connection2', None]
+    assert closed == ['connection1', 'connection2']
+
+    source.failed()
+
+    assert len(changes) == 4
+
+def testCloseStopsRetrying():
+    opener = _opener(10**9)
+    source = lazySource('map', opener, retryBase = 60.0).start()
+
+    while source.lastError is None:
+        pass
+
+    source.close()
+
+    assert opener.calls == 1
+    assert source._thread is None
+    assert not source.ready
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from collections import namedtuple
+from gpsUtils import sodToEpochNs
+from syncUtils import syncBuffer, syncIMUDtype, slerp, interpolateField
+
+_dayNs = 86400*1000000000
+_fix = namedtuple('fix', 'sod latitude longitude altitude yaw tilt')
+
+def _zRotation(degrees):
+    half = np.radians(degrees)/2
+
+    return [np.cos(half), 0.0, 0.0, np.sin(half)]
+
+def testSlerp():
+    q0 = np.array([_zRotation(0.0)]*3)
+    q1 = np.array([_zRotation(90.0)]*3)
+    q = slerp(q0, q1, [0.0, 0.5, 1.0])
+
+    assert np.allclose(q, [_zRotation(0.0), _zRotation(45.0),
+                           _zRotation(90.0)])
+
+def testSlerpShortestPath():
+    # q and -q are the same rotation: the way between them is no rotation
+    q0 = np.array([_zRotation(10.0)])
+    q = slerp(q0, -q0, [0.5])
+
+    assert np.allclose(np.abs(q), np.abs(q0))
+
+    # from 170 to -170 degrees the short way crosses 180
+    q = slerp([_zRotation(170.0)], [_zRotation(-170.0)], [0.5])
+
+    assert np.allclose(np.abs(q), np.abs([_zRotation(180.0)]))
+
+def testSlerpCloseQuaternions():
+    q0 = np.array([_zRotation(30.0)])
+    q = slerp(q0, q0 + 1e-12, [0.3])
+
+    assert np.all(np.isfinite(q))
+    assert np.allclose(q, q0)
+
+@pytest.mark.parametrize('sod, received, day', [
+    # late fix of the previous day received just after midnight
+    (86399.5, 20*_dayNs + 1000000000, 19),
+    # early fix of the next day received just before midnight
+    (0.5, 21*_dayNs - 1000000000, 21),
+    (43200.0, 20*_dayNs + 43201000000000, 20)])
+def testSodRollover(sod, received, day):
+    t = day*_dayNs + round(sod*1e9)
+
+    assert sodToEpochNs(np.array([sod]), np.array([received]))[0] == t
+    # the scalar path of the receiver thread
+    assert sodToEpochNs(sod, received) == t
+    assert isinstance(sodToEpochNs(sod, received), int)
+
+def testAngleInterpolation():
+    t = np.array([0, 1000000000])
+    values, span = interpolateField(t, np.array([350.0, 10.0]),
+                                    np.array([500000000, 2000000000]),
+                                    angle = True)
+
+    # 350 -> 10 degrees goes through north, not back through 180
+    assert values[0] == pytest.approx(0.0)
+    assert span.tolist() == [1.0, np.inf]
+
+def _imu(times):
+    rows = np.zeros(len(times), syncIMUDtype)
+    rows['time'] = times
+    rows['q1'] = 1.0
+
+    return rows
+
+def testAlignedDropsGaps():
+    sync = syncBuffer(64, maxGap = 1.5)
+    base = 20*_dayNs
+
+    for k in range(6):
+        sync.addFix(_fix(k, 41.0 + k, 16.0, 100.0, 2.0*k, 0.0),
+                    base + k*1000000000 + 5000000)
+
+    # no IMU sample between 3.4 and 5 s: the fix at 4 s has no orientation
+    sync.addIMU(_imu(base + (np.array([0, 1, 2, 3, 3.4, 5, 5.5])*
+                             1e9).astype(np.int64)))
+    rows = sync.aligned()
+
+    assert ((rows['time'] - base)//1000000000).tolist() == [0, 1, 2, 3, 5]
+    assert rows['latitude'].tolist() == [41.0, 42.0, 43.0, 44.0, 46.0]
+    assert np.all(rows['gap'] <= 1.5)
+
+    # drain() returns each joint sample once
+    assert len(sync.drain()) == 5
+    assert len(sync.drain()) == 0
+
+    sync.addIMU(_imu([base + 6*1000000000]))
+    sync.addFix(_fix(6, 47.0, 16.0, 100.0, 0.0, 0.0), base + 6*1000000000)
+
+    assert sync.drain()['latitude'].tolist() == [47.0]
+
+def testClockGoingBackRestarts():
+    sync = syncBuffer(64)
+    base = 20*_dayNs
+
+    for k in range(3):
+        sync.addFix(_fix(43200.0 + k, 41.0, 16.0, 0.0, 0.0, 0.0),
+                    base + (43200 + k)*1000000000)
+
+    # a late fix is dropped, a replay from the day before starts over
+    sync.addFix(_fix(43200.5, 41.0, 16.0, 0.0, 0.0, 0.0),
+                base + 43203*1000000000)
+    assert len(sync.gps) == 3
+
+    sync.addFix(_fix(100.0, 41.0, 16.0, 0.0, 0.0, 0.0),
+                base - _dayNs + 100*1000000000)
+    assert sync.gps['time'].tolist() == [base - _dayNs + 100*1000000000]